@@ -0,0 +1,14 @@
+"""
+自动视频生成批量渲染命令行
+按JSONL清单离线批量生成视频，不经过MCP服务器
+
+用法:
+    python auto_generate_video_batch.py manifest.jsonl [-o results.jsonl] [-j 并发数] [--force]
+"""
+
+import sys
+
+from auto_video_modules.batch_runner import main
+
+if __name__ == "__main__":
+    sys.exit(main())
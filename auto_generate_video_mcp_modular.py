@@ -4,6 +4,7 @@
 """
 
 import asyncio
+import argparse
 from mcp.server.fastmcp import FastMCP
 from typing import Any
 
@@ -13,9 +14,11 @@ from auto_video_modules.mcp_tools import (
     generate_auto_video_mcp,
     generate_auto_video_sync,
     generate_auto_video_async,
+    generate_auto_video_batch,
     get_task_status,
     list_all_tasks,
     cancel_task,
+    resume_task,
     get_system_status,
     get_available_voice_options,
     validate_input_parameters,
@@ -31,6 +34,15 @@ from auto_video_modules.motion_detection_utils import detect_video_motion, optim
 # 导入GPU优化功能
 from auto_video_modules.gpu_optimization_utils import get_system_performance_info, optimize_video_processing, benchmark_gpu_performance
 
+# 导入监视文件夹功能
+from auto_video_modules.watch_folder import start_watch_folder, stop_watch_folder, get_watch_folder_status
+
+# 导入素材登记功能
+from auto_video_modules.asset_registry import register_video, get_video_asset
+
+# 导入配置
+from auto_video_modules.config import get_config
+
 # 创建主MCP服务器
 mcp = FastMCP("auto-video-generator", log_level="INFO")
 
@@ -149,12 +161,18 @@ async def get_all_available_tools() -> str:
 === 核心功能 ===
 - generate_auto_video_mcp: 智能剪辑视频并自动添加字幕、语音（默认使用异步任务）
 - generate_auto_video_sync: 智能剪辑视频并自动添加字幕、语音（同步版本，适合短时间任务）
-- generate_auto_video_async: 异步视频生成（推荐用于长时间任务）
+- generate_auto_video_async: 异步视频生成（推荐用于长时间任务，支持 priority 优先级和 client_id 公平排队）
+- generate_auto_video_batch: 同一源视频批量生成多个版本（源视频分析和剪辑只执行一次）
 
 === 任务管理 ===
 - get_task_status: 获取任务状态和进度
-- list_all_tasks: 列出所有任务
+- list_all_tasks: 分页列出任务（支持按状态过滤，返回 next_cursor 用于获取下一页）
 - cancel_task: 取消正在运行的任务
+- resume_task: 从最后完成的阶段恢复失败或已取消的任务
+
+=== 素材登记 ===
+- register_video: 登记源视频（计算哈希、探测信息和关键帧索引），返回素材ID（asset_id）
+- get_video_asset: 获取已登记素材的详细信息
 
 === 配置获取工具 ===
 - get_system_status_mcp: 获取系统状态信息
@@ -173,12 +191,22 @@ async def get_all_available_tools() -> str:
 - 默认推荐使用 generate_auto_video_mcp（异步任务）
 - 短时间任务（< 2分钟）可使用 generate_auto_video_sync
 - 长时间任务（> 2分钟）建议使用 generate_auto_video_async
+- 同一源视频需要多个文案/音色版本时使用 generate_auto_video_batch
+- 编辑人员把视频和同名 .txt 脚本（可选同名 .json 参数）放入共享目录时，使用 start_watch_folder 自动处理，
+  get_watch_folder_status 查看状态，stop_watch_folder 停止
+- 渲染负载较高时，使用 --render-queue 启动服务器，并单独运行 auto_generate_video_worker.py 渲染工作进程，
+  渲染进程崩溃或重启不影响MCP服务，工作进程数量可以独立调整
+- 同一源视频需要多次操作时，先用 register_video 登记，之后各工具的 video_path 参数直接传入 asset_id，
+  不再重复探测视频信息；源文件修改后需要重新登记
+- 单机算力不足时，使用 --render-farm <共享目录> 启动服务器，长视频的合成阶段按时间分块，
+  其他主机运行 auto_generate_video_worker.py --chunks-only --farm-dir <共享目录> 参与渲染
 
 === 异步任务使用流程 ===
 1. 调用 generate_auto_video_mcp 或 generate_auto_video_async 创建任务，获得 task_id
-2. 使用 get_task_status 查询任务进度
-3. 任务完成后获取结果
+2. 服务器通过 MCP 通知推送任务进度和结束事件（见下方说明），也可随时使用 get_task_status 查询
+3. 收到 task_finished 通知后获取结果
 4. 可选：使用 cancel_task 取消任务
+5. 任务失败或被取消后，可使用 resume_task 从最后完成的阶段继续，已合成的语音和已编码的视频不会重新生成
 
 === 时间标记语法 ===
 支持在文本中使用时间标记来控制静默时间：
@@ -241,9 +269,11 @@ auto_split_config: '{"enable": true, "strategy": "smart", "maxChars": 20}'
 
 === 长时间任务处理建议 ===
 - 默认使用异步任务处理，避免连接超时
-- 定期查询任务状态，建议每5-10秒查询一次
+- 无需轮询：创建任务的会话会收到 notifications/message 日志通知（logger 为 auto_video.tasks，data.event 为 task_progress 或 task_finished），请求携带 progressToken 时还会收到 notifications/progress
+- 不支持通知的客户端再使用 get_task_status 查询
 - 任务完成后及时清理临时文件
-- 支持并发任务，建议同时运行不超过5个任务
+- 支持并发任务，超出并发上限（SystemConfig.max_workers）的任务会自动排队
+- 排队中的任务可通过 get_task_status 返回的 queue_position 查看队列位置
 """
     return tools_info
 
@@ -251,9 +281,16 @@ auto_split_config: '{"enable": true, "strategy": "smart", "maxChars": 20}'
 mcp.tool()(generate_auto_video_mcp)
 mcp.tool()(generate_auto_video_sync)
 mcp.tool()(generate_auto_video_async)
+mcp.tool()(generate_auto_video_batch)
 mcp.tool()(get_task_status)
 mcp.tool()(list_all_tasks)
 mcp.tool()(cancel_task)
+mcp.tool()(resume_task)
+mcp.tool()(start_watch_folder)
+mcp.tool()(stop_watch_folder)
+mcp.tool()(get_watch_folder_status)
+mcp.tool()(register_video)
+mcp.tool()(get_video_asset)
 mcp.tool()(check_gpu_acceleration_mcp)
 mcp.tool()(detect_video_motion_mcp)
 mcp.tool()(optimize_video_motion_params_mcp)
@@ -262,6 +299,17 @@ mcp.tool()(optimize_video_processing_mcp)
 mcp.tool()(benchmark_gpu_performance_mcp)
 
 def main():
+    parser = argparse.ArgumentParser(description="自动视频生成MCP服务器")
+    parser.add_argument("--render-queue", action="store_true",
+                        help="只把任务写入渲染队列，由 auto_generate_video_worker.py 启动的渲染工作进程执行")
+    parser.add_argument("--render-farm", default="",
+                        help="渲染集群共享目录，长视频的合成阶段按时间分块，由各主机的渲染工作进程渲染")
+    args = parser.parse_args()
+    if args.render_queue:
+        get_config().get_system_config().render_queue_enabled = True
+    if args.render_farm:
+        get_config().get_system_config().render_farm_dir = args.render_farm
+    
     print("启动自动视频生成MCP服务器 v3.0...")
     print("服务器包含以下功能:")
     print("- 核心视频生成功能")
@@ -269,6 +317,10 @@ def main():
     print("\n使用 get_all_available_tools 查看所有可用工具")
     print("服务器将以SSE方式运行")
     print("访问地址: http://localhost:8000/sse")
+    if get_config().get_system_config().render_queue_enabled:
+        print("渲染队列模式：任务由渲染工作进程执行，请另外运行 python auto_generate_video_worker.py -n <进程数>")
+    if get_config().get_system_config().render_farm_dir:
+        print("渲染集群模式：其他主机运行 python auto_generate_video_worker.py --chunks-only --farm-dir <共享目录> 参与渲染视频块")
     
     # 以SSE方式运行
     mcp.run(transport='sse')
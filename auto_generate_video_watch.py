@@ -0,0 +1,14 @@
+"""
+自动视频生成监视文件夹命令行
+持续监视共享目录，自动为放入的视频生成配音字幕视频，不经过MCP服务器
+
+用法:
+    python auto_generate_video_watch.py 监视目录 [-o 输出目录]
+"""
+
+import sys
+
+from auto_video_modules.watch_folder import main
+
+if __name__ == "__main__":
+    sys.exit(main())
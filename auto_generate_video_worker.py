@@ -0,0 +1,16 @@
+"""
+自动视频生成渲染工作进程
+从渲染队列领取MCP服务（--render-queue 模式）提交的任务并执行，可以随时增减或重启，不影响MCP服务；
+配置了渲染集群共享目录时，其他主机可以只渲染各节点分发的视频块
+
+用法:
+    python auto_generate_video_worker.py [-n 工作进程数量] [-c 每个进程同时执行的任务数] [--farm-dir 共享目录]
+    python auto_generate_video_worker.py --chunks-only --farm-dir 共享目录 [-n 工作进程数量]
+"""
+
+import sys
+
+from auto_video_modules.render_worker import main
+
+if __name__ == "__main__":
+    sys.exit(main())
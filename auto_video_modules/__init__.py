@@ -7,12 +7,35 @@
 from . import ffmpeg_utils
 from . import voice_utils
 from . import audio_utils
+from . import audio_probe
 from . import subtitle_utils
 from . import video_utils
 from . import mcp_tools
 from . import video_processing_utils
 from . import motion_detection_utils
 from . import gpu_optimization_utils
+from . import task_scheduler
+from . import workspace_utils
+from . import process_pool
+from . import thread_pool
+from . import file_lock
+from . import ffmpeg_runner
+from . import task_progress
+from . import task_store
+from . import task_checkpoint
+from . import result_cache
+from . import tts_cache
+from . import stage_graph
+from . import task_notifications
+from . import task_deadline
+from . import memory_admission
+from . import adaptive_concurrency
+from . import batch_runner
+from . import watch_folder
+from . import asset_registry
+from . import render_queue
+from . import render_worker
+from . import render_farm
 
 # 版本信息
 __version__ = "2.0.0"
@@ -25,12 +48,35 @@ __all__ = [
     "ffmpeg_utils",
     "voice_utils", 
     "audio_utils",
+    "audio_probe",
     "subtitle_utils",
     "video_utils",
     "mcp_tools",
     "video_processing_utils",
     "motion_detection_utils",
     "gpu_optimization_utils",
+    "task_scheduler",
+    "workspace_utils",
+    "process_pool",
+    "thread_pool",
+    "file_lock",
+    "ffmpeg_runner",
+    "task_progress",
+    "task_store",
+    "task_checkpoint",
+    "result_cache",
+    "tts_cache",
+    "stage_graph",
+    "task_notifications",
+    "task_deadline",
+    "memory_admission",
+    "adaptive_concurrency",
+    "batch_runner",
+    "watch_folder",
+    "asset_registry",
+    "render_queue",
+    "render_worker",
+    "render_farm",
 
     # 版本信息
     "__version__",
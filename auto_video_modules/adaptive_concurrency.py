@@ -0,0 +1,156 @@
+"""
+自适应并发模块
+负责按实测指标调整资源队列的并发上限（加性增、乘性减）：
+语音合成按请求延迟和错误率调整，编码按每个任务的编码速度和CPU饱和度调整
+"""
+
+import time
+import statistics
+from typing import Dict, List, Optional
+
+import psutil
+
+class AIMDController:
+    """加性增、乘性减的并发上限控制器
+
+    队列有任务排队且指标平稳时上限加1，指标恶化时上限乘以 decrease_factor，
+    两次减小之间至少间隔 cooldown 秒，避免同一批并发请求的失败把上限连续减到最小。
+    """
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int,
+                 decrease_factor: float = 0.5, cooldown: float = 5.0):
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(max(int(initial), self.min_limit), self.max_limit)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+
+    def increase(self, reason: str):
+        """上限加1"""
+        if self.limit >= self.max_limit:
+            return
+        self.limit += 1
+        self.increases += 1
+        print(f"[{self.name}] 并发上限提高到 {self.limit}（{reason}）")
+
+    def decrease(self, reason: str):
+        """上限乘以 decrease_factor（冷却期内只减一次）"""
+        now = time.time()
+        if self.limit <= self.min_limit or now - self._last_decrease < self.cooldown:
+            return
+        self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        self.decreases += 1
+        self._last_decrease = now
+        print(f"[{self.name}] 并发上限降低到 {self.limit}（{reason}）")
+
+    def get_status(self) -> Dict:
+        return {
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "increases": self.increases,
+            "decreases": self.decreases
+        }
+
+class LatencyController(AIMDController):
+    """按请求延迟和错误率调整并发上限（语音合成）
+
+    每 window 个样本评估一次：延迟中位数超过基线的 latency_tolerance 倍时减小上限，
+    没有错误且期间有任务排队时增大上限；请求失败（限流、网络错误）时立即减小上限。
+    """
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int,
+                 window: int = 10, latency_tolerance: float = 1.5, **kwargs):
+        super().__init__(name, initial, min_limit, max_limit, **kwargs)
+        self.window = window
+        self.latency_tolerance = latency_tolerance
+        self.baseline: Optional[float] = None
+        self._latencies: List[float] = []
+        self._errors = 0
+
+    def record(self, latency: float, ok: bool = True, saturated: bool = False):
+        """记录一次请求
+
+        Args:
+            latency: 请求延迟（按请求大小归一化，例如每字秒数）
+            ok: 请求是否成功
+            saturated: 本次评估周期内队列是否有任务排队
+        """
+        if not ok:
+            self._errors += 1
+            self.decrease("请求失败，可能被限流")
+            return
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window:
+            return
+        median = statistics.median(self._latencies)
+        errors = self._errors
+        self._latencies = []
+        self._errors = 0
+        if self.baseline is None or median < self.baseline:
+            self.baseline = median
+        else:
+            # 基线缓慢跟随延迟变化，服务端整体变慢后不会一直判定为恶化
+            self.baseline = self.baseline * 0.9 + median * 0.1
+        if median > self.baseline * self.latency_tolerance:
+            self.decrease(f"延迟中位数 {median:.3f} 超过基线 {self.baseline:.3f}")
+        elif errors == 0 and saturated:
+            self.increase("延迟平稳且有任务排队")
+
+    def get_status(self) -> Dict:
+        status = super().get_status()
+        status["baseline_latency"] = round(self.baseline, 4) if self.baseline is not None else None
+        return status
+
+class ThroughputController(AIMDController):
+    """按每个任务的编码速度和CPU饱和度调整并发上限（编码）
+
+    CPU饱和且单任务编码速度低于同类工作基线的 speed_tolerance 倍时减小上限（并发过多互相争抢CPU），
+    CPU未饱和且有任务排队时增大上限。
+    """
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int,
+                 cpu_high: float = 90.0, cpu_low: float = 75.0, speed_tolerance: float = 0.8,
+                 decrease_factor: float = 0.75, **kwargs):
+        super().__init__(name, initial, min_limit, max_limit, decrease_factor=decrease_factor, **kwargs)
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.speed_tolerance = speed_tolerance
+        self.baselines: Dict[str, float] = {}
+        self.last_cpu_percent: Optional[float] = None
+
+    def record(self, speed: Optional[float], work_kind: str, saturated: bool = False,
+               cpu_percent: Optional[float] = None):
+        """记录一次编码
+
+        Args:
+            speed: 编码速度（相对实时的倍数，ffmpeg -progress 的 speed）
+            work_kind: 工作类型（阶段和画质），不同类型的速度分别建立基线
+            saturated: 本次评估周期内队列是否有任务排队
+            cpu_percent: 当前CPU占用率，为None时自动采样
+        """
+        if cpu_percent is None:
+            # 非阻塞采样：返回距上次调用期间的平均占用率
+            cpu_percent = psutil.cpu_percent(interval=None)
+        self.last_cpu_percent = cpu_percent
+        degraded = False
+        if speed:
+            baseline = self.baselines.get(work_kind)
+            if baseline is None or speed > baseline:
+                self.baselines[work_kind] = speed
+            else:
+                self.baselines[work_kind] = baseline * 0.95 + speed * 0.05
+                degraded = speed < baseline * self.speed_tolerance
+        if cpu_percent >= self.cpu_high and degraded:
+            self.decrease(f"CPU占用 {cpu_percent:.0f}%，{work_kind} 编码速度下降到 {speed:.2f}x")
+        elif cpu_percent < self.cpu_low and saturated:
+            self.increase(f"CPU占用 {cpu_percent:.0f}% 且有任务排队")
+
+    def get_status(self) -> Dict:
+        status = super().get_status()
+        status["cpu_percent"] = self.last_cpu_percent
+        status["baseline_speed"] = {kind: round(speed, 2) for kind, speed in self.baselines.items()}
+        return status
@@ -0,0 +1,406 @@
+"""
+素材登记模块
+负责登记源视频：计算文件内容哈希，记录ffprobe探测信息、关键帧索引和时长，返回素材ID（asset_id）；
+其他工具可以用素材ID代替视频路径，重复操作同一个大文件时直接使用登记的信息，不再重新探测和计算哈希
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from .config import get_config
+from .thread_pool import run_in_thread
+
+# 创建MCP实例
+mcp = FastMCP("asset-registry", log_level="ERROR")
+
+# 素材ID前缀，后接文件内容SHA256的前16位
+ASSET_PREFIX = "asset_"
+
+# ffprobe探测单个文件的超时时间（秒），读取关键帧需要扫描全部数据包，耗时比读取文件头长
+PROBE_TIMEOUT = 60
+KEYFRAME_PROBE_TIMEOUT = 300
+
+# 计算文件哈希时每次读取的块大小
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id      TEXT PRIMARY KEY,
+    path          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime_ns      INTEGER NOT NULL,
+    sha256        TEXT NOT NULL,
+    duration      REAL,
+    fps           REAL,
+    width         INTEGER,
+    height        INTEGER,
+    probe         TEXT,
+    keyframes     TEXT,
+    registered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assets_path ON assets (path);
+CREATE TABLE IF NOT EXISTS asset_analyses (
+    asset_id   TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    result     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (asset_id, kind, params_key)
+);
+"""
+
+def is_asset_id(value) -> bool:
+    """判断参数是否为素材ID（同名文件存在时按路径处理）"""
+    return isinstance(value, str) and value.startswith(ASSET_PREFIX) and not os.path.exists(value)
+
+def hash_file(path: str) -> str:
+    """计算文件内容的SHA256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """解析ffprobe的帧率（如 30000/1001）"""
+    try:
+        numerator, _, denominator = str(rate).partition("/")
+        value = float(numerator) / float(denominator or 1)
+        return value if value > 0 else None
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+def probe_video(path: str) -> Dict:
+    """用ffprobe探测视频的格式和流信息（不解码）
+
+    Args:
+        path: 视频文件路径
+
+    Returns:
+        dict: ffprobe输出的 format 和 streams
+
+    Raises:
+        RuntimeError: 找不到ffprobe、探测失败或超时
+    """
+    from .ffmpeg_utils import check_ffmpeg
+    try:
+        _, ffprobe_path = check_ffmpeg()
+        completed = subprocess.run(
+            [ffprobe_path, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+            capture_output=True, text=True, timeout=PROBE_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffprobe探测超时（超过 {PROBE_TIMEOUT} 秒）")
+    except (OSError, subprocess.SubprocessError) as e:
+        raise RuntimeError(f"无法运行ffprobe: {e}")
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffprobe探测失败: {completed.stderr.strip()}")
+    return json.loads(completed.stdout or "{}")
+
+def probe_keyframes(path: str) -> List[float]:
+    """读取视频流的关键帧时间（只读取数据包标志，不解码）
+
+    Args:
+        path: 视频文件路径
+
+    Returns:
+        list: 关键帧时间（秒），按时间排序；无法探测或超时时为空
+    """
+    from .ffmpeg_utils import check_ffmpeg
+    try:
+        _, ffprobe_path = check_ffmpeg()
+        completed = subprocess.run(
+            [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=KEYFRAME_PROBE_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return []
+    if completed.returncode != 0:
+        return []
+    keyframes = []
+    for line in completed.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" not in flags:
+            continue
+        try:
+            keyframes.append(round(float(pts_time), 3))
+        except ValueError:
+            continue
+    return sorted(keyframes)
+
+def summarize_probe(probe: Dict) -> Dict:
+    """从ffprobe输出中提取时长、帧率和分辨率"""
+    video_stream = next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), {})
+    try:
+        duration = float(probe.get("format", {}).get("duration") or video_stream.get("duration") or 0)
+    except (TypeError, ValueError):
+        duration = 0.0
+    return {
+        "duration": duration,
+        "fps": _parse_rate(video_stream.get("avg_frame_rate")) or _parse_rate(video_stream.get("r_frame_rate")),
+        "width": video_stream.get("width"),
+        "height": video_stream.get("height")
+    }
+
+class AssetRegistry:
+    """基于SQLite的源视频登记表"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _record(self, row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        record = dict(row)
+        record["probe"] = json.loads(record["probe"] or "{}")
+        record["keyframes"] = json.loads(record["keyframes"] or "[]")
+        return record
+
+    def register(self, path: str) -> Dict:
+        """登记源视频（在线程中调用），同一文件未修改时直接返回已登记的信息
+
+        Args:
+            path: 视频文件路径
+
+        Returns:
+            dict: 素材信息，registered 表示本次是否新登记
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            RuntimeError: 无法探测视频信息
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        existing = self.lookup(path)
+        if existing is not None:
+            return {**existing, "registered": False}
+
+        sha256 = hash_file(path)
+        try:
+            probe = probe_video(path)
+            summary = summarize_probe(probe)
+        except (RuntimeError, ValueError) as e:
+            # 没有ffprobe时退回moviepy获取基本信息
+            from .video_utils import get_video_info
+            info = get_video_info(path)
+            if "error" in info:
+                raise RuntimeError(f"无法探测视频信息: {e}; {info['error']}")
+            probe = {}
+            summary = {"duration": info["duration"], "fps": info["fps"],
+                       "width": info["size"][0], "height": info["size"][1]}
+        keyframes = probe_keyframes(path)
+
+        record = {
+            "asset_id": ASSET_PREFIX + sha256[:16],
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            **summary,
+            "probe": json.dumps(probe, ensure_ascii=False),
+            "keyframes": json.dumps(keyframes),
+            "registered_at": time.time()
+        }
+        with self._lock:
+            # 相同内容的文件只保留一个素材ID，路径更新为最近登记的位置
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assets (asset_id, path, size, mtime_ns, sha256, duration, fps, width, height, "
+                "probe, keyframes, registered_at) VALUES (:asset_id, :path, :size, :mtime_ns, :sha256, :duration, "
+                ":fps, :width, :height, :probe, :keyframes, :registered_at)",
+                record
+            )
+        return {**self.get(record["asset_id"]), "registered": True}
+
+    def get(self, asset_id: str) -> Optional[Dict]:
+        """获取素材信息，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        return self._record(row)
+
+    def lookup(self, path: str) -> Optional[Dict]:
+        """按路径查找已登记且登记后未修改的素材
+
+        Args:
+            path: 视频文件路径
+
+        Returns:
+            dict: 素材信息，未登记或文件已修改时返回None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM assets WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return self._record(row)
+
+    def resolve(self, asset_id: str) -> Dict:
+        """获取素材信息并检查源文件在登记后未被修改或删除
+
+        Args:
+            asset_id: 素材ID
+
+        Returns:
+            dict: 素材信息
+
+        Raises:
+            ValueError: 素材未登记或源文件已变化
+        """
+        record = self.get(asset_id)
+        if record is None:
+            raise ValueError(f"素材未登记: {asset_id}，请先使用 register_video 登记")
+        try:
+            stat = os.stat(record["path"])
+        except OSError:
+            raise ValueError(f"素材 {asset_id} 的源文件不存在: {record['path']}，请重新登记")
+        if stat.st_size != record["size"] or stat.st_mtime_ns != record["mtime_ns"]:
+            raise ValueError(f"素材 {asset_id} 的源文件登记后已被修改: {record['path']}，请重新登记")
+        return record
+
+    def get_analysis(self, asset_id: str, kind: str, params: Dict):
+        """获取已缓存的分析结果（例如运动检测），未缓存时返回None"""
+        params_key = json.dumps(params, sort_keys=True)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM asset_analyses WHERE asset_id = ? AND kind = ? AND params_key = ?",
+                (asset_id, kind, params_key)
+            ).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def put_analysis(self, asset_id: str, kind: str, params: Dict, result):
+        """缓存素材的分析结果"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO asset_analyses (asset_id, kind, params_key, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (asset_id, kind, json.dumps(params, sort_keys=True), json.dumps(result, ensure_ascii=False), time.time())
+            )
+
+def to_video_info(record: Dict) -> Dict:
+    """把素材信息转换为 get_video_info 的返回格式"""
+    return {
+        "duration": record["duration"],
+        "fps": record["fps"],
+        "size": [record["width"], record["height"]],
+        "file_size": record["size"]
+    }
+
+_registry: Optional[AssetRegistry] = None
+
+def get_asset_registry() -> AssetRegistry:
+    """获取全局素材登记表实例"""
+    global _registry
+    if _registry is None:
+        config = get_config()
+        db_path = config.get_system_config().asset_db_path or os.path.join(config.workspace, "assets.db")
+        _registry = AssetRegistry(db_path)
+    return _registry
+
+def resolve_video_path(video_path: str) -> str:
+    """把素材ID解析为源视频路径，普通路径原样返回
+
+    Args:
+        video_path: 视频文件路径或素材ID
+
+    Returns:
+        str: 视频文件路径
+
+    Raises:
+        ValueError: 素材未登记或源文件已变化
+    """
+    if not is_asset_id(video_path):
+        return video_path
+    return get_asset_registry().resolve(video_path)["path"]
+
+def registered_video_info(video_path: str) -> Optional[Dict]:
+    """获取已登记视频的信息（get_video_info 格式），未登记或登记后已修改时返回None"""
+    record = get_asset_registry().lookup(video_path)
+    if record is None or not record["duration"] or not record["width"]:
+        return None
+    return to_video_info(record)
+
+def _describe(record: Dict, include_keyframes: bool = False) -> Dict:
+    description = {
+        "asset_id": record["asset_id"],
+        "video_path": record["path"],
+        "sha256": record["sha256"],
+        "file_size": record["size"],
+        "duration": record["duration"],
+        "fps": record["fps"],
+        "resolution": f"{record['width']}x{record['height']}",
+        "keyframe_count": len(record["keyframes"]),
+        "registered_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["registered_at"]))
+    }
+    if include_keyframes:
+        description["keyframes"] = record["keyframes"]
+        description["probe"] = record["probe"]
+    return description
+
+@mcp.tool()
+async def register_video(video_path: str) -> str:
+    """登记源视频，返回素材ID（asset_id）
+
+    登记时计算文件哈希并记录探测信息、关键帧索引和时长，之后其他工具的 video_path 参数
+    可以直接传入素材ID，不再重复探测。源文件修改后需要重新登记。
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        素材信息JSON字符串
+    """
+    if not os.path.exists(video_path):
+        return f"错误：视频文件不存在: {video_path}"
+    try:
+        record = await run_in_thread(get_asset_registry().register, video_path)
+    except Exception as e:
+        return f"错误：登记视频失败: {e}"
+    return json.dumps({**_describe(record), "registered": record["registered"]}, ensure_ascii=False)
+
+@mcp.tool()
+async def get_video_asset(asset_id: str) -> str:
+    """获取已登记素材的详细信息（包括关键帧索引和ffprobe探测结果）
+
+    Args:
+        asset_id: 素材ID
+
+    Returns:
+        素材信息JSON字符串
+    """
+    try:
+        record = await run_in_thread(get_asset_registry().resolve, asset_id)
+    except ValueError as e:
+        return f"错误：{e}"
+    return json.dumps(_describe(record, include_keyframes=True), ensure_ascii=False)
+
+def get_mcp_instance():
+    """获取MCP实例
+
+    Returns:
+        FastMCP: MCP实例
+    """
+    return mcp
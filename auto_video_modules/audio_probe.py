@@ -0,0 +1,188 @@
+"""
+音频探测模块
+负责在不解码音频的情况下读取时长、采样率和声道数：MP3逐帧读取帧头（或Xing/Info帧中的总帧数），
+WAV读取文件头，其他格式用ffprobe读取容器信息
+"""
+
+import os
+import json
+import wave
+import subprocess
+from typing import Dict, Optional
+
+# MPEG版本（帧头中的版本位）-> 名称，1为保留值
+_MPEG1, _MPEG2, _MPEG25 = 3, 2, 0
+
+# Layer III 比特率表（kbps），下标为帧头中的比特率索引，0（free）和15为无效值
+_BITRATES = {
+    _MPEG1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    _MPEG2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_BITRATES[_MPEG25] = _BITRATES[_MPEG2]
+
+# 采样率表（Hz），下标为帧头中的采样率索引
+_SAMPLE_RATES = {
+    _MPEG1: [44100, 48000, 32000],
+    _MPEG2: [22050, 24000, 16000],
+    _MPEG25: [11025, 12000, 8000],
+}
+
+def _parse_frame_header(data: bytes, pos: int) -> Optional[Dict]:
+    """解析 pos 处的MPEG Layer III帧头，不是有效帧头时返回None"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = _BITRATES[version][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    mono = (data[pos + 3] >> 6) == 3
+    if version == _MPEG1:
+        samples, length = 1152, 144 * bitrate // sample_rate + padding
+        side_info = 17 if mono else 32
+    else:
+        samples, length = 576, 72 * bitrate // sample_rate + padding
+        side_info = 9 if mono else 17
+    return {
+        "length": length,
+        "samples": samples,
+        "sample_rate": sample_rate,
+        "channels": 1 if mono else 2,
+        "side_info": side_info
+    }
+
+def _skip_id3v2(data: bytes) -> int:
+    """跳过文件开头的ID3v2标签，返回第一帧的搜索起点"""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def mp3_info(path: str) -> Optional[Dict]:
+    """读取MP3的时长、采样率和声道数（只读取帧头，不解码）
+
+    有Xing/Info帧时使用其中的总帧数，否则逐帧累加每帧的采样数。
+
+    Args:
+        path: MP3文件路径
+
+    Returns:
+        dict: duration_seconds、sample_rate、channels，不是有效的MP3时返回None
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    pos = _skip_id3v2(data)
+    # 找到第一个后面紧跟着另一个有效帧头的位置，避免把音频数据中的偶然字节当作帧头
+    first = None
+    while pos + 4 <= len(data):
+        pos = data.find(b"\xff", pos)
+        if pos < 0:
+            break
+        header = _parse_frame_header(data, pos)
+        if header and (pos + header["length"] >= len(data)
+                       or _parse_frame_header(data, pos + header["length"])):
+            first = header
+            break
+        pos += 1
+    if first is None:
+        return None
+
+    info = {"sample_rate": first["sample_rate"], "channels": first["channels"]}
+    xing = pos + 4 + first["side_info"]
+    if data[xing:xing + 4] in (b"Xing", b"Info") and xing + 12 <= len(data):
+        flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+        if flags & 0x01:
+            frames = int.from_bytes(data[xing + 8:xing + 12], "big")
+            info["duration_seconds"] = frames * first["samples"] / first["sample_rate"]
+            return info
+        # Info帧本身不含音频，跳过
+        pos += first["length"]
+
+    samples = 0
+    while True:
+        header = _parse_frame_header(data, pos)
+        if header is None:
+            # 文件结尾或ID3v1标签
+            break
+        samples += header["samples"]
+        pos += header["length"]
+    if not samples:
+        return None
+    info["duration_seconds"] = samples / first["sample_rate"]
+    return info
+
+def mp3_duration(path: str) -> Optional[float]:
+    """读取MP3时长（秒），不是有效的MP3时返回None"""
+    info = mp3_info(path)
+    return info["duration_seconds"] if info else None
+
+def wav_info(path: str) -> Optional[Dict]:
+    """读取WAV文件头中的时长、采样率、声道数和采样宽度，不是有效的WAV时返回None"""
+    try:
+        with wave.open(path, "rb") as f:
+            return {
+                "duration_seconds": f.getnframes() / f.getframerate(),
+                "sample_rate": f.getframerate(),
+                "channels": f.getnchannels(),
+                "frame_width": f.getsampwidth() * f.getnchannels()
+            }
+    except (OSError, EOFError, wave.Error, ZeroDivisionError):
+        return None
+
+def ffprobe_audio_info(path: str) -> Optional[Dict]:
+    """用ffprobe读取容器和第一条音频流的信息（读取文件头，不解码）"""
+    from .ffmpeg_utils import check_ffmpeg
+    try:
+        _, ffprobe_path = check_ffmpeg()
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+             "-of", "json", path],
+            capture_output=True, text=True, timeout=30
+        )
+        probe = json.loads(result.stdout or "{}")
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+    streams = probe.get("streams") or [{}]
+    duration = streams[0].get("duration") or probe.get("format", {}).get("duration")
+    if duration in (None, "N/A"):
+        return None
+    return {
+        "duration_seconds": float(duration),
+        "sample_rate": int(streams[0].get("sample_rate") or 0),
+        "channels": int(streams[0].get("channels") or 0),
+        # 解码为16位PCM时每帧的字节数（与 pydub 解码结果一致）
+        "frame_width": 2 * int(streams[0].get("channels") or 0)
+    }
+
+def probe_audio_info(path: str) -> Optional[Dict]:
+    """不解码音频读取时长、采样率、声道数和每帧字节数
+
+    Args:
+        path: 音频文件路径
+
+    Returns:
+        dict: duration_seconds、sample_rate、channels、frame_width，无法读取时返回None
+    """
+    if not os.path.isfile(path):
+        return None
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".wav":
+        info = wav_info(path)
+        if info:
+            return info
+    if extension == ".mp3":
+        info = mp3_info(path)
+        if info:
+            # MP3解码为16位PCM
+            info["frame_width"] = 2 * info["channels"]
+            return info
+    return ffprobe_audio_info(path)
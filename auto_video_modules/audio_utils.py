@@ -5,77 +5,165 @@
 
 import json
 import os
+import time
 import edge_tts
 from tqdm import tqdm
 from pydub import AudioSegment
 from mcp.server.fastmcp import FastMCP
 import asyncio
+from .workspace_utils import workspace_path, is_cancelled, TaskCancelledError
+from .task_progress import get_current_progress
+from .task_scheduler import get_scheduler
+from .thread_pool import run_in_thread
+from .config import get_config
+from .tts_cache import get_tts_cache, tts_cache_key
+from .audio_probe import mp3_duration, probe_audio_info
 
 # 创建MCP实例
 mcp = FastMCP("audio-utils", log_level="ERROR")
 
-async def synthesize_and_get_durations(timing, voice):
-    """异步合成音频并获取每条字幕的朗读时长（主流程必须 await）"""
-    audio_segments = []
-    durations = []
-    segments = []
+async def synthesize_segment(text, voice, output_path, work_dir=None):
+    """合成单个片段的TTS音频，失败（限流、网络错误）时按 VoiceConfig.max_retries 重试
     
-    for idx, t in enumerate(tqdm(timing, desc="合成音频", ascii=True)):
+    每次请求占用调度器的一个TTS请求槽位（所有任务共用，SystemConfig.max_tts_requests），
+    重试前的等待期间不占用槽位。
+    
+    Args:
+        text: 片段文本
+        voice: 语音音色名称
+        output_path: 输出音频路径
+        work_dir: 任务工作目录，任务取消后不再重试
+    """
+    voice_config = get_config().get_voice_config()
+    attempt = 0
+    while True:
+        async with get_scheduler().tts_request():
+            if is_cancelled(work_dir):
+                raise TaskCancelledError("任务已取消")
+            communicate = edge_tts.Communicate(text=text, voice=voice)
+            started = time.time()
+            try:
+                await communicate.save(output_path)
+                error = None
+            except Exception as e:
+                error = e
+        if error is not None:
+            # 请求失败（限流、网络错误）时降低TTS并发
+            get_scheduler().report("tts_request", latency=0.0, ok=False)
+            if attempt >= voice_config.max_retries:
+                raise error
+            delay = voice_config.retry_delay * (2 ** attempt)
+            attempt += 1
+            tqdm.write(f"TTS合成失败，{delay:g} 秒后第 {attempt} 次重试: {error}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            await asyncio.sleep(delay)
+            continue
+        # 上报本次请求的每字延迟，用于自动调整同时发出的TTS请求数
+        get_scheduler().report("tts_request", latency=(time.time() - started) / max(len(text), 1))
+        return
+
+async def synthesize_cached(text, voice, output_path, work_dir=None):
+    """合成单个片段并获取时长，相同文本和音色的片段直接从TTS缓存复制
+    
+    Args:
+        text: 片段文本
+        voice: 语音音色名称
+        output_path: 输出音频路径
+        work_dir: 任务工作目录
+        
+    Returns:
+        float: 音频时长（秒）
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(text, voice)
+    duration = await run_in_thread(cache.get, key, output_path)
+    if duration is not None:
+        return duration
+    await synthesize_segment(text, voice, output_path, work_dir)
+    
+    # 从MP3帧头读取时长，无法解析时才解码（解码在线程池中执行，不阻塞事件循环）
+    duration = mp3_duration(output_path)
+    if duration is None:
+        duration = (await run_in_thread(AudioSegment.from_file, output_path, format="mp3")).duration_seconds
+    await run_in_thread(cache.put, key, output_path, duration)
+    return duration
+
+async def synthesize_and_get_durations(timing, voice, work_dir=None):
+    """异步合成音频并获取每条字幕的朗读时长（主流程必须 await）
+    
+    各片段并发合成（同时发出的请求数由调度器的TTS请求槽位限制），按原顺序拼接，
+    时长与逐条合成完全相同；某个片段最终失败时取消其余片段。
+    
+    Args:
+        timing: 字幕时间列表
+        voice: 语音音色名称
+        work_dir: 任务工作目录，所有中间文件和输出都写入该目录，为None时使用当前目录
+    """
+    progress = get_current_progress()
+    bar = tqdm(total=len(timing), desc="合成音频", ascii=True)
+    finished = 0
+    
+    async def synthesize(idx, t):
+        nonlocal finished
         text = t['text']
         delay = t.get('delay', 0)
+        # 任务取消后不再开始新的片段
+        if is_cancelled(work_dir):
+            raise TaskCancelledError("任务已取消")
         
         if text.strip() == "" and delay > 0:
             # 处理空白静默
-            silence = AudioSegment.silent(duration=delay)
-            temp_audio = f"_temp_silence_{idx}.mp3"
-            silence.export(temp_audio, format="mp3")
-            audio_segments.append(temp_audio)
-            durations.append(delay / 1000)
-            segments.append({"text": text, "duration": delay / 1000, "delay": delay})
+            temp_audio = workspace_path(work_dir, f"_temp_silence_{idx}.mp3")
+            await run_in_thread(create_silence_audio, delay, temp_audio)
             tqdm.write(f"第{idx+1}条：空白静默 {delay}ms")
-            continue
-        
-        # 合成TTS音频
-        temp_audio = f"_temp_{idx}.mp3"
-        communicate = edge_tts.Communicate(text=text, voice=voice)
-        await communicate.save(temp_audio)
-        
-        # 获取音频时长
-        tts_audio = AudioSegment.from_file(temp_audio, format="mp3")
-        audio_segments.append(temp_audio)
-        durations.append(tts_audio.duration_seconds)
-        segments.append({"text": text, "duration": tts_audio.duration_seconds})
+            result = (temp_audio, delay / 1000, {"text": text, "duration": delay / 1000, "delay": delay})
+        else:
+            # 合成TTS音频（重复出现的句子从TTS缓存复制）
+            temp_audio = workspace_path(work_dir, f"_temp_{idx}.mp3")
+            duration = await synthesize_cached(text, voice, temp_audio, work_dir)
+            result = (temp_audio, duration, {"text": text, "duration": duration})
+        finished += 1
+        bar.update(1)
+        if progress:
+            progress.update("tts", finished, len(timing))
+        return result
     
-    # 合并所有音频片段
-    combined = AudioSegment.empty()
-    for seg in audio_segments:
-        combined += AudioSegment.from_file(seg)
+    jobs = [asyncio.ensure_future(synthesize(idx, t)) for idx, t in enumerate(timing)]
+    try:
+        results = await asyncio.gather(*jobs)
+    except BaseException:
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        raise
+    finally:
+        bar.close()
+    audio_segments = [result[0] for result in results]
+    durations = [result[1] for result in results]
+    segments = [result[2] for result in results]
     
-    # 导出合并后的音频
-    audio_mp3_path = "audio.mp3"
-    combined.export(audio_mp3_path, format="mp3")
+    # 合并所有音频片段并导出
+    audio_mp3_path = workspace_path(work_dir, "audio.mp3")
+    await run_in_thread(concat_audio_files, audio_segments, audio_mp3_path)
     
     # 清理临时文件
     for seg in audio_segments:
         os.remove(seg)
     
-    print("已合成音频 audio.mp3，并自动获取每条字幕的朗读时长")
+    print(f"已合成音频 {audio_mp3_path}，并自动获取每条字幕的朗读时长")
     
     # 保存时长数据
-    with open('durations_data.json', 'w', encoding='utf-8') as f:
+    durations_path = workspace_path(work_dir, "durations_data.json")
+    with open(durations_path, 'w', encoding='utf-8') as f:
         json.dump(durations, f)
-    print("已生成 durations_data.json 文件")
+    print(f"已生成 {durations_path} 文件")
     
     return {"audio_path": audio_mp3_path, "segments": segments}
 
 async def synthesize_text_to_audio(text, voice, output_path="temp_audio.mp3"):
-    """异步将单个文本合成音频"""
-    communicate = edge_tts.Communicate(text=text, voice=voice)
-    await communicate.save(output_path)
-    
-    # 获取音频时长
-    audio = AudioSegment.from_file(output_path, format="mp3")
-    return audio.duration_seconds
+    """异步将单个文本合成音频，返回音频时长（秒）"""
+    return await synthesize_cached(text, voice, output_path)
 
 def load_durations_from_file(file_path="durations_data.json"):
     """从文件加载时长数据
@@ -101,6 +189,22 @@ def save_durations_to_file(durations, file_path="durations_data.json"):
     with open(file_path, 'w', encoding='utf-8') as f:
         json.dump(durations, f)
 
+def concat_audio_files(audio_files, output_path):
+    """按顺序合并多个音频文件并导出为mp3
+    
+    Args:
+        audio_files: 音频文件路径列表
+        output_path: 输出文件路径
+        
+    Returns:
+        str: 输出文件路径
+    """
+    combined = AudioSegment.empty()
+    for audio_file in audio_files:
+        combined += AudioSegment.from_file(audio_file)
+    combined.export(output_path, format="mp3")
+    return output_path
+
 def create_silence_audio(duration_ms, output_path="silence.mp3"):
     """创建静默音频
     
@@ -136,6 +240,10 @@ def get_audio_duration(audio_file):
         float: 音频时长（秒）
     """
     try:
+        # 读取文件头获取时长，无法读取时才解码整个文件
+        info = probe_audio_info(audio_file)
+        if info:
+            return info["duration_seconds"]
         from pydub import AudioSegment
         audio = AudioSegment.from_file(audio_file)
         return len(audio) / 1000.0  # 转换为秒
@@ -172,15 +280,21 @@ def get_audio_info(audio_file):
         dict: 音频文件信息
     """
     try:
-        from pydub import AudioSegment
-        audio = AudioSegment.from_file(audio_file)
+        # 读取文件头获取音频信息，无法读取时才解码整个文件
+        info = probe_audio_info(audio_file)
+        if info is None:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(audio_file)
+            info = {
+                "duration_seconds": len(audio) / 1000.0,
+                "sample_rate": audio.frame_rate,
+                "channels": audio.channels,
+                "frame_width": audio.frame_width
+            }
         
         info = {
             "file_path": audio_file,
-            "duration_seconds": len(audio) / 1000.0,
-            "sample_rate": audio.frame_rate,
-            "channels": audio.channels,
-            "frame_width": audio.frame_width,
+            **info,
             "file_size_mb": os.path.getsize(audio_file) / (1024 * 1024)
         }
         
@@ -189,7 +303,7 @@ def get_audio_info(audio_file):
         return {"error": str(e)}
 
 @mcp.tool()
-def convert_text_to_speech(text: str, voice: str, output_file: str) -> str:
+async def convert_text_to_speech(text: str, voice: str, output_file: str) -> str:
     """将文本转换为语音文件
     
     Args:
@@ -201,9 +315,9 @@ def convert_text_to_speech(text: str, voice: str, output_file: str) -> str:
         转换结果信息
     """
     try:
-        success = text_to_speech(text, voice, output_file)
+        success = await text_to_speech(text, voice, output_file)
         if success:
-            duration = get_audio_duration(output_file)
+            duration = await run_in_thread(get_audio_duration, output_file)
             return f"文本转语音成功！输出文件: {output_file}, 时长: {duration:.2f}秒"
         else:
             return "文本转语音失败"
@@ -211,7 +325,7 @@ def convert_text_to_speech(text: str, voice: str, output_file: str) -> str:
         return f"文本转语音时发生错误: {str(e)}"
 
 @mcp.tool()
-def get_audio_file_info(audio_file: str) -> str:
+async def get_audio_file_info(audio_file: str) -> str:
     """获取音频文件信息
     
     Args:
@@ -221,7 +335,7 @@ def get_audio_file_info(audio_file: str) -> str:
         音频文件信息
     """
     try:
-        info = get_audio_info(audio_file)
+        info = await run_in_thread(get_audio_info, audio_file)
         if "error" in info:
             return f"获取音频信息失败: {info['error']}"
         
@@ -239,7 +353,7 @@ def get_audio_file_info(audio_file: str) -> str:
         return f"获取音频信息时发生错误: {str(e)}"
 
 @mcp.tool()
-def validate_audio_file_tool(audio_file: str) -> str:
+async def validate_audio_file_tool(audio_file: str) -> str:
     """验证音频文件
     
     Args:
@@ -249,8 +363,8 @@ def validate_audio_file_tool(audio_file: str) -> str:
         验证结果
     """
     try:
-        if validate_audio_file(audio_file):
-            duration = get_audio_duration(audio_file)
+        if await run_in_thread(validate_audio_file, audio_file):
+            duration = await run_in_thread(get_audio_duration, audio_file)
             return f"音频文件验证通过！文件有效，时长: {duration:.2f}秒"
         else:
             return f"音频文件验证失败: {audio_file} 不存在或格式无效"
@@ -258,7 +372,7 @@ def validate_audio_file_tool(audio_file: str) -> str:
         return f"验证音频文件时发生错误: {str(e)}"
 
 @mcp.tool()
-def get_audio_duration_tool(audio_file: str) -> str:
+async def get_audio_duration_tool(audio_file: str) -> str:
     """获取音频文件时长
     
     Args:
@@ -268,7 +382,7 @@ def get_audio_duration_tool(audio_file: str) -> str:
         音频时长信息
     """
     try:
-        duration = get_audio_duration(audio_file)
+        duration = await run_in_thread(get_audio_duration, audio_file)
         if duration > 0:
             return f"音频时长: {duration:.2f}秒 ({duration/60:.2f}分钟)"
         else:
@@ -277,15 +391,14 @@ def get_audio_duration_tool(audio_file: str) -> str:
         return f"获取音频时长时发生错误: {str(e)}"
 
 @mcp.tool()
-def list_available_voices() -> str:
+async def list_available_voices() -> str:
     """列出可用的语音音色
     
     Returns:
         可用语音音色列表
     """
     try:
-        # 使用asyncio运行异步函数
-        voices = asyncio.run(edge_tts.list_voices())
+        voices = await edge_tts.list_voices()
         
         # 过滤中文语音
         chinese_voices = [v for v in voices if v["Locale"].startswith("zh-CN")]
@@ -0,0 +1,224 @@
+"""
+批量渲染模块
+负责离线批量生成视频：逐行读取JSONL清单（每行一组 generate_auto_video 参数），
+通过与MCP工具相同的任务调度器和进程池执行，任务结束时追加写入结果JSONL，
+输出文件已存在的条目直接跳过，中断后重新运行只处理未完成的条目
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Optional
+
+from .mcp_tools import create_video_generation_task, wait_for_task, cancel_task
+from .process_pool import shutdown_process_pool
+from .thread_pool import shutdown_thread_pool
+from .config import get_config
+
+# 清单条目中可以使用的 generate_auto_video 参数
+MANIFEST_PARAMS = [
+    "video_path", "text", "voice_index", "output_path", "segments_mode", "segments",
+    "subtitle_style", "auto_split_config", "quality_preset", "enable_motion_clip", "motion_clip_params"
+]
+
+# 清单条目中的控制字段
+MANIFEST_CONTROL_FIELDS = ["id", "priority"]
+
+# 批量任务在调度器中使用的客户端标识
+BATCH_CLIENT_ID = "batch-cli"
+
+def parse_manifest_entry(line: str) -> Dict:
+    """解析清单中的一行
+
+    Args:
+        line: JSON对象字符串
+
+    Returns:
+        dict: generate_auto_video 参数（复杂参数转换为JSON字符串）和控制字段
+
+    Raises:
+        ValueError: 格式错误、缺少必填参数或包含未知参数
+    """
+    return validate_manifest_entry(json.loads(line))
+
+def validate_manifest_entry(entry: Dict) -> Dict:
+    """检查一组 generate_auto_video 参数
+
+    Args:
+        entry: 参数和控制字段
+
+    Returns:
+        dict: 复杂参数转换为JSON字符串后的条目
+
+    Raises:
+        ValueError: 缺少必填参数或包含未知参数
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("清单条目应为JSON对象")
+    unknown = [key for key in entry if key not in MANIFEST_PARAMS and key not in MANIFEST_CONTROL_FIELDS]
+    if unknown:
+        raise ValueError(f"未知参数: {unknown}")
+    for key in ("video_path", "output_path"):
+        if not entry.get(key):
+            raise ValueError(f"缺少必填参数: {key}")
+    for key in ("segments", "subtitle_style", "auto_split_config"):
+        if key in entry and not isinstance(entry[key], str):
+            entry[key] = json.dumps(entry[key], ensure_ascii=False)
+    return entry
+
+class BatchRunner:
+    """按清单批量提交视频生成任务，限制同时提交（排队或运行）的任务数"""
+
+    def __init__(self, results_path: str, max_in_flight: int, force: bool = False):
+        self.results_path = results_path
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.force = force
+        self.counts = {"completed": 0, "failed": 0, "cancelled": 0, "skipped": 0, "invalid": 0}
+        self._results_file = None
+        self._running = set()  # 已提交且尚未结束的任务ID
+
+    def write_result(self, record: Dict):
+        """追加写入一条结果并立即刷新，中断时已结束的条目不会丢失"""
+        self.counts[record["status"]] = self.counts.get(record["status"], 0) + 1
+        self._results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._results_file.flush()
+        print(f"[{record['status']}] {record['id']}: {record.get('output_path') or record.get('error')}")
+
+    async def run_entry(self, entry_id: str, entry: Dict) -> Dict:
+        """提交一个条目并等待任务结束
+
+        Args:
+            entry_id: 条目标识
+            entry: 解析后的清单条目
+
+        Returns:
+            dict: 结果记录
+        """
+        params = {key: entry[key] for key in MANIFEST_PARAMS if key in entry}
+        started = time.time()
+        created = await create_video_generation_task(
+            **params, priority=entry.get("priority") or None, client_id=BATCH_CLIENT_ID
+        )
+        record = {"id": entry_id, "output_path": params["output_path"]}
+        if created.startswith("错误"):
+            return {**record, "status": "invalid", "error": created}
+        task_id = json.loads(created)["task_id"]
+        record["task_id"] = task_id
+
+        # 任务可能在本进程执行，也可能由渲染工作进程执行
+        self._running.add(task_id)
+        try:
+            stored = await wait_for_task(task_id) or {}
+        finally:
+            self._running.discard(task_id)
+        status, result, error, failure_reason = (
+            stored.get("status", "failed"), stored.get("result"), stored.get("error"), stored.get("failure_reason")
+        )
+
+        record["status"] = status
+        record["elapsed_seconds"] = round(time.time() - started, 2)
+        if status == "completed":
+            try:
+                record["result"] = json.loads(result)
+            except (TypeError, ValueError):
+                record["result"] = result
+        elif status == "failed":
+            record["error"] = error
+            record["failure_reason"] = failure_reason
+        return record
+
+    async def _run_and_record(self, entry_id: str, entry: Dict, slots: asyncio.Semaphore):
+        try:
+            record = await self.run_entry(entry_id, entry)
+        except Exception as e:
+            record = {"id": entry_id, "output_path": entry.get("output_path"), "status": "failed",
+                      "error": f"错误：{e}", "failure_reason": "error"}
+        finally:
+            slots.release()
+        self.write_result(record)
+
+    async def run(self, manifest_path: str):
+        """逐行读取清单并执行，清单不会一次性读入内存
+
+        Args:
+            manifest_path: 清单文件路径
+        """
+        slots = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        with open(self.results_path, "a", encoding="utf-8") as results_file, \
+                open(manifest_path, "r", encoding="utf-8") as manifest:
+            self._results_file = results_file
+            try:
+                for line_no, line in enumerate(manifest, 1):
+                    if not line.strip():
+                        continue
+                    entry_id = str(line_no)
+                    try:
+                        entry = parse_manifest_entry(line)
+                        entry_id = str(entry.get("id", line_no))
+                    except ValueError as e:
+                        self.write_result({"id": entry_id, "status": "invalid", "error": f"错误：{e}"})
+                        continue
+
+                    output_path = entry["output_path"]
+                    # 输出视频写入临时文件后才改名（video_utils.atomic_output），存在即为完整的输出
+                    if not self.force and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                        self.write_result({"id": entry_id, "status": "skipped", "output_path": output_path})
+                        continue
+
+                    await slots.acquire()
+                    job = asyncio.create_task(self._run_and_record(entry_id, entry, slots))
+                    pending.add(job)
+                    job.add_done_callback(pending.discard)
+                if pending:
+                    await asyncio.gather(*pending)
+            except asyncio.CancelledError:
+                # 中断时取消所有进行中的任务（删除不完整的输出文件），下次运行会重新处理这些条目
+                for task_id in list(self._running):
+                    await cancel_task(task_id)
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+                raise
+
+def main(argv: Optional[list] = None) -> int:
+    """批量渲染命令行入口
+
+    Args:
+        argv: 命令行参数，为None时使用 sys.argv
+
+    Returns:
+        int: 退出码，有失败的条目时为1
+    """
+    parser = argparse.ArgumentParser(description="按JSONL清单批量生成视频（每行一组 generate_auto_video 参数）")
+    parser.add_argument("manifest", help="清单文件路径（JSONL）")
+    parser.add_argument("-o", "--results", help="结果文件路径（JSONL，追加写入），默认为 <清单>.results.jsonl")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="同时提交的任务数，默认为 SystemConfig.max_workers")
+    parser.add_argument("--force", action="store_true", help="输出文件已存在时也重新生成")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.manifest):
+        print(f"错误：清单文件不存在: {args.manifest}")
+        return 2
+    results_path = args.results or f"{os.path.splitext(args.manifest)[0]}.results.jsonl"
+    jobs = args.jobs or get_config().get_system_config().max_workers
+
+    runner = BatchRunner(results_path, jobs, args.force)
+    print(f"开始批量渲染: {args.manifest}，同时提交 {runner.max_in_flight} 个任务，结果写入 {results_path}")
+    try:
+        asyncio.run(runner.run(args.manifest))
+    except KeyboardInterrupt:
+        print("批量渲染已中断，重新运行将跳过已生成的输出")
+    finally:
+        shutdown_process_pool(wait=False)
+        shutdown_thread_pool(wait=False)
+
+    summary = ", ".join(f"{status} {count}" for status, count in runner.counts.items() if count)
+    print(f"批量渲染结束: {summary or '没有条目'}")
+    return 1 if runner.counts["failed"] or runner.counts["invalid"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,7 @@ class FFmpegConfig:
     """FFmpeg配置"""
     ffmpeg_path: str = "ffmpeg"
     ffprobe_path: str = "ffprobe"
-    timeout: int = 30
+    timeout: int = 30  # ffmpeg编码阶段没有新的 -progress 输出的最长时间（秒），超过后视为卡死并终止任务，0=不检测
     log_level: str = "error"
 
 @dataclass
@@ -23,6 +23,8 @@ class VoiceConfig:
     speech_synthesis_voice_name: str = "zh-CN-XiaoxiaoNeural"
     speech_synthesis_language: str = "zh-CN"
     speech_synthesis_output_format: str = "Audio-16khz-32kbitrate-Mono-MP3"
+    max_retries: int = 3  # 单个片段合成失败（限流、网络错误）时的重试次数
+    retry_delay: float = 1.0  # 第一次重试前的等待时间（秒），之后每次加倍
 
 @dataclass
 class AudioConfig:
@@ -117,9 +119,35 @@ class VideoConfig:
 @dataclass
 class SystemConfig:
     """系统配置"""
-    max_workers: int = 10
-    timeout: int = 300
+    max_workers: int = 10  # 同时运行的视频生成任务数上限，超出部分按优先级通道（interactive/normal/bulk）和客户端公平排队
+    max_tts_workers: int = 4  # 同时进行TTS合成（网络密集型）的任务数
+    max_tts_requests: int = 8  # 所有任务同时发出的TTS合成请求数（各任务的片段共用，按原顺序拼接），自动调整时为初始值
+    max_encode_workers: int = 0  # 同时进行剪辑/编码（CPU密集型）的任务数，0=按CPU核心数自动计算
+    max_process_workers: int = 0  # 执行CPU密集型处理阶段的进程池大小，0=CPU核心数
+    max_thread_workers: int = 0  # 执行工具中阻塞操作（音频解码、视频探测、数据库读写）的共享线程池大小，0=min(32, CPU核心数+4)
+    max_ffmpeg_processes: int = 0  # 同时运行的ffmpeg编码进程数上限（事件循环中启动的ffmpeg），0=CPU核心数
+    adaptive_concurrency: bool = True  # 按实测请求延迟和编码速度自动调整TTS请求/编码并发数（以上面的配置为初始值）
+    max_adaptive_tts_requests: int = 32  # 自动调整时同时发出的TTS合成请求数上限
+    interactive_reserved_workers: int = 1  # 为 interactive（预览）任务预留的并发槽位数
+    client_weights: Dict[str, float] = field(default_factory=dict)  # 客户端公平排队权重，未配置的客户端为1
+    memory_admission: bool = True  # 按估算峰值内存准入任务，可用内存不足时任务等待
+    memory_headroom_mb: int = 1024  # 准入任务时为系统保留的可用内存（MB）
+    timeout: int = 300  # 单个处理阶段（剪辑、语音合成、字幕渲染）取得资源槽位后的超时时间（秒），合成和编码阶段由ffmpeg进度停滞检测和 job_timeout 限制，0=不限制
+    job_timeout: int = 3600  # 整个任务从开始运行到结束的超时时间（秒，不含排队时间），0=不限制
     cleanup_temp_files: bool = True
+    task_db_path: str = ""  # 任务状态数据库路径，为空时使用 workspace/tasks.db
+    task_retention_hours: int = 72  # 已结束任务的保留时长（小时），0=永久保留
+    result_cache_dir: str = ""  # 结果缓存目录，为空时使用 workspace/result_cache
+    result_cache_size_mb: int = 2048  # 结果缓存容量上限（MB），0=禁用缓存
+    tts_cache_dir: str = ""  # TTS缓存目录，为空时使用 workspace/tts_cache
+    tts_cache_size_mb: int = 512  # TTS缓存容量上限（MB），0=禁用缓存
+    asset_db_path: str = ""  # 素材登记数据库路径，为空时使用 workspace/assets.db
+    render_queue_enabled: bool = False  # MCP服务只把任务写入渲染队列，由独立的渲染工作进程执行
+    render_queue_db_path: str = ""  # 渲染队列数据库路径，为空时使用 workspace/render_queue.db
+    render_lease_seconds: int = 30  # 渲染工作进程领取任务的租约时长（秒），超过该时间未续租的任务由其他工作进程重新领取
+    render_max_attempts: int = 3  # 任务最多被领取的次数，工作进程反复异常退出的任务不再重试
+    render_farm_dir: str = ""  # 渲染集群共享目录（各节点挂载到同一路径），设置后长视频的合成阶段按时间分块，由各节点的渲染工作进程领取
+    render_chunk_seconds: int = 60  # 合成阶段的分块时长（秒），视频时长超过该值时才分块，0=不分块
     debug_mode: bool = False
 
 @dataclass
@@ -141,6 +169,17 @@ class DuplicateFrameConfig:
     resize_for_comparison: bool = True
     comparison_size: Tuple[int, int] = (32, 32)
 
+@dataclass
+class WatchFolderConfig:
+    """监视文件夹配置"""
+    poll_interval: float = 2.0  # 扫描目录的间隔（秒）
+    stable_seconds: float = 5.0  # 文件大小和修改时间保持不变多久后视为写入完成（秒）
+    sidecar_wait_seconds: float = 30.0  # 视频写入完成后等待同名脚本/配置文件的最长时间（秒）
+    require_script: bool = False  # 是否只处理带有同名脚本（.txt）的视频
+    batch_window: float = 10.0  # 没有新文件就绪多久后提交一批（秒），连续拷贝大量文件时合并为一批
+    max_batch_size: int = 50  # 每批最多提交的文件数
+    priority: str = "bulk"  # 提交任务使用的优先级通道
+
 @dataclass
 class MainConfig:
     """主配置类"""
@@ -152,6 +191,7 @@ class MainConfig:
     system: SystemConfig = field(default_factory=SystemConfig)
     auto_split: AutoSplitConfig = field(default_factory=AutoSplitConfig)
     duplicate_frame: DuplicateFrameConfig = field(default_factory=DuplicateFrameConfig)
+    watch_folder: WatchFolderConfig = field(default_factory=WatchFolderConfig)
     
     workspace: str = "workspace"
 
@@ -185,6 +225,10 @@ class MainConfig:
     def get_duplicate_frame_config(self) -> DuplicateFrameConfig:
         """获取重复帧检测配置"""
         return self.duplicate_frame
+        
+    def get_watch_folder_config(self) -> WatchFolderConfig:
+        """获取监视文件夹配置"""
+        return self.watch_folder
 
 final_config = MainConfig()
 
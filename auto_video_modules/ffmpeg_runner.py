@@ -0,0 +1,290 @@
+"""
+FFmpeg进程管理模块
+负责启动ffmpeg/ffprobe子进程：在事件循环中用 asyncio 子进程执行，逐行解析stderr和 -progress 输出
+（只保留最后若干行用于报告错误，不在内存中缓存全部输出），限制同时运行的ffmpeg进程数，
+并按任务登记子进程，任务取消或超时时可以立即终止；进程池工作进程中使用同步的流式版本
+"""
+
+import os
+import asyncio
+import threading
+import subprocess
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Set
+
+from .config import get_config
+from .workspace_utils import current_work_dir, TaskTimeoutError
+from .task_progress import current_progress
+
+# 出错时保留的stderr最后行数
+STDERR_TAIL_LINES = 40
+
+# 每次从管道读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 单行的最大长度，超出部分丢弃（避免异常输出占用大量内存）
+MAX_LINE_LENGTH = 4096
+
+# 终止子进程时等待其退出的时间（秒），超时后强制结束
+TERMINATE_GRACE_SECONDS = 2.0
+
+class FFmpegError(subprocess.CalledProcessError):
+    """ffmpeg/ffprobe 以非零退出码结束，stderr 为最后若干行输出"""
+
+    def __str__(self):
+        message = f"{os.path.basename(str(self.cmd[0]))} 执行失败（退出码 {self.returncode}）"
+        if self.stderr:
+            message += f": {self.stderr}"
+        return message
+
+class _LineSplitter:
+    """把管道中读到的数据按 \\n 或 \\r 切分为行，只保留最后若干行"""
+
+    def __init__(self, tail_lines: int = STDERR_TAIL_LINES):
+        self.tail = deque(maxlen=tail_lines)
+        self._partial = b""
+
+    def feed(self, data: bytes) -> List[str]:
+        """写入新读到的数据，返回其中的完整行"""
+        data = (self._partial + data).replace(b"\r", b"\n")
+        *complete, self._partial = data.split(b"\n")
+        self._partial = self._partial[:MAX_LINE_LENGTH]
+        return self._collect(complete)
+
+    def close(self) -> List[str]:
+        """管道关闭时返回剩余的不完整行"""
+        rest, self._partial = self._partial, b""
+        return self._collect([rest])
+
+    def _collect(self, raw_lines: List[bytes]) -> List[str]:
+        lines = []
+        for raw in raw_lines:
+            line = raw[:MAX_LINE_LENGTH].decode("utf-8", errors="ignore").strip()
+            if line:
+                lines.append(line)
+                self.tail.append(line)
+        return lines
+
+    def text(self) -> str:
+        return "\n".join(self.tail)
+
+# 事件循环中正在运行的子进程：任务工作目录 -> PID
+_children: Dict[str, Set[int]] = {}
+_children_lock = threading.Lock()
+
+# 限制同时运行的ffmpeg进程数的信号量（与创建它的事件循环绑定）
+_slots: Optional[asyncio.Semaphore] = None
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+_running = 0
+_waiting = 0
+
+def get_ffmpeg_limit() -> int:
+    """获取同时运行的ffmpeg进程数上限（SystemConfig.max_ffmpeg_processes，0表示CPU核心数）"""
+    limit = get_config().get_system_config().max_ffmpeg_processes
+    if limit <= 0:
+        limit = os.cpu_count() or 1
+    return limit
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots = asyncio.Semaphore(get_ffmpeg_limit())
+        _slots_loop = loop
+    return _slots
+
+def _register(work_dir: Optional[str], pid: int):
+    with _children_lock:
+        _children.setdefault(work_dir or "", set()).add(pid)
+
+def _unregister(work_dir: Optional[str], pid: int):
+    with _children_lock:
+        pids = _children.get(work_dir or "")
+        if pids is not None:
+            pids.discard(pid)
+            if not pids:
+                _children.pop(work_dir or "", None)
+
+def get_task_ffmpeg_pids(work_dir: Optional[str]) -> List[int]:
+    """获取事件循环中为某个任务运行的ffmpeg子进程PID（可在其他线程中调用）
+
+    Args:
+        work_dir: 任务工作目录
+
+    Returns:
+        list: 子进程PID列表
+    """
+    if not work_dir:
+        return []
+    with _children_lock:
+        return list(_children.get(work_dir, ()))
+
+def get_ffmpeg_status() -> Dict:
+    """获取ffmpeg进程状态：上限、运行中和等待中的进程数"""
+    return {"limit": get_ffmpeg_limit(), "running": _running, "waiting": _waiting}
+
+def _with_progress_args(cmd: Sequence[str], progress_args: Sequence[str]) -> List[str]:
+    """在可执行文件之后插入进度输出参数（ffmpeg的全局选项需要位于输入文件之前）"""
+    cmd = list(cmd)
+    cmd[1:1] = list(progress_args)
+    return cmd
+
+async def _terminate(process: asyncio.subprocess.Process):
+    """终止子进程，超过 TERMINATE_GRACE_SECONDS 仍未退出时强制结束"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE_SECONDS)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+async def _read_lines(stream: asyncio.StreamReader, splitter: _LineSplitter, on_lines=None):
+    """逐块读取管道，按行交给 on_lines 处理"""
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        lines = splitter.feed(data) if data else splitter.close()
+        if lines and on_lines is not None:
+            on_lines(lines)
+        if not data:
+            return
+
+async def run_ffmpeg(cmd: Sequence[str], stage: Optional[str] = None, timeout: Optional[float] = None,
+                     capture_stdout: bool = False, limited: bool = True) -> str:
+    """在事件循环中执行ffmpeg/ffprobe命令，不阻塞事件循环
+
+    stderr 逐行读取，只保留最后 STDERR_TAIL_LINES 行用于报告错误。
+    指定 stage 时通过 -progress pipe:1 输出进度，逐行更新当前任务的进度跟踪器（同时用于检测进度停滞）。
+    子进程登记到当前任务的工作目录，任务取消（协程被取消或 terminate_task_processes）时立即终止。
+
+    Args:
+        cmd: 命令及参数
+        stage: 进度所属的处理阶段（cut/compose/mux/encode），为None时不输出进度
+        timeout: 超时时间（秒），超时后终止子进程并抛出 TaskTimeoutError，None表示不限制
+        capture_stdout: 是否返回stdout输出（与 stage 不能同时使用）
+        limited: 是否占用ffmpeg并发名额（版本、编码器探测等短时调用不占用）
+
+    Returns:
+        str: capture_stdout 为True时返回stdout输出，否则返回空字符串
+
+    Raises:
+        FFmpegError: 命令以非零退出码结束
+        TaskTimeoutError: 命令执行超时
+    """
+    global _running, _waiting
+    if stage and capture_stdout:
+        raise ValueError("stage 与 capture_stdout 不能同时使用")
+    slots = _get_slots() if limited else None
+    if slots is not None:
+        _waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            _waiting -= 1
+        _running += 1
+    try:
+        progress = current_progress.get() if stage else None
+        if progress is not None:
+            cmd = _with_progress_args(cmd, ["-progress", "pipe:1", "-nostats"])
+        return await _run_process(cmd, stage, progress, timeout, capture_stdout)
+    finally:
+        if slots is not None:
+            _running -= 1
+            slots.release()
+
+async def _run_process(cmd, stage, progress, timeout, capture_stdout) -> str:
+    work_dir = current_work_dir.get()
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE if (progress is not None or capture_stdout) else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _register(work_dir, process.pid)
+    stderr = _LineSplitter()
+    stdout_chunks: List[bytes] = []
+    readers = [_read_lines(process.stderr, stderr)]
+    if progress is not None:
+        readers.append(_read_lines(process.stdout, _LineSplitter(0),
+                                   lambda lines: progress.apply_ffmpeg_progress(stage, lines)))
+    elif capture_stdout:
+        async def read_stdout():
+            while True:
+                data = await process.stdout.read(READ_CHUNK_SIZE)
+                if not data:
+                    return
+                stdout_chunks.append(data)
+        readers.append(read_stdout())
+    try:
+        await asyncio.wait_for(asyncio.gather(*readers, process.wait()), timeout)
+    except asyncio.TimeoutError:
+        await _terminate(process)
+        name = os.path.basename(str(cmd[0]))
+        raise TaskTimeoutError(f"{name} 超过 {timeout:g} 秒未结束", stage=stage)
+    except BaseException:
+        # 协程被取消（任务取消、阶段超时）或读取失败时不留下孤儿进程
+        await _terminate(process)
+        raise
+    finally:
+        _unregister(work_dir, process.pid)
+    if process.returncode != 0:
+        raise FFmpegError(process.returncode, list(cmd), stderr=stderr.text())
+    return b"".join(stdout_chunks).decode("utf-8", errors="ignore")
+
+def run_ffmpeg_sync(cmd: Sequence[str], stage: Optional[str] = None, timeout: Optional[float] = None):
+    """在进程池工作进程（或线程）中执行ffmpeg命令，逐块读取stderr而不是一次性缓存全部输出
+
+    指定 stage 时通过 -progress 把进度写入任务工作目录，由主进程轮询读取。
+    工作进程已登记到任务工作目录，任务取消时由 terminate_task_processes 终止这里启动的子进程；
+    同时运行的进程数由进程池大小限制。
+
+    Args:
+        cmd: 命令及参数
+        stage: 进度所属的处理阶段，为None时不输出进度
+        timeout: 超时时间（秒），超时后终止子进程并抛出 TaskTimeoutError，None表示不限制
+
+    Raises:
+        FFmpegError: 命令以非零退出码结束
+        TaskTimeoutError: 命令执行超时
+    """
+    if stage:
+        from .task_progress import ffmpeg_progress_args
+        cmd = _with_progress_args(cmd, ffmpeg_progress_args(stage))
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    stderr = _LineSplitter()
+    try:
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        while True:
+            data = process.stderr.read1(READ_CHUNK_SIZE)
+            if not data:
+                stderr.close()
+                break
+            stderr.feed(data)
+        returncode = process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        process.stderr.close()
+    if timed_out.is_set():
+        raise TaskTimeoutError(f"{os.path.basename(str(cmd[0]))} 超过 {timeout:g} 秒未结束", stage=stage)
+    if returncode != 0:
+        raise FFmpegError(returncode, list(cmd), stderr=stderr.text())
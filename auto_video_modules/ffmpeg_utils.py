@@ -10,6 +10,8 @@ from pydub import AudioSegment
 import moviepy
 from moviepy.config import change_settings
 from mcp.server.fastmcp import FastMCP
+from .thread_pool import run_in_thread
+from .ffmpeg_runner import run_ffmpeg
 
 # 创建MCP实例
 mcp = FastMCP("ffmpeg-utils", log_level="ERROR")
@@ -78,7 +80,7 @@ async def check_ffmpeg_status() -> str:
         FFmpeg状态信息
     """
     try:
-        ffmpeg_path, ffprobe_path = check_ffmpeg()
+        ffmpeg_path, ffprobe_path = await run_in_thread(check_ffmpeg)
         return f"FFmpeg状态正常\nffmpeg: {ffmpeg_path}\nffprobe: {ffprobe_path}"
     except Exception as e:
         return f"FFmpeg状态异常: {str(e)}"
@@ -91,7 +93,7 @@ async def test_ffmpeg_functionality() -> str:
         测试结果信息
     """
     try:
-        if test_ffmpeg():
+        if await run_in_thread(test_ffmpeg):
             return "FFmpeg功能测试成功"
         else:
             return "FFmpeg功能测试失败"
@@ -106,16 +108,12 @@ async def get_ffmpeg_version() -> str:
         FFmpeg版本信息
     """
     try:
-        ffmpeg_path, _ = check_ffmpeg()
-        result = subprocess.run([ffmpeg_path, "-version"], 
-                              capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            # 提取版本信息
-            lines = result.stdout.split('\n')
-            version_line = lines[0] if lines else "未知版本"
-            return f"FFmpeg版本信息:\n{version_line}"
-        else:
-            return "无法获取FFmpeg版本信息"
+        ffmpeg_path, _ = await run_in_thread(check_ffmpeg)
+        output = await run_ffmpeg([ffmpeg_path, "-version"], timeout=10, capture_stdout=True, limited=False)
+        # 提取版本信息
+        lines = output.split('\n')
+        version_line = lines[0] if lines else "未知版本"
+        return f"FFmpeg版本信息:\n{version_line}"
     except Exception as e:
         return f"获取FFmpeg版本信息失败: {str(e)}"
 
@@ -272,7 +270,7 @@ async def check_gpu_acceleration() -> str:
         GPU加速支持信息
     """
     try:
-        gpu_info = check_gpu_support()
+        gpu_info = await run_in_thread(check_gpu_support)
         
         if not gpu_info["supported"]:
             return f"GPU加速不支持\n错误: {gpu_info.get('error', '未知错误')}"
@@ -285,9 +283,9 @@ async def check_gpu_acceleration() -> str:
         result += f"VAAPI编码器: {', '.join(gpu_info['vaapi_encoders']) if gpu_info['vaapi_encoders'] else '无'}\n"
         
         # 测试推荐的编码器
-        recommended_encoder = get_gpu_encoder("720p", "auto")
+        recommended_encoder = await run_in_thread(get_gpu_encoder, "720p", "auto")
         if recommended_encoder:
-            test_result = test_gpu_encoder(recommended_encoder)
+            test_result = await run_in_thread(test_gpu_encoder, recommended_encoder)
             result += f"推荐编码器: {recommended_encoder} ({'可用' if test_result else '不可用'})\n"
         
         return result
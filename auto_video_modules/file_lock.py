@@ -0,0 +1,36 @@
+"""
+文件锁模块
+负责在共用同一目录的多个进程（渲染工作进程、批量处理、MCP服务）之间互斥，
+POSIX系统使用 fcntl.flock，Windows使用 msvcrt.locking
+"""
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，用 msvcrt 锁定锁文件
+    fcntl = None
+    import msvcrt
+
+@contextmanager
+def file_lock(lock_path: str):
+    """持有锁文件的排他锁，其他进程在获得锁前阻塞等待
+
+    Args:
+        lock_path: 锁文件路径，不存在时创建
+    """
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -13,6 +13,9 @@ import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from mcp.server.fastmcp import FastMCP
+from .thread_pool import run_in_thread
+from .ffmpeg_runner import run_ffmpeg, FFmpegError
+from .workspace_utils import TaskTimeoutError
 
 # 创建MCP实例
 mcp = FastMCP("gpu-optimization-utils", log_level="ERROR")
@@ -310,7 +313,8 @@ def create_optimized_video_processor() -> GPUOptimizer:
 async def get_system_performance_info() -> str:
     """获取系统性能信息"""
     try:
-        optimizer = GPUOptimizer()
+        # 采集CPU使用率需要1秒，GPU信息需要调用外部命令，在线程池中执行
+        optimizer = await run_in_thread(GPUOptimizer)
         info = optimizer.system_info
         
         result = "=== 系统性能信息 ===\n"
@@ -326,7 +330,7 @@ async def get_system_performance_info() -> str:
 async def optimize_video_processing(video_path: str, target_quality: str = "720p") -> str:
     """优化视频处理参数"""
     try:
-        optimizer = GPUOptimizer()
+        optimizer = await run_in_thread(GPUOptimizer)
         config = optimizer.auto_optimize_config(video_path, target_quality)
         
         result = "=== 视频处理优化配置 ===\n"
@@ -353,7 +357,7 @@ async def benchmark_gpu_performance() -> str:
     try:
         import time
         
-        optimizer = GPUOptimizer()
+        optimizer = await run_in_thread(GPUOptimizer)
         config = optimizer.auto_optimize_config("test", "720p")
         
         # 创建测试视频
@@ -369,7 +373,10 @@ async def benchmark_gpu_performance() -> str:
         ]
         
         print("生成测试视频...")
-        subprocess.run(test_cmd, capture_output=True, timeout=30)
+        try:
+            await run_ffmpeg(test_cmd, timeout=30)
+        except (FFmpegError, TaskTimeoutError):
+            pass
         
         if not os.path.exists(test_input):
             return "无法生成测试视频"
@@ -382,8 +389,11 @@ async def benchmark_gpu_performance() -> str:
         print("开始性能测试...")
         start_time = time.time()
         
-        process = subprocess.Popen(optimized_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        process.wait()
+        try:
+            await run_ffmpeg(optimized_cmd)
+            succeeded = True
+        except FFmpegError:
+            succeeded = False
         
         end_time = time.time()
         processing_time = end_time - start_time
@@ -393,7 +403,7 @@ async def benchmark_gpu_performance() -> str:
             if os.path.exists(file):
                 os.remove(file)
         
-        if process.returncode == 0:
+        if succeeded:
             result = f"=== GPU性能基准测试结果 ===\n"
             result += f"处理时间: {processing_time:.2f}秒\n"
             result += f"平均速度: {10/processing_time:.2f}倍速\n"
@@ -5,12 +5,14 @@ MCP工具模块
 
 import os
 import asyncio
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 import json
+import shutil
 import subprocess
 from typing import Any, Dict, Optional
 import uuid
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 
@@ -20,25 +22,174 @@ from .voice_utils import get_voice_by_index, get_mcp_instance as get_voice_mcp
 from .audio_utils import synthesize_and_get_durations, get_mcp_instance as get_audio_mcp
 from .subtitle_utils import split_text, create_subtitle_image, get_mcp_instance as get_subtitle_mcp
 from .video_utils import create_video_with_subtitles, get_mcp_instance as get_video_mcp
+from .task_scheduler import get_scheduler, current_task_id, resolve_priority
+from .workspace_utils import (
+    create_task_workspace, cleanup_task_workspace, workspace_path,
+    get_task_workspace, current_work_dir, mark_cancelled, clear_cancelled, TaskTimeoutError
+)
+from .process_pool import run_in_process, terminate_task_processes
+from .thread_pool import run_in_thread
+from .ffmpeg_runner import run_ffmpeg, get_ffmpeg_status, FFmpegError
+from .task_progress import ProgressTracker, current_progress, get_current_progress, clear_progress_files
+from .task_deadline import (
+    run_with_deadline, expire_task, get_stage_timeout, get_job_timeout,
+    get_ffmpeg_stall_timeout, TIMEOUT_REASON
+)
+from .task_store import get_task_store, TERMINAL_STATUSES
+from .memory_admission import estimate_task_memory
+from .result_cache import get_result_cache, request_fingerprint
+from .tts_cache import get_tts_cache
+from .asset_registry import resolve_video_path, registered_video_info
+from .render_queue import get_render_queue, queue_enabled, JOB_GENERATE, JOB_BATCH
+from .render_farm import should_split, compose_in_chunks, farm_enabled, get_chunk_broker, remove_task_artifacts
+from .stage_graph import StageGraph
+from .task_notifications import create_notifier
+from .task_checkpoint import StageManifest, params_fingerprint, load_manifest, CHECKPOINT_STAGES
 
 # 创建主MCP实例
 mcp = FastMCP("auto-video-generator", log_level="ERROR")
 
-# 任务状态管理
-task_status = {}
+# 进行中的任务（实时进度、队列位置），任务状态同时持久化到任务存储中
+active_tasks = {}
+
+# 正在执行的请求：请求指纹 -> 任务，相同请求到达时等待该任务完成而不是重复渲染
+inflight_requests = {}
+
+# 尚未发送完成的任务结束通知（保留引用，避免后台任务被回收）
+pending_notifications = set()
 
 class VideoGenerationTask:
     """视频生成任务类"""
     def __init__(self, task_id: str, params: Dict):
         self.task_id = task_id
         self.params = params
-        self.status = "pending"  # pending, running, completed, failed
+        self.status = "pending"  # pending, queued, running, completed, failed, cancelled
         self.progress = 0
         self.result = None
         self.error = None
+        self.failure_reason = None  # 失败原因：timeout（超时）、error（处理错误）
         self.start_time = None
         self.end_time = None
         self.created_at = datetime.now()
+        self.progress_tracker = ProgressTracker()
+        self.fingerprint = None  # 请求指纹，用于结果缓存和合并相同请求
+        self.cached = False  # 结果是否来自缓存
+        self.coalesced_with = None  # 合并到的相同请求的任务ID
+        self.finished = asyncio.Event()
+        self.priority = resolve_priority(None, params.get("quality_preset"))  # 调度优先级通道
+        self.client_id = "default"  # 提交任务的客户端，用于客户端之间的公平排队
+        self.notifier = None  # 向创建任务的MCP会话推送进度和完成通知
+        self.memory_estimate = 0  # 估算的峰值内存（字节），用于内存准入
+        self.lease_lost = False  # 渲染队列中的租约已被其他工作进程接管，不再写入任务存储和输出文件
+    
+    def to_record(self) -> Dict:
+        """转换为任务存储记录"""
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "progress": self.progress,
+            "params": self.params,
+            "result": self.result,
+            "error": self.error,
+            "failure_reason": self.failure_reason,
+            "video_path": self.params.get("video_path", ""),
+            "text_length": len(self.params.get("text", "") or ""),
+            "created_at": self.created_at.timestamp(),
+            "priority": self.priority,
+            "client_id": self.client_id,
+            "start_time": self.start_time.timestamp() if self.start_time else None,
+            "end_time": self.end_time.timestamp() if self.end_time else None
+        }
+
+# 任务存储的写入在单独的线程中按提交顺序执行：不阻塞事件循环，同一任务的多次写入也不会乱序
+_store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+
+async def persist_task(task: VideoGenerationTask):
+    """把任务状态写入任务存储，存储失败不影响任务执行
+    
+    写入时的任务状态在调用时确定；等待写入的协程被取消时，已提交的写入仍会完成。
+    
+    Args:
+        task: 视频生成任务
+    """
+    record = task.to_record()
+    try:
+        await asyncio.get_running_loop().run_in_executor(_store_writer, lambda: get_task_store().save(record))
+    except Exception as e:
+        print(f"保存任务状态失败 {task.task_id}: {e}")
+
+def task_from_record(record: Dict) -> VideoGenerationTask:
+    """根据任务存储中的记录重建任务（恢复任务、渲染工作进程领取任务时使用）
+    
+    Args:
+        record: 任务存储记录
+        
+    Returns:
+        VideoGenerationTask: 状态为 pending 的任务
+    """
+    task = VideoGenerationTask(record["task_id"], record["params"])
+    task.created_at = datetime.fromtimestamp(record["created_at"])
+    # 恢复的任务保持原来的优先级通道和客户端（旧版本的记录中没有这两项）
+    if record.get("priority"):
+        task.priority = record["priority"]
+    if record.get("client_id"):
+        task.client_id = record["client_id"]
+    return task
+
+def resolve_client_id(client_id: Any = "", ctx: Optional[Context] = None) -> str:
+    """确定提交任务的客户端标识：优先使用显式传入的 client_id，其次使用MCP会话
+    
+    Args:
+        client_id: 调用方传入的客户端标识
+        ctx: MCP请求上下文
+        
+    Returns:
+        str: 客户端标识
+    """
+    if client_id:
+        return str(client_id)
+    if ctx is not None:
+        try:
+            if ctx.client_id:
+                return str(ctx.client_id)
+            return f"session-{id(ctx.session)}"
+        except Exception:
+            pass
+    return "default"
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """把任务存储中的时间戳转换为ISO格式字符串"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+def remove_partial_output(task: VideoGenerationTask):
+    """删除被取消任务写出的不完整输出文件（只删除任务开始后生成的文件）
+    
+    Args:
+        task: 视频生成任务
+    """
+    output_path = task.params.get("output_path")
+    if not output_path or not task.start_time or not os.path.exists(output_path):
+        return
+    try:
+        if os.path.getmtime(output_path) >= task.start_time.timestamp():
+            os.remove(output_path)
+            print(f"已删除不完整的输出文件: {output_path}")
+    except OSError as e:
+        print(f"删除不完整的输出文件失败 {output_path}: {e}")
+
+def report_encode_speed(stage: str, quality_preset: str, progress: ProgressTracker):
+    """上报编码阶段的实测速度（ffmpeg -progress 的 speed），用于自动调整编码并发
+    
+    Args:
+        stage: 编码阶段名
+        quality_preset: 画质预设，不同画质的编码速度分别比较
+        progress: 任务进度跟踪器
+    """
+    speed = progress.stages[stage].speed
+    if speed:
+        get_scheduler().report("encode", speed=speed, work_kind=f"{stage}:{str(quality_preset).lower()}")
 
 def cleanup_temp_files(temp_files):
     """清理临时文件
@@ -66,6 +217,8 @@ async def generate_video_with_subtitles(text, video_path, voice_index=0, output_
     Returns:
         bool: 是否成功
     """
+    work_dir = create_task_workspace(current_task_id.get())
+    work_dir_token = current_work_dir.set(work_dir)
     try:
         # 设置FFmpeg
         setup_ffmpeg()
@@ -92,26 +245,10 @@ async def generate_video_with_subtitles(text, video_path, voice_index=0, output_
         
         # 生成音频和获取时长
         from .audio_utils import synthesize_and_get_durations
-        tts_result = await synthesize_and_get_durations(timing, voice)
+        tts_result = await synthesize_and_get_durations(timing, voice, work_dir)
         audio_path = tts_result["audio_path"]
         segments = tts_result["segments"]
         
-        # 创建字幕图片
-        subtitle_images = []
-        for i, segment in enumerate(timing):
-            image_path = f"temp_subtitle_{i}.png"
-            from .video_utils import create_subtitle_image_pil
-            image_path = create_subtitle_image_pil(
-                segment["text"], 
-                fontsize=40, 
-                color='white', 
-                font_path=r"C:\Windows\Fonts\msyh.ttc",  # 使用微软雅黑
-                size=(1920, 1080),
-                bg_color=(0,0,0,0),
-                subtitle_height=100
-            )
-            subtitle_images.append(image_path)
-        
         # 创建带字幕的视频
         # 生成 (text, start, end) 三元组列表
         subtitle_tuples = []
@@ -123,17 +260,101 @@ async def generate_video_with_subtitles(text, video_path, voice_index=0, output_
             end = cur_time + duration
             subtitle_tuples.append((text, start, end))
             cur_time = end
-        success = create_video_with_subtitles(video_path, audio_path, subtitle_tuples, output_path)
-        
-        # 清理临时文件
-        temp_files = [audio_path] + subtitle_images
-        cleanup_temp_files(temp_files)
+        # 字幕图片在合成时于进程池中生成
+        success = await run_in_process(
+            create_video_with_subtitles,
+            video_path, audio_path, subtitle_tuples, output_path, work_dir=work_dir
+        )
         
         return success
         
     except Exception as e:
         print(f"生成视频失败: {e}")
         return False
+    finally:
+        # 清理任务工作目录
+        current_work_dir.reset(work_dir_token)
+        cleanup_task_workspace(work_dir)
+
+async def detect_motion_segments(video_path: str, motion_clip_params: Optional[dict] = None) -> str:
+    """运动检测阶段：检测视频中的静止片段
+    
+    Args:
+        video_path: 视频文件路径
+        motion_clip_params: 运动检测参数，为空时使用配置文件中的参数
+        
+    Returns:
+        str: 需要剪掉的静止片段（JSON数组字符串，配合 segments_mode="cut" 使用）
+    """
+    print("[自动检测] 启用帧间运动量自动剪辑...")
+    from .motion_detection_utils import detect_static_segments_by_motion, to_timestamp, load_motion_config
+    
+    # 加载配置参数
+    if motion_clip_params:
+        # 使用传入的参数
+        params = motion_clip_params
+    else:
+        # 使用配置文件中的参数
+        config = load_motion_config()
+        params = {
+            "motion_threshold": config.motion_threshold,
+            "min_static_duration": config.min_static_duration,
+            "sample_step": config.sample_step
+        }
+    
+    async with get_scheduler().resource("encode"):
+        static_segments = await detect_static_segments_by_motion(
+            video_path,
+            motion_threshold=params.get("motion_threshold", 0.1),
+            min_static_duration=params.get("min_static_duration", 2.0),
+            sample_step=params.get("sample_step", 1)
+        )
+    print(f"[自动检测] 检测到静止片段 {len(static_segments)} 个")
+    segments_list = [seg.to_dict() for seg in static_segments]
+    return json.dumps([{ "start": to_timestamp(s["start"]), "end": to_timestamp(s["end"])} for s in segments_list])
+
+async def cut_source_video(video_path: str, segments_list: list, segments_mode: str, work_dir: Optional[str], progress: ProgressTracker):
+    """剪辑阶段：获取视频信息并按片段配置剪辑视频
+    
+    Args:
+        video_path: 视频文件路径
+        segments_list: 片段配置列表，为空时使用全部视频内容
+        segments_mode: 片段模式（keep 保留 / cut 剪掉）
+        work_dir: 工作目录，剪辑后的视频保存在该目录中
+        progress: 进度跟踪器
+        
+    Returns:
+        tuple: (剪辑后的视频路径, 视频信息)，剪辑失败时返回原视频
+    """
+    # 获取视频信息（已登记的素材直接使用登记的探测信息；CPU密集型和阻塞调用都在进程池中执行，保持事件循环响应）
+    from .video_utils import get_video_info
+    video_info = await run_in_thread(registered_video_info, video_path) or await run_in_process(get_video_info, video_path)
+    
+    # 处理视频片段剪辑
+    clipped_video_path = video_path  # 默认使用原视频
+    if segments_list:
+        from .video_utils import parse_video_segments, clip_video_to_file
+        video_duration = video_info.get('duration', 0)
+        keep_intervals = parse_video_segments(segments_list, video_duration, segments_mode)
+        
+        # 执行视频剪辑，剪辑后的视频保存到临时文件
+        try:
+            print(f"开始视频片段剪辑 - 模式: {segments_mode}, 片段数: {len(segments_list)}")
+            temp_clipped_path = workspace_path(work_dir, "temp_clipped_video.mp4")
+            async with get_scheduler().resource("encode"):
+                progress.start("cut", sum(e - s for s, e in keep_intervals))
+                video_info = await run_in_process(clip_video_to_file, video_path, keep_intervals, temp_clipped_path)
+            clipped_video_path = temp_clipped_path
+        
+        except Exception as e:
+            print(f"视频剪辑失败，使用原视频: {e}")
+            clipped_video_path = video_path
+        progress.complete("cut")
+    else:
+        print("未指定视频片段，使用全部视频内容")
+        progress.skip("cut")
+    
+    return clipped_video_path, video_info
 
 @mcp.tool()
 async def generate_auto_video(
@@ -154,35 +375,32 @@ async def generate_auto_video(
     """
     新增：enable_motion_clip, motion_clip_params
     """
+    # 每个任务使用独立的工作目录存放中间文件，避免并发任务互相覆盖
+    try:
+        video_path = await run_in_thread(resolve_video_path, video_path)
+    except ValueError as e:
+        return f"错误：{e}"
+    work_dir = create_task_workspace(current_task_id.get())
+    work_dir_token = current_work_dir.set(work_dir)
+    succeeded = False
     try:
         import json
-        # 运动检测逻辑
-        if enable_motion_clip:
-            print("[自动检测] 启用帧间运动量自动剪辑...")
-            from .motion_detection_utils import detect_static_segments_by_motion, to_timestamp, load_motion_config
-            
-            # 加载配置参数
-            if motion_clip_params:
-                # 使用传入的参数
-                params = motion_clip_params
-            else:
-                # 使用配置文件中的参数
-                config = load_motion_config()
-                params = {
-                    "motion_threshold": config.motion_threshold,
-                    "min_static_duration": config.min_static_duration,
-                    "sample_step": config.sample_step
-                }
-            
-            static_segments = await detect_static_segments_by_motion(
-                video_path,
-                motion_threshold=params.get("motion_threshold", 0.1),
-                min_static_duration=params.get("min_static_duration", 2.0),
-                sample_step=params.get("sample_step", 1)
-            )
-            print(f"[自动检测] 检测到静止片段 {len(static_segments)} 个")
-            segments_list = [seg.to_dict() for seg in static_segments]
-            segments = json.dumps([{ "start": to_timestamp(s["start"]), "end": to_timestamp(s["end"])} for s in segments_list])
+        # 各阶段完成后在工作目录中记录检查点，恢复任务时跳过已完成的阶段
+        manifest = StageManifest(work_dir, params_fingerprint({
+            "video_path": video_path, "text": text, "voice_index": voice_index,
+            "output_path": output_path, "segments_mode": segments_mode, "segments": segments,
+            "subtitle_style": subtitle_style, "auto_split_config": auto_split_config,
+            "quality_preset": quality_preset, "enable_motion_clip": enable_motion_clip,
+            "motion_clip_params": motion_clip_params
+        }))
+        cut_checkpoint = manifest.completed("cut")
+        
+        # 剪辑阶段已完成时直接使用记录的剪辑片段；启用运动检测时片段在剪辑阶段中检测
+        if cut_checkpoint is not None:
+            segments = cut_checkpoint["segments"]
+            segments_mode = cut_checkpoint["segments_mode"]
+        elif enable_motion_clip:
+            segments = ""
             segments_mode = "cut"
         
         # 验证输入参数
@@ -242,41 +460,52 @@ async def generate_auto_video(
         # 设置FFmpeg
         setup_ffmpeg()
         
-        # 获取视频信息
+        # 阶段进度跟踪（不在异步任务中运行时使用临时跟踪器）
+        progress = get_current_progress() or ProgressTracker()
+        
         from .video_utils import get_video_info
-        video_info = get_video_info(video_path)
-        
-        # 处理视频片段剪辑
-        clipped_video_path = video_path  # 默认使用原视频
-        if segments_list:
-            from .video_utils import parse_video_segments, clip_video_segments
-            video_duration = video_info.get('duration', 0)
-            keep_intervals = parse_video_segments(segments_list, video_duration, segments_mode)
-            
-            # 执行视频剪辑
-            try:
-                print(f"开始视频片段剪辑 - 模式: {segments_mode}, 片段数: {len(segments_list)}")
-                final_clip = clip_video_segments(video_path, keep_intervals)
-                
-                # 保存剪辑后的视频到临时文件
-                clipped_video_path = "temp_clipped_video.mp4"
-                final_clip.write_videofile(clipped_video_path, codec='libx264', fps=24, audio=False)
-                final_clip.close()
-                
-                print(f"视频剪辑完成，保存到: {clipped_video_path}")
-                
-                # 更新视频信息
-                from .video_utils import get_video_info
-                video_info = get_video_info(clipped_video_path)
-                
-            except Exception as e:
-                print(f"视频剪辑失败，使用原视频: {e}")
-                clipped_video_path = video_path
-        else:
-            print("未指定视频片段，使用全部视频内容")
         
         # 检查是否有文本需要处理
         has_text = text and text.strip()
+        if has_text:
+            progress.skip("encode")
+        else:
+            progress.skip("tts", "subtitle", "compose", "mux")
+        
+        # 处理流水线按阶段的输入输出组成依赖图：剪辑分支（运动检测、剪辑）与
+        # 语音分支（语音合成、字幕渲染）互不依赖，同时执行，合成阶段等待两个分支完成
+        # 单个阶段取得资源槽位后运行超过 SystemConfig.timeout 时终止任务的子进程并以超时失败；
+        # 合成、音视频合成和转码阶段的耗时随视频时长增长，不限制单阶段时间，由ffmpeg进度停滞检测和任务总超时限制
+        graph = StageGraph(get_stage_timeout(), lambda stage: expire_task(work_dir))
+        
+        async def cut_stage():
+            if cut_checkpoint is not None:
+                print("[恢复] 复用已完成的剪辑阶段")
+                if cut_checkpoint["video_path"] == video_path:
+                    progress.skip("cut")
+                else:
+                    progress.complete("cut")
+                return {
+                    "clipped_video_path": cut_checkpoint["video_path"],
+                    "video_info": cut_checkpoint["video_info"],
+                    "segments": cut_checkpoint["segments"]
+                }
+            stage_segments, stage_segments_list = segments, segments_list
+            if enable_motion_clip:
+                stage_segments = await detect_motion_segments(video_path, motion_clip_params)
+                stage_segments_list = json.loads(stage_segments)
+            clipped_video_path, video_info = await cut_source_video(
+                video_path, stage_segments_list, segments_mode, work_dir, progress
+            )
+            manifest.mark_completed("cut", {
+                "video_path": clipped_video_path,
+                "video_info": video_info,
+                "segments": stage_segments,
+                "segments_mode": segments_mode
+            }, [clipped_video_path], graph.descendants("cut"))
+            return {"clipped_video_path": clipped_video_path, "video_info": video_info, "segments": stage_segments}
+        
+        graph.add("cut", cut_stage, outputs=["clipped_video_path", "video_info", "segments"])
         
         if has_text:
             # 有文本时，进行文本转语音和字幕处理
@@ -301,15 +530,6 @@ async def generate_auto_video(
                 timing = [{"text": text, "duration": 0}]
                 print("智能分割已关闭，使用完整文本")
             
-            # 生成音频和获取时长
-            from .audio_utils import synthesize_and_get_durations
-            tts_result = await synthesize_and_get_durations(timing, voice)
-            audio_path = tts_result["audio_path"]
-            segments_with_duration = tts_result["segments"]
-            
-            # 创建字幕图片
-            subtitle_images = []
-            
             # 获取默认字幕配置和画质配置
             from .config import get_config
             config = get_config()
@@ -325,175 +545,160 @@ async def generate_auto_video(
             font_size = subtitle_config.get('fontSize', subtitle_config_default.font_size)
             color = subtitle_config.get('color', subtitle_config_default.font_color)
             bg_color = tuple(subtitle_config.get('bgColor', subtitle_config_default.bg_color))
-            margin_x = subtitle_config.get('marginX', subtitle_config_default.margin_x)
-            margin_bottom = subtitle_config.get('marginBottom', subtitle_config_default.margin_bottom)
             subtitle_height = subtitle_config.get('height', 100)
             
-            # 使用segments_with_duration生成字幕图片，确保与音频同步
-            for i, segment in enumerate(segments_with_duration):
-                # 跳过空白静默片段，不生成字幕图片
-                if not segment["text"].strip():
-                    subtitle_images.append(None)  # 标记为静默片段
-                    continue
-                    
-                # 使用create_subtitle_image_pil生成numpy数组
-                from .video_utils import create_subtitle_image_pil
-                img_array = create_subtitle_image_pil(
-                    segment["text"], 
-                    fontsize=font_size, 
-                    color=color, 
-                    font_path=font_path,
-                    size=(target_width, target_height),
-                    bg_color=bg_color,
-                    subtitle_height=subtitle_height
-                )
-                subtitle_images.append(img_array)
+            async def tts_stage():
+                # 生成音频和获取时长
+                from .audio_utils import synthesize_and_get_durations
+                tts_result = manifest.completed("tts")
+                if tts_result is not None:
+                    print("[恢复] 复用已合成的语音")
+                else:
+                    async with get_scheduler().resource("tts"):
+                        progress.start("tts")
+                        tts_result = await synthesize_and_get_durations(timing, voice, work_dir)
+                    manifest.mark_completed("tts", tts_result, [tts_result["audio_path"]], graph.descendants("tts"))
+                progress.complete("tts")
+                return {"audio_path": tts_result["audio_path"], "segments_with_duration": tts_result["segments"]}
+            
+            async def subtitle_stage(segments_with_duration):
+                # 使用segments_with_duration生成字幕图片，确保与音频同步
+                # 字幕图片在进程池中渲染并保存到工作目录，只传回文件路径（静默片段为None）
+                from .video_utils import render_subtitle_images
+                subtitle_checkpoint = manifest.completed("subtitle")
+                if subtitle_checkpoint is not None:
+                    print("[恢复] 复用已渲染的字幕图片")
+                    subtitle_images = subtitle_checkpoint["images"]
+                else:
+                    async with get_scheduler().resource("encode"):
+                        progress.start("subtitle")
+                        subtitle_images = await run_in_process(
+                            render_subtitle_images,
+                            [segment["text"] for segment in segments_with_duration],
+                            (target_width, target_height),
+                            font_path=font_path,
+                            fontsize=font_size,
+                            color=color,
+                            bg_color=bg_color,
+                            subtitle_height=subtitle_height,
+                            work_dir=work_dir
+                        )
+                    manifest.mark_completed("subtitle", {"images": subtitle_images}, subtitle_images, graph.descendants("subtitle"))
+                progress.complete("subtitle")
+                return {"subtitle_images": subtitle_images}
             
-            # 创建带字幕的视频
-            # 生成 (text, start, end) 三元组列表
-            subtitle_tuples = []
-            cur_time = 0.0
-            for seg in segments_with_duration:
-                text = seg["text"]
-                duration = seg.get("duration", 0)
-                start = cur_time
-                end = cur_time + duration
-                subtitle_tuples.append((text, start, end))
-                cur_time = end
+            async def compose_stage(clipped_video_path, video_info, audio_path, segments_with_duration, subtitle_images):
+                # 创建带字幕的视频
+                # 生成 (text, start, end) 三元组列表
+                subtitle_tuples = []
+                cur_time = 0.0
+                for seg in segments_with_duration:
+                    duration = seg.get("duration", 0)
+                    start = cur_time
+                    end = cur_time + duration
+                    subtitle_tuples.append((seg["text"], start, end))
+                    cur_time = end
+                
+                # 创建视频（传递画质配置），进度由工作进程中ffmpeg的 -progress 输出提供
+                from .video_utils import compose_subtitle_video
+                composed = manifest.completed("compose")
+                if composed is not None:
+                    print("[恢复] 复用已合成的字幕视频")
+                    progress.complete("compose")
+                elif should_split(video_info.get("duration")):
+                    # 配置了渲染集群时，长视频按时间分块由各节点渲染，本节点拼接
+                    task_id = os.path.basename(work_dir)
+                    task = active_tasks.get(task_id)
+                    composed = await compose_in_chunks(
+                        task_id, clipped_video_path, audio_path, subtitle_tuples,
+                        subtitle_config, subtitle_images, quality_preset, work_dir,
+                        video_info["duration"], task.priority if task else "normal", progress
+                    )
+                    manifest.mark_completed("compose", composed, [composed["video_path"], composed["audio_path"]], graph.descendants("compose"))
+                else:
+                    async with get_scheduler().resource("encode"):
+                        progress.expect("compose", video_info.get("duration"))
+                        composed = await run_in_process(
+                            compose_subtitle_video,
+                            clipped_video_path, audio_path, subtitle_tuples,
+                            subtitle_config, subtitle_images, quality_preset, work_dir
+                        )
+                    report_encode_speed("compose", quality_preset, progress)
+                    manifest.mark_completed("compose", composed, [composed["video_path"], composed["audio_path"]], graph.descendants("compose"))
+                return {"composed": composed}
             
-            # 创建视频（传递画质配置）
-            success = create_video_with_subtitles(clipped_video_path, audio_path, subtitle_tuples, output_path, subtitle_config, subtitle_images, quality_preset)
+            async def mux_stage(composed, video_info):
+                if manifest.completed("mux") is not None:
+                    print("[恢复] 复用已生成的输出视频")
+                    progress.complete("mux")
+                    return {"success": True}
+                # 纯ffmpeg阶段不占用进程池，直接在事件循环中运行ffmpeg并读取其进度输出
+                from .video_utils import build_mux_command, atomic_output
+                async with get_scheduler().resource("encode"):
+                    progress.expect("mux", video_info.get("duration"))
+                    with atomic_output(output_path) as part_path:
+                        mux_cmd = await run_in_thread(
+                            build_mux_command,
+                            composed["video_path"], composed["audio_path"], part_path,
+                            composed["duration"], quality_preset
+                        )
+                        print("正在使用ffmpeg合成音视频...")
+                        await run_ffmpeg(mux_cmd, stage="mux")
+                    print('处理完成! 输出文件:', output_path)
+                report_encode_speed("mux", quality_preset, progress)
+                manifest.mark_completed("mux", {"output_path": output_path}, [output_path])
+                return {"success": True}
             
-            # 清理临时文件
-            temp_files = [audio_path]
-            if clipped_video_path != video_path and os.path.exists(clipped_video_path):
-                temp_files.append(clipped_video_path)
-            cleanup_temp_files(temp_files)
+            graph.add("tts", tts_stage, outputs=["audio_path", "segments_with_duration"])
+            graph.add("subtitle", subtitle_stage, inputs=["segments_with_duration"], outputs=["subtitle_images"])
+            graph.add("compose", compose_stage,
+                      inputs=["clipped_video_path", "video_info", "audio_path", "segments_with_duration", "subtitle_images"],
+                      outputs=["composed"], timed=False)
+            graph.add("mux", mux_stage, inputs=["composed", "video_info"], outputs=["success"], timed=False)
             
         else:
             # 没有文本时，只进行视频处理（剪辑、画质调整等）
             print("未检测到文本内容，仅进行视频处理...")
             
-            # 获取画质配置
-            from .config import get_config
-            config = get_config()
-            video_config = config.get_video_config()
-            
-            # 如果指定了画质预设，则应用画质配置
-            if quality_preset:
-                video_config.set_quality(quality_preset)
-                print(f"应用画质配置: {quality_preset}")
-            
-            # 获取目标分辨率和比特率
-            target_width, target_height = video_config.get_resolution_by_quality()
-            target_bitrate = video_config.get_bitrate_by_quality()
-            
-            print(f"目标分辨率: {target_width}x{target_height}")
-            print(f"目标比特率: {target_bitrate}")
-            
-            # 使用ffmpeg直接处理视频（无音频、无字幕）
-            from .ffmpeg_utils import check_ffmpeg, get_gpu_encoder
-            ffmpeg_path, _ = check_ffmpeg()
-            
-            # 选择编码器
-            if enable_gpu_acceleration:
-                print("[GPU加速] 启用极致GPU硬件编码加速...")
-                try:
-                    from .gpu_optimization_utils import GPUOptimizer
-                    
-                    # 创建GPU优化器
-                    optimizer = GPUOptimizer()
-                    gpu_config = optimizer.auto_optimize_config(clipped_video_path, quality_preset)
-                    
-                    print(f"[GPU加速] 使用优化编码器: {gpu_config.encoder}")
-                    print(f"[GPU加速] 线程数: {gpu_config.threads}")
-                    print(f"[GPU加速] 异步深度: {gpu_config.async_depth}")
-                    print(f"[GPU加速] 缓冲区: {gpu_config.buffer_size}MB")
-                    
-                    # 构建优化的FFmpeg命令
-                    optimized_cmd = optimizer.build_optimized_ffmpeg_command(
-                        clipped_video_path, output_path, gpu_config,
-                        additional_params={
-                            "b:v": target_bitrate,
-                            "s": f"{target_width}x{target_height}"
-                        }
-                    )
-                    
-                    # 执行优化的命令
-                    print("[GPU加速] 开始极致性能处理...")
-                    import subprocess
-                    result = subprocess.run(optimized_cmd, capture_output=True, text=True)
-                    
-                    if result.returncode == 0:
-                        print(f"[GPU加速] 处理完成: {output_path}")
-                    else:
-                        print(f"[GPU加速] 处理失败，回退到标准处理: {result.stderr}")
-                        # 回退到标准GPU处理
-                        gpu_encoder = get_gpu_encoder(quality_preset, gpu_type)
-                        if gpu_encoder:
-                            video_codec = gpu_encoder
-                            print(f"使用标准GPU编码器: {gpu_encoder}")
-                        else:
-                            video_codec = "libx264"
-                            print("GPU加速不可用，使用CPU编码器: libx264")
-                        
-                        cmd = [
-                            ffmpeg_path, "-y",
-                            "-i", clipped_video_path,
-                            "-c:v", video_codec,
-                            "-b:v", target_bitrate,
-                            "-s", f"{target_width}x{target_height}",
-                            "-c:a", "copy",  # 保持原音频
-                            output_path
-                        ]
-                        subprocess.run(cmd, check=True, capture_output=True)
-                        print(f"视频处理完成: {output_path}")
-                        
-                except Exception as e:
-                    print(f"[GPU加速] 极致优化失败，使用标准处理: {e}")
-                    # 回退到标准GPU处理
-                    gpu_encoder = get_gpu_encoder(quality_preset, gpu_type)
-                    if gpu_encoder:
-                        video_codec = gpu_encoder
-                        print(f"使用标准GPU编码器: {gpu_encoder}")
-                    else:
-                        video_codec = "libx264"
-                        print("GPU加速不可用，使用CPU编码器: libx264")
-                    
-                    cmd = [
-                        ffmpeg_path, "-y",
-                        "-i", clipped_video_path,
-                        "-c:v", video_codec,
-                        "-b:v", target_bitrate,
-                        "-s", f"{target_width}x{target_height}",
-                        "-c:a", "copy",  # 保持原音频
-                        output_path
-                    ]
-                    import subprocess
-                    subprocess.run(cmd, check=True, capture_output=True)
+            async def encode_stage(clipped_video_path, video_info):
+                # 按画质预设转码，ffmpeg直接在事件循环中运行；GPU优化命令失败时依次回退到标准编码命令
+                from .video_utils import build_transcode_commands, atomic_output
+                async with get_scheduler().resource("encode"):
+                    progress.expect("encode", video_info.get("duration"))
+                    success = False
+                    with atomic_output(output_path) as part_path:
+                        commands = await run_in_thread(
+                            build_transcode_commands,
+                            clipped_video_path, part_path, quality_preset,
+                            enable_gpu_acceleration, gpu_type
+                        )
+                        for index, encode_cmd in enumerate(commands):
+                            try:
+                                await run_ffmpeg(encode_cmd, stage="encode")
+                            except FFmpegError as e:
+                                if index == len(commands) - 1:
+                                    raise
+                                print(f"[GPU加速] 处理失败，回退到标准处理: {e}")
+                                continue
+                            success = True
+                            break
                     print(f"视频处理完成: {output_path}")
-            else:
-                video_codec = "libx264"
-                print("使用CPU编码器: libx264")
-                
-                cmd = [
-                    ffmpeg_path, "-y",
-                    "-i", clipped_video_path,
-                    "-c:v", video_codec,
-                    "-b:v", target_bitrate,
-                    "-s", f"{target_width}x{target_height}",
-                    "-c:a", "copy",  # 保持原音频
-                    output_path
-                ]
-                
-                import subprocess
-                subprocess.run(cmd, check=True, capture_output=True)
-                print(f"视频处理完成: {output_path}")
-            success = True
+                report_encode_speed("encode", quality_preset, progress)
+                return {"success": success}
+            
+            graph.add("encode", encode_stage, inputs=["clipped_video_path", "video_info"], outputs=["success"], timed=False)
+        
+        stage_results = await graph.run()
+        success = stage_results["success"]
+        video_info = stage_results["video_info"]
+        segments = stage_results["segments"]
+        segments_list = json.loads(segments) if segments else []
+        if "segments_with_duration" in stage_results:
+            segments_with_duration = stage_results["segments_with_duration"]
         
         if success:
             # 获取输出视频信息
-            output_info = get_video_info(output_path)
+            output_info = await run_in_process(get_video_info, output_path)
             absolute_output_path = os.path.abspath(output_path)
             
             # 构建结果信息
@@ -519,12 +724,27 @@ async def generate_auto_video(
                 result["text_segments"] = len(timing) if 'timing' in locals() else 1
                 result["audio_segments"] = len(segments_with_duration) if 'segments_with_duration' in locals() else 0
             
+            succeeded = True
             return json.dumps(result, ensure_ascii=False, indent=2)
         else:
             return "错误：视频生成失败"
         
+    except TaskTimeoutError as e:
+        if current_task_id.get() is not None:
+            # 异步任务由任务执行器记录为超时失败
+            raise
+        return f"错误：{str(e)}"
     except Exception as e:
         return f"错误：生成视频时发生异常 - {str(e)}"
+    finally:
+        current_work_dir.reset(work_dir_token)
+        if succeeded or current_task_id.get() is None:
+            # 任务结束后清理工作目录，以及分块合成失败时保留在渲染集群中的视频块
+            cleanup_task_workspace(work_dir)
+            remove_task_artifacts(os.path.basename(work_dir))
+        else:
+            # 异步任务失败时保留工作目录中的检查点和中间产物，供 resume_task 恢复
+            print(f"任务未完成，保留工作目录用于恢复: {work_dir}")
 
 @mcp.tool()
 async def get_system_status() -> str:
@@ -548,12 +768,67 @@ async def get_system_status() -> str:
         output_dir = os.getcwd()
         output_status = f"输出目录: {output_dir}"
         
+        # 检查任务调度状态
+        scheduler_status = get_scheduler().get_status()
+        queue_lines = "\n".join(
+            f"- {name}: 运行中 {info['active']}/{info['limit']}, 排队 {info['waiting']}"
+            + (f", 自动调整并发上限（范围 {info['adaptive']['min']}-{info['adaptive']['max']}）" if "adaptive" in info else "")
+            for name, info in scheduler_status.items()
+        )
+        ffmpeg_info = get_ffmpeg_status()
+        queue_lines += (
+            f"\n- ffmpeg进程: 运行中 {ffmpeg_info['running']}/{ffmpeg_info['limit']}, 等待 {ffmpeg_info['waiting']}"
+        )
+        
+        # 检查内存准入
+        memory_info = get_scheduler().memory.get_status()
+        memory_status = (
+            f"内存准入: {'开启' if memory_info['enabled'] else '关闭'}, "
+            f"可用 {memory_info['available_bytes'] / 1024 / 1024:.0f} MB, "
+            f"已预留 {memory_info['reserved_bytes'] / 1024 / 1024:.0f} MB（{memory_info['running']} 个任务）, "
+            f"等待 {memory_info['waiting']}"
+        )
+        
+        # 检查渲染队列（任务由独立的渲染工作进程执行时）
+        render_status = ""
+        if queue_enabled():
+            render_info = await run_in_thread(get_render_queue().get_status)
+            render_status = (
+                f"\n渲染队列: 排队 {render_info['queued']}, 等待相同请求 {render_info['waiting']}, 执行中 {render_info['claimed']}"
+                f"（{render_info['busy_workers']} 个工作进程）, 等待重新领取 {render_info['expired']}"
+            )
+        if farm_enabled():
+            farm_info = await run_in_thread(get_chunk_broker().get_status)
+            render_status += (
+                f"\n渲染集群视频块: 排队 {farm_info['queued']}, 渲染中 {farm_info['claimed']}"
+                f"（{farm_info['busy_workers']} 个节点）, 等待重新领取 {farm_info['expired']}"
+            )
+        
+        # 检查结果缓存
+        cache_info = await run_in_thread(get_result_cache().get_status)
+        cache_status = (
+            f"结果缓存: {cache_info['entries']} 条, "
+            f"{cache_info['size_bytes'] / 1024 / 1024:.1f}/{cache_info['max_bytes'] / 1024 / 1024:.0f} MB, "
+            f"命中 {cache_info['hits']} 次, 未命中 {cache_info['misses']} 次"
+        )
+        tts_cache_info = await run_in_thread(get_tts_cache().get_status)
+        cache_status += (
+            f"\nTTS缓存: {tts_cache_info['entries']} 条, "
+            f"{tts_cache_info['size_bytes'] / 1024 / 1024:.1f}/{tts_cache_info['max_bytes'] / 1024 / 1024:.0f} MB, "
+            f"命中 {tts_cache_info['hits']} 次, 未命中 {tts_cache_info['misses']} 次"
+        )
+        
         return f"""系统状态检查:
 
 {ffmpeg_status}
 {voice_status}
 {output_status}
 
+任务调度:
+{queue_lines}
+{memory_status}{render_status}
+{cache_status}
+
 模块状态:
 - FFmpeg工具: 正常
 - 语音工具: 正常
@@ -605,7 +880,7 @@ async def validate_input_parameters(text: str, video_path: str, voice_index: int
     
     Args:
         text: 要转换的文本
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         voice_index: 语音音色索引
         
     Returns:
@@ -622,12 +897,17 @@ async def validate_input_parameters(text: str, video_path: str, voice_index: int
             warnings.append("文本内容较长，处理时间可能较长")
         
         # 验证视频文件
-        if not os.path.exists(video_path):
-            errors.append(f"视频文件不存在: {video_path}")
+        try:
+            video_path = await run_in_thread(resolve_video_path, video_path)
+        except ValueError as e:
+            errors.append(str(e))
         else:
-            file_size = os.path.getsize(video_path)
-            if file_size > 100 * 1024 * 1024:  # 100MB
-                warnings.append("视频文件较大，处理时间可能较长")
+            if not os.path.exists(video_path):
+                errors.append(f"视频文件不存在: {video_path}")
+            else:
+                file_size = os.path.getsize(video_path)
+                if file_size > 100 * 1024 * 1024:  # 100MB
+                    warnings.append("视频文件较大，处理时间可能较长")
         
         # 验证语音音色
         if voice_index < 0 or voice_index > 4:
@@ -652,12 +932,13 @@ async def get_generation_estimate(text: str, video_path: str) -> str:
     
     Args:
         text: 要转换的文本
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         
     Returns:
         时间估算信息
     """
     try:
+        video_path = await run_in_thread(resolve_video_path, video_path)
         # 文本长度估算
         text_length = len(text)
         from .subtitle_utils import split_text
@@ -668,7 +949,7 @@ async def get_generation_estimate(text: str, video_path: str) -> str:
         if os.path.exists(video_path):
             try:
                 from .video_utils import get_video_info
-                info = get_video_info(video_path)
+                info = await run_in_thread(registered_video_info, video_path) or await run_in_thread(get_video_info, video_path)
                 if "error" not in info and isinstance(info.get('duration'), (int, float)):
                     video_duration = float(info['duration'])
             except:
@@ -734,7 +1015,8 @@ async def generate_auto_video_mcp(
     auto_split_config: Any = "",
     quality_preset: Any = "720p",
     enable_motion_clip: Any = False,
-    motion_clip_params: Any = None
+    motion_clip_params: Any = None,
+    ctx: Context = None
 ) -> str:
     import json
     if not isinstance(segments, str):
@@ -746,7 +1028,8 @@ async def generate_auto_video_mcp(
     return await create_video_generation_task(
         video_path, text, voice_index, output_path,
         segments_mode, segments, subtitle_style, auto_split_config, quality_preset,
-        enable_motion_clip, motion_clip_params
+        enable_motion_clip, motion_clip_params,
+        client_id=resolve_client_id("", ctx), notifier=create_notifier(ctx)
     )
 
 async def create_video_generation_task(
@@ -760,10 +1043,18 @@ async def create_video_generation_task(
     auto_split_config: str = "",
     quality_preset: str = "720p",
     enable_motion_clip: bool = False,
-    motion_clip_params: Optional[dict] = None
+    motion_clip_params: Optional[dict] = None,
+    priority: Optional[str] = None,
+    client_id: str = "default",
+    notifier=None
 ) -> str:
     """创建视频生成任务（异步）"""
     task_id = str(uuid.uuid4())
+    try:
+        video_path = await run_in_thread(resolve_video_path, video_path)
+        lane = resolve_priority(priority, quality_preset)
+    except ValueError as e:
+        return f"错误：{e}"
     
     task = VideoGenerationTask(task_id, {
         "video_path": video_path,
@@ -778,49 +1069,309 @@ async def create_video_generation_task(
         "enable_motion_clip": enable_motion_clip,
         "motion_clip_params": motion_clip_params
     })
+    task.priority = lane
+    task.client_id = client_id
+    task.notifier = notifier
+    
+    task.fingerprint = await run_in_thread(request_fingerprint, task.params)
     
-    task_status[task_id] = task
+    # 相同请求（包括输出路径）正在执行时直接返回该任务
+    leader = inflight_requests.get(task.fingerprint) if task.fingerprint else None
+    if leader is not None and os.path.abspath(str(leader.params["output_path"])) == os.path.abspath(str(output_path)):
+        return json.dumps({
+            "task_id": leader.task_id,
+            "status": "attached",
+            "message": "相同的视频生成任务正在执行，已合并到该任务，请使用 get_task_status 查询进度"
+        }, ensure_ascii=False)
     
-    # 启动异步任务
-    asyncio.create_task(run_video_generation_task(task))
+    await persist_task(task)
+    await dispatch_task(task)
     
     return json.dumps({
         "task_id": task_id,
         "status": "created",
+        "priority": lane,
         "message": "视频生成任务已创建，请使用 get_task_status 查询进度"
     }, ensure_ascii=False)
 
+async def dispatch_task(task: VideoGenerationTask):
+    """提交已持久化的任务：启用渲染队列时写入队列（在线程池中执行，队列写锁繁忙时不阻塞事件循环），
+    由渲染工作进程执行；否则交给本进程的调度器，超出并发上限的任务会在队列中等待
+    
+    Args:
+        task: 视频生成任务
+    """
+    if queue_enabled():
+        # 相同请求正在队列中时，本任务等待其结束后再由工作进程领取（通常直接命中结果缓存）
+        await run_in_thread(
+            get_render_queue().enqueue,
+            task.task_id, JOB_GENERATE, {}, task.priority, task.client_id, task.fingerprint
+        )
+        follow_queued_task(task)
+        return
+    active_tasks[task.task_id] = task
+    get_scheduler().submit(task.task_id, run_video_generation_task(task))
+
+def follow_queued_task(task: VideoGenerationTask):
+    """在后台把渲染工作进程执行的任务的状态变化推送给创建任务的客户端"""
+    if task.notifier is None:
+        return
+    watcher = asyncio.create_task(watch_queued_task(task.task_id, task.notifier))
+    pending_notifications.add(watcher)
+    watcher.add_done_callback(pending_notifications.discard)
+
+async def watch_queued_task(task_id: str, notifier, interval: float = 1.0):
+    """轮询任务存储，在状态或进度变化时推送通知，任务结束后推送结束通知
+    
+    Args:
+        task_id: 任务ID
+        notifier: 任务通知器
+        interval: 轮询间隔（秒）
+    """
+    while not notifier.closed:
+        record = await run_in_thread(get_task_store().get, task_id)
+        if record is None:
+            return
+        info = await run_in_thread(describe_record, record)
+        if record["status"] in TERMINAL_STATUSES:
+            await notifier.finished(info)
+            return
+        await notifier.progress(info)
+        await asyncio.sleep(interval)
+
+async def wait_for_task(task_id: str, poll_interval: float = 1.0) -> Optional[Dict]:
+    """等待任务结束：本进程执行的任务等待其结束事件，渲染工作进程执行的任务轮询任务存储
+    
+    Args:
+        task_id: 任务ID
+        poll_interval: 轮询间隔（秒）
+        
+    Returns:
+        dict: 任务结束后的存储记录，任务不存在时返回None
+    """
+    task = active_tasks.get(task_id)
+    if task is not None:
+        await task.finished.wait()
+    while True:
+        record = await run_in_thread(get_task_store().get, task_id)
+        if record is None or record["status"] in TERMINAL_STATUSES:
+            return record
+        await asyncio.sleep(poll_interval)
+
+def describe_task(task: VideoGenerationTask) -> Dict:
+    """获取进行中任务的实时状态（get_task_status 和任务通知共用）
+    
+    Args:
+        task: 视频生成任务
+        
+    Returns:
+        dict: 任务状态
+    """
+    if task.status == "running":
+        task.progress = task.progress_tracker.percent
+    
+    result = {
+        "task_id": task.task_id,
+        "status": task.status,
+        "progress": task.progress,
+        "created_at": task.created_at.isoformat(),
+        "start_time": task.start_time.isoformat() if task.start_time else None,
+        "end_time": task.end_time.isoformat() if task.end_time else None
+    }
+    
+    # 排队中的任务返回队列位置
+    if task.status in ["pending", "queued", "running"]:
+        result["queue_position"] = get_scheduler().queue_position(task.task_id)
+    
+    result["priority"] = task.priority
+    if task.memory_estimate:
+        result["memory_estimate_mb"] = round(task.memory_estimate / 1024 / 1024)
+    
+    # 合并到相同请求或命中缓存的任务
+    if task.coalesced_with:
+        result["coalesced_with"] = task.coalesced_with
+    if task.cached:
+        result["cached"] = True
+    
+    # 运行中的任务返回各阶段进度和基于实测编码速度的剩余时间估算
+    if task.status == "running":
+        detail = task.progress_tracker.to_dict()
+        result["stage"] = detail["stage"]
+        result["stages"] = detail["stages"]
+        result["eta_seconds"] = detail["eta_seconds"]
+    
+    if task.status == "completed":
+        result["result"] = task.result
+    elif task.status == "failed":
+        result["error"] = task.error
+        result["failure_reason"] = task.failure_reason
+    
+    return result
+
+async def complete_from_result(task: VideoGenerationTask, source_path: str, result: str):
+    """用已有的输出视频和结果完成任务（复制到本任务的输出路径）
+    
+    Args:
+        task: 视频生成任务
+        source_path: 已生成的视频文件
+        result: 已有的结果JSON字符串
+    """
+    output_path = task.params["output_path"]
+    if not (os.path.exists(output_path) and os.path.samefile(source_path, output_path)):
+        await run_in_thread(shutil.copyfile, source_path, output_path)
+    result_info = json.loads(result)
+    result_info["absolute_output_path"] = os.path.abspath(output_path)
+    result_info["cached"] = True
+    task.result = json.dumps(result_info, ensure_ascii=False, indent=2)
+    task.cached = True
+    task.progress = 100
+    task.status = "completed"
+    task.end_time = datetime.now()
+
+async def reuse_identical_request(task: VideoGenerationTask) -> bool:
+    """复用相同请求的结果：命中缓存时直接完成，相同请求正在执行时等待其完成后复用其输出
+    
+    Args:
+        task: 视频生成任务
+        
+    Returns:
+        bool: 任务是否已经完成（无需再渲染）
+    """
+    if not task.fingerprint:
+        return False
+    while True:
+        cached = await run_in_thread(get_result_cache().get, task.fingerprint)
+        if cached is not None:
+            print(f"命中结果缓存: {task.task_id}")
+            await complete_from_result(task, cached["video_path"], cached["result"])
+            return True
+        
+        leader = inflight_requests.get(task.fingerprint)
+        if leader is None:
+            # 由本任务执行渲染，之后到达的相同请求会等待本任务
+            inflight_requests[task.fingerprint] = task
+            return False
+        
+        task.coalesced_with = leader.task_id
+        print(f"任务 {task.task_id} 等待相同请求 {leader.task_id} 完成")
+        await leader.finished.wait()
+        if leader.status == "completed" and os.path.exists(leader.params["output_path"]):
+            await complete_from_result(task, leader.params["output_path"], leader.result)
+            return True
+        if leader.status == "failed":
+            task.status = "failed"
+            task.error = leader.error
+            task.failure_reason = leader.failure_reason
+            task.end_time = datetime.now()
+            return True
+        # 相同请求被取消，重新检查缓存或由本任务执行
+
 async def run_video_generation_task(task: VideoGenerationTask):
     """运行视频生成任务"""
+    # 各阶段通过上下文获取本任务的进度跟踪器
+    current_progress.set(task.progress_tracker)
+    watcher = None
+    notify_watcher = None
     try:
-        task.status = "running"
-        task.start_time = datetime.now()
-        task.progress = 10
-        
-        # 执行视频生成
-        result = await generate_auto_video(
-            task.params["video_path"],
-            task.params["text"],
-            task.params["voice_index"],
-            task.params["output_path"],
-            task.params["segments_mode"],
-            task.params["segments"],
-            task.params["subtitle_style"],
-            task.params["auto_split_config"],
-            task.params["quality_preset"],
-            task.params["enable_motion_clip"],
-            task.params["motion_clip_params"]
-        )
+        task.status = "queued"
+        await persist_task(task)
+        if task.notifier is not None:
+            # 状态、阶段和进度变化时推送通知，客户端无需轮询 get_task_status
+            notify_watcher = asyncio.create_task(task.notifier.watch(lambda: describe_task(task)))
+        if await reuse_identical_request(task):
+            return
+        # 按源视频分辨率、时长和字幕数量估算峰值内存，内存不足时在取得槽位后等待
+        task.memory_estimate = await run_in_thread(estimate_task_memory, task.params)
+        async with get_scheduler().job_slot(task.task_id, task.priority, task.client_id, task.memory_estimate):
+            if task.status == "cancelled":
+                return
+            task.status = "running"
+            task.start_time = datetime.now()
+            await persist_task(task)
+            
+            # 轮询工作目录中由进程池写出的进度（字幕渲染计数、ffmpeg -progress）
+            work_dir = get_task_workspace(task.task_id)
+            clear_progress_files(work_dir)
+            watcher = asyncio.create_task(task.progress_tracker.watch(work_dir))
+            
+            # 执行视频生成，整个任务超过 SystemConfig.job_timeout、
+            # 或ffmpeg超过 FFmpegConfig.timeout 没有进度输出时终止任务
+            result = await run_with_deadline(
+                generate_auto_video(
+                    task.params["video_path"],
+                    task.params["text"],
+                    task.params["voice_index"],
+                    task.params["output_path"],
+                    task.params["segments_mode"],
+                    task.params["segments"],
+                    task.params["subtitle_style"],
+                    task.params["auto_split_config"],
+                    task.params["quality_preset"],
+                    task.params["enable_motion_clip"],
+                    task.params["motion_clip_params"]
+                ),
+                work_dir,
+                timeout=get_job_timeout(),
+                progress=task.progress_tracker,
+                stall_timeout=get_ffmpeg_stall_timeout()
+            )
         
+        if task.status == "cancelled":
+            remove_partial_output(task)
+            return
+        task.end_time = datetime.now()
+        if isinstance(result, str) and result.startswith("错误"):
+            # generate_auto_video 以 "错误：" 开头的字符串报告失败
+            task.status = "failed"
+            task.error = result
+            task.failure_reason = "error"
+            return
         task.progress = 100
         task.status = "completed"
         task.result = result
-        task.end_time = datetime.now()
         
+        # 写入结果缓存，之后的相同请求直接复用
+        if task.fingerprint:
+            await run_in_thread(get_result_cache().put, task.fingerprint, task.params["output_path"], result)
+        
+    except asyncio.CancelledError:
+        if task.lease_lost:
+            # 任务已由其他工作进程接管，输出文件和任务记录归新的领取者所有
+            raise
+        task.status = "cancelled"
+        task.end_time = task.end_time or datetime.now()
+        remove_partial_output(task)
+        raise
+    except TaskTimeoutError as e:
+        # 超时单独记录失败原因，便于告警；工作目录保留，可以用 resume_task 恢复
+        print(f"任务超时 {task.task_id}: {e}")
+        task.status = "failed"
+        task.error = f"错误：{str(e)}"
+        task.failure_reason = TIMEOUT_REASON
+        task.end_time = datetime.now()
+        remove_partial_output(task)
     except Exception as e:
         task.status = "failed"
         task.error = str(e)
+        task.failure_reason = "error"
         task.end_time = datetime.now()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if notify_watcher is not None:
+            notify_watcher.cancel()
+        if task.fingerprint and inflight_requests.get(task.fingerprint) is task:
+            inflight_requests.pop(task.fingerprint, None)
+        task.finished.set()
+        # 任务结束后只保留存储中的记录（租约已被接管时记录归新的领取者所有）
+        if not task.lease_lost:
+            await persist_task(task)
+            active_tasks.pop(task.task_id, None)
+        # 在后台推送结束通知，不阻塞取消流程
+        if task.notifier is not None and not task.lease_lost:
+            notification = asyncio.create_task(notify_task_finished(task))
+            pending_notifications.add(notification)
+            notification.add_done_callback(pending_notifications.discard)
 
 @mcp.tool()
 async def generate_auto_video_async(
@@ -834,8 +1385,17 @@ async def generate_auto_video_async(
     auto_split_config: Any = "",
     quality_preset: Any = "720p",
     enable_motion_clip: Any = False,
-    motion_clip_params: Any = None
+    motion_clip_params: Any = None,
+    priority: Any = "",
+    client_id: Any = "",
+    ctx: Context = None
 ) -> str:
+    """异步视频生成，立即返回任务ID
+    
+    priority 可选 interactive（预览，低延迟）、normal、bulk（批量，使用剩余算力），
+    未指定时按画质预设推导：240p/360p 为 interactive，1080p 为 bulk。
+    同一通道内按 client_id（未指定时使用MCP会话）在客户端之间公平排队。
+    """
     import json
     if not isinstance(segments, str):
         segments = json.dumps(segments, ensure_ascii=False)
@@ -846,9 +1406,211 @@ async def generate_auto_video_async(
     return await create_video_generation_task(
         video_path, text, voice_index, output_path,
         segments_mode, segments, subtitle_style, auto_split_config, quality_preset,
-        enable_motion_clip, motion_clip_params
+        enable_motion_clip, motion_clip_params,
+        priority or None, resolve_client_id(client_id, ctx), create_notifier(ctx)
     )
 
+@mcp.tool()
+async def generate_auto_video_batch(
+    video_path: Any,
+    variants: Any,
+    segments_mode: Any = "keep",
+    segments: Any = "",
+    quality_preset: Any = "720p",
+    enable_motion_clip: Any = False,
+    motion_clip_params: Any = None,
+    priority: Any = "",
+    client_id: Any = "",
+    ctx: Context = None
+) -> str:
+    """批量生成同一源视频的多个版本（不同文案、音色或字幕样式）
+    
+    源视频的信息获取、运动检测和片段剪辑只执行一次，之后每个版本作为独立任务
+    进入调度队列，并行进行语音合成和渲染。
+    
+    Args:
+        video_path: 源视频文件路径或素材ID
+        variants: 版本列表（JSON数组），每项可包含 text、voice_index、output_path、
+            subtitle_style、auto_split_config、quality_preset，未指定 output_path 时自动命名
+        segments_mode: 片段模式（keep 保留 / cut 剪掉），所有版本共用
+        segments: 片段配置（JSON数组），所有版本共用
+        quality_preset: 默认画质预设
+        enable_motion_clip: 是否启用运动检测自动剪辑
+        motion_clip_params: 运动检测参数
+        priority: 优先级通道（interactive/normal/bulk），未指定时按各版本的画质预设推导
+        client_id: 客户端标识，未指定时使用MCP会话
+        
+    Returns:
+        批次ID和各版本的任务ID
+    """
+    if not isinstance(segments, str):
+        segments = json.dumps(segments, ensure_ascii=False)
+    if isinstance(variants, str):
+        try:
+            variants = json.loads(variants)
+        except json.JSONDecodeError:
+            return "错误：variants 参数JSON格式错误"
+    if not isinstance(variants, list) or not variants:
+        return "错误：variants 参数应为非空JSON数组"
+    try:
+        video_path = await run_in_thread(resolve_video_path, video_path)
+    except ValueError as e:
+        return f"错误：{e}"
+    if not os.path.exists(video_path):
+        return f"错误：视频文件不存在: {video_path}"
+    
+    try:
+        if priority:
+            resolve_priority(priority)
+    except ValueError as e:
+        return f"错误：{e}"
+    client = resolve_client_id(client_id, ctx)
+    notifier = create_notifier(ctx)
+    
+    batch_id = str(uuid.uuid4())
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    tasks = []
+    output_paths = set()
+    for index, variant in enumerate(variants):
+        if not isinstance(variant, dict):
+            return f"错误：variants 第 {index + 1} 项应为JSON对象"
+        output_path = variant.get("output_path") or f"{base_name}_variant_{index + 1}.mp4"
+        if os.path.abspath(output_path) in output_paths:
+            return f"错误：variants 第 {index + 1} 项的输出路径重复: {output_path}"
+        output_paths.add(os.path.abspath(output_path))
+        subtitle_style = variant.get("subtitle_style", "")
+        auto_split_config = variant.get("auto_split_config", "")
+        tasks.append(VideoGenerationTask(str(uuid.uuid4()), {
+            "video_path": video_path,
+            "text": variant.get("text", ""),
+            "voice_index": variant.get("voice_index", 0),
+            "output_path": output_path,
+            "segments_mode": segments_mode,
+            "segments": segments,
+            "subtitle_style": subtitle_style if isinstance(subtitle_style, str) else json.dumps(subtitle_style, ensure_ascii=False),
+            "auto_split_config": auto_split_config if isinstance(auto_split_config, str) else json.dumps(auto_split_config, ensure_ascii=False),
+            "quality_preset": variant.get("quality_preset", quality_preset),
+            "enable_motion_clip": enable_motion_clip,
+            "motion_clip_params": motion_clip_params
+        }))
+    
+    for task in tasks:
+        if priority:
+            task.priority = resolve_priority(priority)
+        task.client_id = client
+        task.notifier = notifier
+        task.fingerprint = await run_in_thread(request_fingerprint, task.params)
+        await persist_task(task)
+    
+    if queue_enabled():
+        # 整个批次作为一个任务写入渲染队列，由同一个工作进程分析源视频后渲染各版本
+        await run_in_thread(get_render_queue().enqueue, batch_id, JOB_BATCH, {
+            "task_ids": [task.task_id for task in tasks],
+            "priority": tasks[0].priority if priority else None
+        }, tasks[0].priority, client)
+        for task in tasks:
+            follow_queued_task(task)
+    else:
+        # 源视频分析在批次协程中执行，完成后再把各版本任务提交给调度器
+        for task in tasks:
+            active_tasks[task.task_id] = task
+        get_scheduler().submit(batch_id, run_video_batch(batch_id, tasks))
+    
+    return json.dumps({
+        "batch_id": batch_id,
+        "task_ids": [task.task_id for task in tasks],
+        "status": "created",
+        "message": f"已创建 {len(tasks)} 个视频生成任务，源视频分析完成后开始渲染，请使用 get_task_status 查询各任务进度"
+    }, ensure_ascii=False)
+
+async def notify_task_finished(task: VideoGenerationTask):
+    """向创建任务的客户端推送任务结束通知"""
+    if task.notifier is None:
+        return
+    info = describe_task(task)
+    info.pop("stages", None)
+    await task.notifier.finished(info)
+
+async def finish_task(task: VideoGenerationTask, status: str, error: Optional[str] = None,
+                      failure_reason: str = "error"):
+    """结束尚未提交给调度器的任务"""
+    if task.status != "cancelled":
+        task.status = status
+        task.error = error
+        if status == "failed":
+            task.failure_reason = failure_reason
+    task.end_time = task.end_time or datetime.now()
+    task.finished.set()
+    await persist_task(task)
+    active_tasks.pop(task.task_id, None)
+    await notify_task_finished(task)
+
+async def run_video_batch(batch_id: str, tasks: list):
+    """执行批次：分析并剪辑一次源视频，为每个版本写入剪辑阶段检查点后提交渲染任务
+    
+    Args:
+        batch_id: 批次ID
+        tasks: 各版本的视频生成任务（共用源视频和片段参数）
+    """
+    shared = tasks[0].params
+    work_dir = create_task_workspace(batch_id)
+    work_dir_token = current_work_dir.set(work_dir)
+    
+    async def analyze_source():
+        segments, segments_mode = shared["segments"], shared["segments_mode"]
+        if shared["enable_motion_clip"]:
+            segments = await detect_motion_segments(shared["video_path"], shared["motion_clip_params"])
+            segments_mode = "cut"
+        segments_list = json.loads(segments) if segments else []
+        if not isinstance(segments_list, list):
+            raise ValueError("segments 参数格式错误，应为JSON数组")
+        clipped_video_path, video_info = await cut_source_video(
+            shared["video_path"], segments_list, segments_mode, work_dir, ProgressTracker()
+        )
+        return segments, segments_mode, clipped_video_path, video_info
+    
+    try:
+        # 源视频分析相当于各版本的剪辑阶段，同样受单个阶段的超时限制
+        segments, segments_mode, clipped_video_path, video_info = await run_with_deadline(
+            analyze_source(), work_dir, timeout=get_stage_timeout()
+        )
+    except TaskTimeoutError as e:
+        for task in tasks:
+            await finish_task(task, "failed", f"错误：源视频分析超时 - {str(e)}", TIMEOUT_REASON)
+        cleanup_task_workspace(work_dir)
+        return
+    except Exception as e:
+        for task in tasks:
+            await finish_task(task, "failed", f"错误：源视频分析失败 - {str(e)}")
+        cleanup_task_workspace(work_dir)
+        return
+    finally:
+        current_work_dir.reset(work_dir_token)
+    
+    # 各版本的剪辑阶段直接复用批次的剪辑结果
+    scheduler = get_scheduler()
+    submitted = []
+    for task in tasks:
+        if task.status == "cancelled":
+            await finish_task(task, "cancelled")
+            continue
+        StageManifest(create_task_workspace(task.task_id), params_fingerprint(task.params)).mark_completed("cut", {
+            "video_path": clipped_video_path,
+            "video_info": video_info,
+            "segments": segments,
+            "segments_mode": segments_mode
+        }, [clipped_video_path])
+        scheduler.submit(task.task_id, run_video_generation_task(task))
+        submitted.append(task)
+    print(f"批次 {batch_id} 源视频分析完成，已提交 {len(submitted)} 个渲染任务")
+    
+    # 所有版本成功后删除共用的剪辑视频，有失败的版本时保留，供 resume_task 恢复
+    await asyncio.gather(*(task.finished.wait() for task in submitted))
+    if all(task.status == "completed" for task in submitted):
+        cleanup_task_workspace(work_dir)
+    else:
+        print(f"批次 {batch_id} 有未完成的任务，保留源视频剪辑结果: {work_dir}")
+
 @mcp.tool()
 async def get_task_status(task_id: str) -> str:
     """获取任务状态
@@ -859,51 +1621,91 @@ async def get_task_status(task_id: str) -> str:
     Returns:
         任务状态信息
     """
-    if task_id not in task_status:
-        return json.dumps({
-            "error": "任务不存在",
-            "task_id": task_id
-        }, ensure_ascii=False)
+    task = active_tasks.get(task_id)
+    if task is None:
+        # 已结束（或服务重启前）的任务和渲染工作进程执行的任务从任务存储中读取
+        record = await run_in_thread(get_task_store().get, task_id)
+        if record is None:
+            return json.dumps({
+                "error": "任务不存在",
+                "task_id": task_id
+            }, ensure_ascii=False)
+        return json.dumps(await run_in_thread(describe_record, record), ensure_ascii=False, indent=2)
     
-    task = task_status[task_id]
+    return json.dumps(describe_task(task), ensure_ascii=False, indent=2)
+
+def describe_record(record: Dict) -> Dict:
+    """获取任务存储记录对应的任务状态（会查询渲染队列，在线程池中调用）
     
+    Args:
+        record: 任务存储记录
+        
+    Returns:
+        dict: 任务状态
+    """
     result = {
-        "task_id": task_id,
-        "status": task.status,
-        "progress": task.progress,
-        "created_at": task.created_at.isoformat(),
-        "start_time": task.start_time.isoformat() if task.start_time else None,
-        "end_time": task.end_time.isoformat() if task.end_time else None
+        "task_id": record["task_id"],
+        "status": record["status"],
+        "progress": record["progress"],
+        "created_at": format_timestamp(record["created_at"]),
+        "start_time": format_timestamp(record["start_time"]),
+        "end_time": format_timestamp(record["end_time"])
     }
-    
-    if task.status == "completed":
-        result["result"] = task.result
-    elif task.status == "failed":
-        result["error"] = task.error
-    
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    if record["status"] in ["pending", "queued"] and queue_enabled():
+        position = get_render_queue().position(record["task_id"])
+        if position is not None:
+            result["queue_position"] = {"queue": "render", "position": position}
+    if record["status"] == "completed":
+        result["result"] = record["result"]
+    elif record["status"] == "failed":
+        result["error"] = record["error"]
+        result["failure_reason"] = record.get("failure_reason")
+    return result
 
 @mcp.tool()
-async def list_all_tasks() -> str:
-    """列出所有任务
+async def list_all_tasks(status: str = "", limit: int = 50, cursor: str = "") -> str:
+    """分页列出任务（按创建时间倒序，不包含任务结果）
     
+    Args:
+        status: 按状态过滤（pending/queued/running/completed/failed/cancelled），为空时列出全部
+        limit: 每页数量，最大500
+        cursor: 上一页返回的 next_cursor，为空时从最新的任务开始
+        
     Returns:
-        所有任务列表
+        任务列表和下一页游标
     """
+    store = get_task_store()
+    try:
+        rows, next_cursor = await run_in_thread(store.list, status or None, limit, cursor or None)
+        total = await run_in_thread(store.count, status or None)
+    except ValueError:
+        return json.dumps({
+            "error": "cursor 参数无效",
+            "cursor": cursor
+        }, ensure_ascii=False)
+    
     tasks = []
-    for task_id, task in task_status.items():
+    for row in rows:
+        task = active_tasks.get(row["task_id"])
+        if task is not None:
+            # 进行中的任务使用内存中的实时状态
+            if task.status == "running":
+                task.progress = task.progress_tracker.percent
+            row["status"] = task.status
+            row["progress"] = task.progress
         tasks.append({
-            "task_id": task_id,
-            "status": task.status,
-            "progress": task.progress,
-            "created_at": task.created_at.isoformat(),
-            "video_path": task.params.get("video_path", ""),
-            "text_length": len(task.params.get("text", ""))
+            "task_id": row["task_id"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "created_at": format_timestamp(row["created_at"]),
+            "video_path": row["video_path"],
+            "text_length": row["text_length"]
         })
     
     return json.dumps({
-        "total_tasks": len(tasks),
-        "tasks": tasks
+        "total_tasks": total,
+        "tasks": tasks,
+        "next_cursor": next_cursor
     }, ensure_ascii=False, indent=2)
 
 @mcp.tool()
@@ -916,14 +1718,23 @@ async def cancel_task(task_id: str) -> str:
     Returns:
         取消结果
     """
-    if task_id not in task_status:
+    task = active_tasks.get(task_id)
+    if task is None:
+        record = await run_in_thread(get_task_store().get, task_id)
+        if record is None:
+            return json.dumps({
+                "error": "任务不存在",
+                "task_id": task_id
+            }, ensure_ascii=False)
+        if queue_enabled() and record["status"] not in TERMINAL_STATUSES:
+            return await cancel_queued_task(record)
         return json.dumps({
-            "error": "任务不存在",
-            "task_id": task_id
+            "error": "任务已完成或失败，无法取消",
+            "task_id": task_id,
+            "status": record["status"]
         }, ensure_ascii=False)
     
-    task = task_status[task_id]
-    if task.status in ["completed", "failed"]:
+    if task.status in ["completed", "failed", "cancelled"]:
         return json.dumps({
             "error": "任务已完成或失败，无法取消",
             "task_id": task_id,
@@ -932,12 +1743,103 @@ async def cancel_task(task_id: str) -> str:
     
     task.status = "cancelled"
     task.end_time = datetime.now()
+    await persist_task(task)
+    
+    # 写入取消标记，TTS循环和工作进程中的处理循环检测到后立即退出
+    work_dir = get_task_workspace(task_id)
+    mark_cancelled(work_dir)
+    
+    # 终止正在为该任务编码的ffmpeg等子进程，立即释放CPU
+    terminated = await run_in_thread(terminate_task_processes, work_dir)
+    
+    # 取消协程：排队中的任务退出队列，运行中的任务停止后续阶段并清理工作目录
+    handle = get_scheduler().get_handle(task_id)
+    if handle is not None:
+        handle.cancel()
     
     return json.dumps({
         "message": "任务已取消",
+        "task_id": task_id,
+        "terminated_processes": terminated
+    }, ensure_ascii=False)
+
+async def cancel_queued_task(record: Dict) -> str:
+    """取消渲染工作进程执行的任务：尚未被领取的任务直接取消，
+    已被领取的任务由工作进程在下次检查取消请求时停止（终止子进程并删除不完整的输出）
+    
+    Args:
+        record: 任务存储记录
+        
+    Returns:
+        取消结果
+    """
+    task_id = record["task_id"]
+    removed = await run_in_thread(get_render_queue().request_cancel, task_id)
+    if removed:
+        task = task_from_record(record)
+        task.status = "cancelled"
+        task.end_time = datetime.now()
+        await persist_task(task)
+        message = "任务已取消"
+    else:
+        message = "已请求取消，执行该任务的渲染工作进程将停止任务"
+    return json.dumps({
+        "message": message,
         "task_id": task_id
     }, ensure_ascii=False)
 
+@mcp.tool()
+async def resume_task(task_id: str, ctx: Context = None) -> str:
+    """恢复失败或已取消的任务，从最后完成的阶段继续执行
+    
+    已完成阶段（剪辑、语音合成、字幕渲染、视频合成、音视频合成）的产物保存在任务工作目录中，
+    恢复时直接复用，不会重新合成语音或重新编码。
+    
+    Args:
+        task_id: 任务ID
+        
+    Returns:
+        恢复结果
+    """
+    if task_id in active_tasks:
+        return json.dumps({
+            "error": "任务正在执行中，无需恢复",
+            "task_id": task_id,
+            "status": active_tasks[task_id].status
+        }, ensure_ascii=False)
+    
+    record = await run_in_thread(get_task_store().get, task_id)
+    if record is None:
+        return json.dumps({
+            "error": "任务不存在",
+            "task_id": task_id
+        }, ensure_ascii=False)
+    if record["status"] not in ["failed", "cancelled"]:
+        return json.dumps({
+            "error": "只能恢复失败或已取消的任务",
+            "task_id": task_id,
+            "status": record["status"]
+        }, ensure_ascii=False)
+    
+    work_dir = get_task_workspace(task_id)
+    manifest = load_manifest(work_dir) or {}
+    completed_stages = [stage for stage in CHECKPOINT_STAGES if stage in manifest.get("stages", {})]
+    clear_cancelled(work_dir)
+    
+    task = task_from_record(record)
+    task.fingerprint = await run_in_thread(request_fingerprint, task.params)
+    task.notifier = create_notifier(ctx)
+    await persist_task(task)
+    await dispatch_task(task)
+    
+    return json.dumps({
+        "task_id": task_id,
+        "status": "resumed",
+        "completed_stages": completed_stages,
+        "resume_from": completed_stages[-1] if completed_stages else None,
+        "message": "任务已重新加入队列，将跳过已完成的阶段，请使用 get_task_status 查询进度"
+    }, ensure_ascii=False)
+
 @mcp.tool()
 async def generate_auto_video_sync(
     video_path: Any, 
@@ -959,6 +1861,21 @@ async def generate_auto_video_sync(
         subtitle_style = json.dumps(subtitle_style, ensure_ascii=False)
     if not isinstance(auto_split_config, str):
         auto_split_config = json.dumps(auto_split_config, ensure_ascii=False)
+    if queue_enabled():
+        # 渲染由渲染工作进程执行，等待任务结束后返回结果
+        created = await create_video_generation_task(
+            video_path, text, voice_index, output_path,
+            segments_mode, segments, subtitle_style, auto_split_config, quality_preset,
+            enable_motion_clip, motion_clip_params
+        )
+        if created.startswith("错误"):
+            return created
+        record = await wait_for_task(json.loads(created)["task_id"])
+        if record is None:
+            return "错误：任务不存在"
+        if record["status"] == "completed":
+            return record["result"]
+        return record["error"] or "错误：任务已取消"
     return await generate_auto_video(
         video_path, text, voice_index, output_path,
         segments_mode, segments, subtitle_style, auto_split_config, quality_preset,
@@ -0,0 +1,215 @@
+"""
+内存准入模块
+负责估算视频生成任务的峰值内存（由源视频分辨率、时长和字幕数量决定），
+并在任务开始执行前检查系统可用内存，放不下的任务排队等待，避免多个大任务同时运行导致内存耗尽
+"""
+
+import math
+import json
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import psutil
+
+from .config import get_config
+from .thread_pool import run_in_thread
+from .process_pool import task_memory_usage
+from .workspace_utils import get_task_workspace
+
+# 每个任务的固定内存开销（Python工作进程、moviepy、ffmpeg进程）
+BASE_JOB_MEMORY = 300 * 1024 * 1024
+
+# moviepy合成时同时存在的整帧缓冲数量（解码帧、合成帧、浮点混合的中间结果、写入管道）
+FRAME_BUFFER_COUNT = 10
+
+# 字幕ImageClip每像素占用的字节数：RGB图像 3 字节 + float64 透明遮罩 8 字节
+SUBTITLE_BYTES_PER_PIXEL = 11
+
+# pydub拼接语音时每秒音频占用的字节数（44.1kHz 双声道 16位）
+AUDIO_BYTES_PER_SECOND = 44100 * 2 * 2
+
+def estimate_peak_memory(width: int, height: int, duration: float, subtitle_count: int,
+                         subtitle_width: int, subtitle_height: int) -> int:
+    """估算任务的峰值内存
+
+    合成阶段的所有字幕ImageClip同时加载在内存中，是长视频、多字幕任务的主要内存开销。
+
+    Args:
+        width: 源视频宽度
+        height: 源视频高度
+        duration: 视频时长（秒）
+        subtitle_count: 字幕片段数量
+        subtitle_width: 字幕图片宽度
+        subtitle_height: 字幕图片高度
+
+    Returns:
+        int: 估算的峰值内存（字节）
+    """
+    frame_bytes = width * height * 3 * FRAME_BUFFER_COUNT
+    subtitle_bytes = subtitle_count * subtitle_width * subtitle_height * SUBTITLE_BYTES_PER_PIXEL
+    audio_bytes = duration * AUDIO_BYTES_PER_SECOND if subtitle_count else 0
+    return int(BASE_JOB_MEMORY + frame_bytes + subtitle_bytes + audio_bytes)
+
+def _parse_json_object(value) -> Dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, dict) else {}
+        except ValueError:
+            return {}
+    return {}
+
+def _estimate_subtitle_count(text: str, split_config: Dict) -> int:
+    """按智能分割配置估算字幕片段数量"""
+    if not text or not text.strip():
+        return 0
+    config = get_config().get_auto_split_config()
+    max_length = split_config.get("maxLength", config.max_length)
+    if not split_config.get("enabled", True):
+        return 1
+    try:
+        from .subtitle_utils import split_timings
+        return len(split_timings(
+            [{"text": text, "duration": 0}],
+            max_chars=max_length,
+            min_chars=split_config.get("minLength", config.min_length)
+        ))
+    except Exception:
+        return max(1, math.ceil(len(text) / max(int(max_length), 1)))
+
+def estimate_task_memory(params: Dict) -> int:
+    """根据任务参数探测源视频并估算任务的峰值内存（在线程中调用）
+
+    Args:
+        params: 任务参数（与 generate_auto_video 的参数一致）
+
+    Returns:
+        int: 估算的峰值内存（字节）
+    """
+    video_config = get_config().get_video_config()
+    target_width, target_height = video_config.get_resolution_by_quality(params.get("quality_preset"))
+    width, height, duration = target_width, target_height, 0.0
+    from .asset_registry import registered_video_info
+    registered = registered_video_info(str(params.get("video_path", "")))
+    if registered is not None:
+        # 已登记的素材直接使用登记的探测信息
+        (width, height), duration = registered["size"], registered["duration"]
+    else:
+        try:
+            import cv2
+            cap = cv2.VideoCapture(str(params.get("video_path", "")))
+            if cap.isOpened():
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or width
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                if fps and frame_count:
+                    duration = frame_count / fps
+            cap.release()
+        except Exception as e:
+            print(f"探测源视频失败，按目标分辨率估算内存: {e}")
+
+    subtitle_count = _estimate_subtitle_count(
+        params.get("text") or "", _parse_json_object(params.get("auto_split_config"))
+    )
+    subtitle_height = _parse_json_object(params.get("subtitle_style")).get("height", 100)
+    try:
+        subtitle_height = int(subtitle_height)
+    except (TypeError, ValueError):
+        subtitle_height = 100
+    return estimate_peak_memory(width, height, duration, subtitle_count, target_width, subtitle_height)
+
+class MemoryGate:
+    """按估算峰值内存准入任务
+
+    任务的估算内存不超过「系统可用内存 - 保留余量 - 已准入任务尚未用到的内存」时准入，否则按到达顺序等待；
+    没有任务运行时总是准入，避免超过整机内存的任务永远无法执行。
+    系统可用内存已经扣除了运行中任务当前占用的内存，因此每个已准入任务只再扣除
+    「估算峰值 - 其进程当前的常驻内存」，不重复计算。
+
+    准入只在本进程内进行：队列模式下每个渲染工作进程各自准入自己领取的任务，
+    其他工作进程的任务只以当前占用的内存体现在系统可用内存中，它们之后的内存增长不会被预留。
+    同一主机运行多个工作进程时，应相应调大 memory_headroom_mb 或减少每个工作进程的并发数。
+    """
+
+    def __init__(self, enabled: bool, headroom_bytes: int, poll_interval: float = 1.0):
+        self.enabled = enabled
+        self.headroom_bytes = headroom_bytes
+        self.poll_interval = poll_interval
+        self.reserved: Dict[str, int] = {}
+        self._waiting: deque = deque()
+
+    def _fits(self, estimate: int) -> bool:
+        """判断任务能否准入（统计进程内存，在线程中调用）"""
+        reserved = dict(self.reserved)
+        if not reserved:
+            return True
+        pending = sum(
+            max(0, reserved_estimate - task_memory_usage(get_task_workspace(owner)))
+            for owner, reserved_estimate in reserved.items()
+        )
+        available = psutil.virtual_memory().available
+        return available - self.headroom_bytes - pending >= estimate
+
+    async def acquire(self, owner: str, estimate: int):
+        """等待到内存足够时准入任务
+
+        Args:
+            owner: 任务ID
+            estimate: 任务的估算峰值内存（字节）
+        """
+        entry = (owner, estimate)
+        self._waiting.append(entry)
+        logged = False
+        try:
+            while not (self._waiting[0] is entry and (not self.reserved or await run_in_thread(self._fits, estimate))):
+                if not logged:
+                    print(f"任务 {owner} 估算需要内存 {estimate / 1024 / 1024:.0f} MB，可用内存不足，等待其他任务释放")
+                    logged = True
+                await asyncio.sleep(self.poll_interval)
+            self.reserved[owner] = estimate
+        finally:
+            self._waiting.remove(entry)
+
+    def release(self, owner: str):
+        """释放任务的内存预留"""
+        self.reserved.pop(owner, None)
+
+    @asynccontextmanager
+    async def reserve(self, owner: Optional[str], estimate: int):
+        """在任务执行期间预留内存，未启用或没有估算值时直接准入
+
+        Args:
+            owner: 任务ID
+            estimate: 任务的估算峰值内存（字节）
+        """
+        if not self.enabled or not owner or estimate <= 0:
+            yield
+            return
+        await self.acquire(owner, estimate)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+    def position(self, owner: str) -> Optional[int]:
+        """获取任务在内存等待队列中的位置（从1开始），未在等待时返回None"""
+        for index, (waiting_owner, _) in enumerate(self._waiting):
+            if waiting_owner == owner:
+                return index + 1
+        return None
+
+    def get_status(self) -> Dict:
+        """获取内存准入状态"""
+        return {
+            "enabled": self.enabled,
+            "available_bytes": psutil.virtual_memory().available,
+            "headroom_bytes": self.headroom_bytes,
+            "reserved_bytes": sum(self.reserved.values()),
+            "running": len(self.reserved),
+            "waiting": len(self._waiting)
+        }
@@ -10,6 +10,8 @@ import json
 import asyncio
 from typing import List, Dict, Optional
 from mcp.server.fastmcp import FastMCP
+from .process_pool import check_cancelled
+from .thread_pool import run_in_thread
 
 # 创建MCP实例
 mcp = FastMCP("motion-detection-utils", log_level="ERROR")
@@ -60,7 +62,51 @@ async def detect_static_segments_by_motion(
     sample_step: int = 1
 ) -> List[StaticSegment]:
     """
-    使用帧间像素差异检测视频中的静止片段
+    使用帧间像素差异检测视频中的静止片段（在进程池中执行，不阻塞事件循环）
+    
+    Args:
+        video_path: 视频文件路径
+        motion_threshold: 运动阈值（像素差异）
+        min_static_duration: 最小静止时长（秒）
+        sample_step: 采样步长（帧数）
+    
+    Returns:
+        静止片段列表
+    """
+    from .process_pool import run_in_process
+    from .asset_registry import get_asset_registry
+    
+    # 已登记的素材按检测参数缓存结果，同一视频重复检测时不再逐帧分析
+    registry = await run_in_thread(get_asset_registry)
+    asset = await run_in_thread(registry.lookup, video_path)
+    params = {
+        "motion_threshold": motion_threshold,
+        "min_static_duration": min_static_duration,
+        "sample_step": sample_step
+    }
+    if asset is not None:
+        cached = await run_in_thread(registry.get_analysis, asset["asset_id"], "static_segments", params)
+        if cached is not None:
+            print(f"[运动检测] 使用素材 {asset['asset_id']} 已缓存的检测结果")
+            return [StaticSegment(seg["start"], seg["end"]) for seg in cached]
+    
+    static_segments = await run_in_process(
+        detect_static_segments_sync,
+        video_path, motion_threshold, min_static_duration, sample_step
+    )
+    if asset is not None:
+        await run_in_thread(registry.put_analysis, asset["asset_id"], "static_segments", params,
+                            [seg.to_dict() for seg in static_segments])
+    return static_segments
+
+def detect_static_segments_sync(
+    video_path: str, 
+    motion_threshold: float = 0.1, 
+    min_static_duration: float = 2.0, 
+    sample_step: int = 1
+) -> List[StaticSegment]:
+    """
+    使用帧间像素差异检测视频中的静止片段（同步版本，供进程池调用）
     
     Args:
         video_path: 视频文件路径
@@ -105,6 +151,9 @@ async def detect_static_segments_by_motion(
                 continue
 
             processed_frames += 1
+            if processed_frames % 30 == 0:
+                # 在进程池中运行时，任务取消后尽快退出
+                check_cancelled()
             if processed_frames % 100 == 0:
                 progress = (processed_frames / total_frames_to_process) * 100
                 print(f"\r[运动检测] 分析进度: {progress:.1f}%", end="")
@@ -186,7 +235,7 @@ async def optimize_motion_parameters(
     """
     from .video_utils import get_video_info
     
-    video_info = get_video_info(video_path)
+    video_info = await run_in_thread(get_video_info, video_path)
     duration = float(video_info.get("duration", 0))
     target_min, target_max = target_duration_range
     
@@ -293,14 +342,16 @@ async def detect_video_motion(video_path: str, config_path: str = "best_motion_c
     检测视频中的运动片段
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         config_path: 配置文件路径
     
     Returns:
         检测结果JSON字符串
     """
     try:
-        config = load_motion_config(config_path)
+        from .asset_registry import resolve_video_path
+        video_path = await run_in_thread(resolve_video_path, video_path)
+        config = await run_in_thread(load_motion_config, config_path)
         static_segments = await detect_static_segments_by_motion(
             video_path, 
             config.motion_threshold, 
@@ -340,7 +391,7 @@ async def optimize_video_motion_params(
     优化视频运动检测参数
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         target_min_duration: 目标最小时长
         target_max_duration: 目标最大时长
     
@@ -348,6 +399,8 @@ async def optimize_video_motion_params(
         优化结果JSON字符串
     """
     try:
+        from .asset_registry import resolve_video_path
+        video_path = await run_in_thread(resolve_video_path, video_path)
         optimal_config = await optimize_motion_parameters(
             video_path, 
             (target_min_duration, target_max_duration)
@@ -355,7 +408,7 @@ async def optimize_video_motion_params(
         
         if optimal_config:
             # 保存最优参数
-            save_motion_config(optimal_config)
+            await run_in_thread(save_motion_config, optimal_config)
             
             result = {
                 "success": True,
@@ -0,0 +1,204 @@
+"""
+进程池模块
+负责在独立进程中执行CPU密集型处理阶段（运动检测、剪辑、字幕渲染、编码），
+避免阻塞MCP服务器的事件循环，并让多个任务真正利用多个CPU核心
+"""
+
+import os
+import glob
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+import psutil
+
+from .config import get_config
+from .workspace_utils import current_work_dir, is_cancelled, TaskCancelledError
+from .ffmpeg_runner import get_task_ffmpeg_pids
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# 工作进程中正在执行的阶段所属任务的工作目录（仅在工作进程内有效）
+_worker_work_dir: Optional[str] = None
+
+# 工作进程登记文件前缀，文件名中包含工作进程PID
+WORKER_PID_PREFIX = ".worker_pid_"
+
+def _init_worker():
+    """进程池工作进程初始化：为moviepy/pydub配置FFmpeg路径"""
+    try:
+        from .ffmpeg_utils import setup_ffmpeg
+        setup_ffmpeg()
+    except SystemExit:
+        # setup_ffmpeg 在找不到ffmpeg时会退出进程，工作进程中保留进程，由具体阶段报告错误
+        pass
+
+def check_cancelled():
+    """在工作进程的处理循环中调用，所属任务已取消时抛出 TaskCancelledError"""
+    if is_cancelled(_worker_work_dir):
+        raise TaskCancelledError("任务已取消")
+
+def get_worker_work_dir() -> Optional[str]:
+    """获取工作进程中当前阶段所属任务的工作目录（主进程中为None）"""
+    return _worker_work_dir
+
+def _run_tracked(work_dir: Optional[str], func: Callable, args: tuple, kwargs: dict):
+    """在工作进程中执行阶段函数，并在任务工作目录中登记当前进程，便于取消时终止其子进程"""
+    global _worker_work_dir
+    if is_cancelled(work_dir):
+        raise TaskCancelledError("任务已取消")
+    pid_file = None
+    if work_dir and os.path.isdir(work_dir):
+        pid_file = os.path.join(work_dir, f"{WORKER_PID_PREFIX}{os.getpid()}")
+        with open(pid_file, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+    _worker_work_dir = work_dir
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _worker_work_dir = None
+        if pid_file:
+            try:
+                os.remove(pid_file)
+            except OSError:
+                pass
+
+def _task_workers(work_dir: str) -> List[psutil.Process]:
+    """在任务工作目录中登记的、正在为该任务执行阶段的进程池进程"""
+    workers = []
+    for pid_file in glob.glob(os.path.join(work_dir, f"{WORKER_PID_PREFIX}*")):
+        try:
+            workers.append(psutil.Process(int(os.path.basename(pid_file)[len(WORKER_PID_PREFIX):])))
+        except (ValueError, psutil.Error):
+            continue
+    return workers
+
+def task_memory_usage(work_dir: Optional[str]) -> int:
+    """统计正在为某个任务工作的进程（进程池进程及其子进程、事件循环中运行的ffmpeg）当前占用的物理内存
+
+    Args:
+        work_dir: 任务工作目录
+
+    Returns:
+        int: 常驻内存之和（字节）
+    """
+    if not work_dir or not os.path.isdir(work_dir):
+        return 0
+    processes = []
+    for worker in _task_workers(work_dir):
+        try:
+            processes.append(worker)
+            processes.extend(worker.children(recursive=True))
+        except psutil.Error:
+            continue
+    for pid in get_task_ffmpeg_pids(work_dir):
+        try:
+            processes.append(psutil.Process(pid))
+        except psutil.Error:
+            continue
+    usage = 0
+    for process in {process.pid: process for process in processes}.values():
+        try:
+            usage += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return usage
+
+def terminate_task_processes(work_dir: Optional[str], timeout: float = 0.5, own_only: bool = False) -> int:
+    """终止正在为某个任务工作的进程池进程所派生的子进程（ffmpeg等），以及事件循环中为该任务运行的ffmpeg
+
+    工作进程本身保留在进程池中，子进程被终止后阶段函数会因管道断开而立即失败并释放CPU。
+
+    Args:
+        work_dir: 任务工作目录
+        timeout: 等待子进程退出的时间，超时后强制结束
+        own_only: 只终止本进程的进程池进程所派生的子进程（任务已由其他工作进程接管时，
+            不影响同一主机上新领取者的进程）
+
+    Returns:
+        int: 被终止的子进程数量
+    """
+    if not work_dir or not os.path.isdir(work_dir):
+        return 0
+    children = []
+    for worker in _task_workers(work_dir):
+        try:
+            if own_only and worker.ppid() != os.getpid():
+                continue
+            children.extend(worker.children(recursive=True))
+        except psutil.Error:
+            continue
+    for pid in get_task_ffmpeg_pids(work_dir):
+        try:
+            children.append(psutil.Process(pid))
+        except psutil.Error:
+            continue
+    for child in children:
+        try:
+            child.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(children, timeout=timeout)
+    for child in alive:
+        try:
+            child.kill()
+        except psutil.Error:
+            pass
+    if children:
+        print(f"已终止任务子进程 {len(children)} 个: {work_dir}")
+    return len(children)
+
+def get_pool_size() -> int:
+    """获取进程池大小（SystemConfig.max_process_workers，0表示CPU核心数）"""
+    size = get_config().get_system_config().max_process_workers
+    if size <= 0:
+        size = os.cpu_count() or 1
+    return size
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池实例"""
+    global _executor
+    if _executor is None:
+        # 使用spawn启动方式，避免在带有事件循环和线程的进程中fork
+        _executor = ProcessPoolExecutor(
+            max_workers=get_pool_size(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _executor
+
+async def run_in_process(func: Callable, *args, **kwargs):
+    """在进程池中执行同步函数并等待结果
+
+    func 必须是模块顶层函数，参数和返回值都需要可以序列化，
+    返回值应尽量只包含文件路径、时长等小数据。
+    如果当前处于任务上下文中（current_work_dir 已设置），工作进程会登记到任务工作目录，
+    任务取消时可以通过 terminate_task_processes 终止其子进程。
+
+    Args:
+        func: 要执行的函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数返回值
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_run_tracked, current_work_dir.get(), func, args, kwargs)
+    try:
+        return await loop.run_in_executor(get_process_pool(), call)
+    except BrokenProcessPool:
+        # 工作进程异常退出（例如被系统杀死）时重建进程池，由调用方决定是否重试
+        _executor = None
+        raise
+
+def shutdown_process_pool(wait: bool = True):
+    """关闭进程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
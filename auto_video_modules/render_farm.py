@@ -0,0 +1,537 @@
+"""
+渲染集群模块
+负责把长视频的合成阶段按时间分块，通过共享目录上的文件队列分发给多个节点的渲染工作进程：
+各节点领取视频块并写入共享的产物目录，发起任务的节点等待所有视频块完成后无损拼接；
+队列只依赖原子改名和文件修改时间，可以放在各节点都能挂载的网络文件系统上，本机测试时使用本地目录即可
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from .config import get_config
+from .task_scheduler import PRIORITY_LANES, get_scheduler
+from .workspace_utils import (
+    current_work_dir, get_task_workspace, workspace_path, mark_cancelled, is_cancelled, clear_cancelled
+)
+from .process_pool import run_in_process, terminate_task_processes, get_pool_size
+from .thread_pool import run_in_thread
+
+# 队列中的任务类型：合成阶段的视频块
+JOB_CHUNK = "chunk"
+
+# 视频块渲染失败时写入产物目录的错误文件后缀，发起任务的节点读取后使任务失败
+CHUNK_ERROR_SUFFIX = ".error"
+
+def farm_enabled() -> bool:
+    """是否配置了渲染集群共享目录"""
+    return bool(get_config().get_system_config().render_farm_dir)
+
+def get_farm_root() -> str:
+    """获取渲染集群共享目录（绝对路径）"""
+    return os.path.abspath(get_config().get_system_config().render_farm_dir)
+
+def get_artifact_dir(task_id: str) -> str:
+    """获取任务在共享产物目录中的子目录（不创建目录）"""
+    return os.path.join(get_farm_root(), "artifacts", task_id)
+
+def remove_task_artifacts(task_id: str):
+    """删除任务在渲染集群中的排队视频块和产物目录（任务最终结束、不再恢复时调用）
+
+    Args:
+        task_id: 任务ID
+    """
+    if not farm_enabled():
+        return
+    artifact_dir = get_artifact_dir(task_id)
+    if not os.path.isdir(artifact_dir):
+        return
+    get_chunk_broker().discard(task_id)
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    print(f"已清理渲染集群产物目录: {artifact_dir}")
+
+def get_node_id() -> str:
+    """当前节点（进程）的标识：主机名-PID"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def plan_chunks(duration: float, chunk_seconds: float) -> List[Tuple[float, float]]:
+    """按分块时长把视频划分为若干区间
+
+    分块边界取整秒，保证各块的帧时间与整段合成一致；最后不足半个分块时长的部分并入前一块。
+
+    Args:
+        duration: 视频时长（秒）
+        chunk_seconds: 分块时长（秒），不大于0时不分块
+
+    Returns:
+        list: (start, end) 区间列表
+    """
+    chunk_seconds = int(chunk_seconds)
+    if chunk_seconds <= 0 or duration <= chunk_seconds:
+        return [(0.0, duration)]
+    bounds = list(range(0, int(duration), chunk_seconds))
+    if duration - bounds[-1] < chunk_seconds / 2 and len(bounds) > 1:
+        bounds.pop()
+    return [
+        (float(start), float(bounds[i + 1]) if i + 1 < len(bounds) else duration)
+        for i, start in enumerate(bounds)
+    ]
+
+def should_split(duration: Optional[float]) -> bool:
+    """视频是否需要分块合成（已配置渲染集群且时长超过分块时长）"""
+    if not farm_enabled() or not duration:
+        return False
+    return len(plan_chunks(duration, get_config().get_system_config().render_chunk_seconds)) > 1
+
+def slice_subtitles(subtitle_segments: List, subtitle_images: Optional[List], start: float,
+                    end: float) -> Tuple[List, Optional[List]]:
+    """取出与区间重叠的字幕，裁剪到区间内并转换为相对区间起点的时间
+
+    Args:
+        subtitle_segments: 字幕片段列表，格式为 [(text, start, end), ...]
+        subtitle_images: 与字幕片段对应的字幕图片路径列表，可以为None
+        start: 区间起点（秒）
+        end: 区间终点（秒）
+
+    Returns:
+        tuple: (区间内的字幕片段列表, 对应的字幕图片路径列表)
+    """
+    segments = []
+    images = [] if subtitle_images is not None else None
+    for i, (text, seg_start, seg_end) in enumerate(subtitle_segments):
+        if seg_end <= start or seg_start >= end:
+            continue
+        segments.append((text, max(seg_start, start) - start, min(seg_end, end) - start))
+        if images is not None:
+            images.append(subtitle_images[i] if i < len(subtitle_images) else None)
+    return segments, images
+
+def publish_artifact(artifact_dir: str, path: Optional[str]) -> Optional[str]:
+    """把文件复制到共享产物目录，已在共享目录中的文件直接使用
+
+    Args:
+        artifact_dir: 任务的产物目录
+        path: 文件路径，为None时返回None
+
+    Returns:
+        str: 其他节点可以访问的文件路径
+    """
+    if not path:
+        return path
+    path = os.path.abspath(path)
+    if path.startswith(get_farm_root() + os.sep):
+        return path
+    target = os.path.join(artifact_dir, os.path.basename(path))
+    if not os.path.exists(target) or os.path.getsize(target) != os.path.getsize(path):
+        shutil.copyfile(path, f"{target}.part")
+        os.replace(f"{target}.part", target)
+    return target
+
+def chunk_output_path(artifact_dir: str, index: int) -> str:
+    """视频块在产物目录中的路径"""
+    return os.path.join(artifact_dir, f"chunk_{index:04d}.mp4")
+
+class FileBroker:
+    """基于共享目录的视频块队列，多个主机的进程可以同时读写
+
+    queued/ 中的文件名为 <通道序号>-<写入时间>-<任务ID>.json，按文件名排序即为领取顺序；
+    领取时把文件原子改名到 claimed/<任务ID>@<节点>.json，改名成功的节点取得任务；
+    节点通过更新文件修改时间续租，超过租约时长未续租的任务由其他节点重新领取。
+    """
+
+    def __init__(self, root: str, lease_seconds: float):
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.queued_dir = os.path.join(root, "queued")
+        self.claimed_dir = os.path.join(root, "claimed")
+        os.makedirs(self.queued_dir, exist_ok=True)
+        os.makedirs(self.claimed_dir, exist_ok=True)
+
+    @staticmethod
+    def _write_json(path: str, data: Dict):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _queued_job_id(name: str) -> str:
+        return name[:-len(".json")].split("-", 2)[2]
+
+    def _claimed_path(self, job_id: str, worker_id: str) -> str:
+        return os.path.join(self.claimed_dir, f"{job_id}@{worker_id}.json")
+
+    def _list(self, directory: str) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def enqueue(self, job_id: str, payload: Dict, lane: str = "normal"):
+        """写入一个视频块任务
+
+        Args:
+            job_id: 任务ID，格式为 <所属任务ID>.<块序号>
+            payload: 渲染视频块所需的参数
+            lane: 优先级通道，领取时 interactive 优先于 normal 优先于 bulk
+        """
+        name = f"{PRIORITY_LANES.index(lane)}-{time.time_ns():020d}-{job_id}.json"
+        self._write_json(os.path.join(self.queued_dir, name), {
+            "job_id": job_id, "kind": JOB_CHUNK, "payload": payload, "lane": lane,
+            "queue_name": name, "attempts": 0, "created_at": time.time()
+        })
+
+    def _take(self, source: str, job_id: str, worker_id: str) -> Optional[Dict]:
+        target = self._claimed_path(job_id, worker_id)
+        try:
+            os.rename(source, target)
+        except FileNotFoundError:
+            # 其他节点已领取
+            return None
+        try:
+            with open(target, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job["attempts"] += 1
+        job["worker_id"] = worker_id
+        # 重写文件同时刷新修改时间，即开始新的租约
+        self._write_json(target, job)
+        return job
+
+    def claim(self, worker_id: str, limit: int = 1, group: Optional[str] = None) -> List[Dict]:
+        """领取排队中的视频块和租约已过期（节点已退出）的视频块
+
+        Args:
+            worker_id: 节点标识
+            limit: 最多领取的数量
+            group: 只领取指定任务的视频块，为None时领取所有任务的
+
+        Returns:
+            list: 任务列表，attempts 为包括本次在内的领取次数
+        """
+        jobs = []
+        if limit <= 0:
+            return jobs
+        prefix = f"{group}." if group else ""
+        for name in self._list(self.queued_dir):
+            if len(jobs) >= limit:
+                return jobs
+            job_id = self._queued_job_id(name)
+            if job_id.startswith(prefix):
+                job = self._take(os.path.join(self.queued_dir, name), job_id, worker_id)
+                if job is not None:
+                    jobs.append(job)
+        now = time.time()
+        for name in self._list(self.claimed_dir):
+            if len(jobs) >= limit:
+                break
+            job_id = name.split("@", 1)[0]
+            path = os.path.join(self.claimed_dir, name)
+            try:
+                expired = os.path.getmtime(path) + self.lease_seconds < now
+            except OSError:
+                continue
+            if expired and job_id.startswith(prefix):
+                job = self._take(path, job_id, worker_id)
+                if job is not None:
+                    jobs.append(job)
+        return jobs
+
+    def renew(self, worker_id: str):
+        """续租节点领取的所有视频块"""
+        suffix = f"@{worker_id}.json"
+        for name in self._list(self.claimed_dir):
+            if name.endswith(suffix):
+                try:
+                    os.utime(os.path.join(self.claimed_dir, name))
+                except OSError:
+                    pass
+
+    def complete(self, job: Dict):
+        """视频块结束（完成或失败）后从队列中删除"""
+        try:
+            os.remove(self._claimed_path(job["job_id"], job["worker_id"]))
+        except FileNotFoundError:
+            pass
+
+    def requeue(self, job: Dict):
+        """把领取的视频块放回队列（节点停止时），由其他节点重新渲染"""
+        try:
+            os.rename(self._claimed_path(job["job_id"], job["worker_id"]),
+                      os.path.join(self.queued_dir, job["queue_name"]))
+        except FileNotFoundError:
+            pass
+
+    def discard(self, group: str) -> int:
+        """删除任务尚未被领取的视频块
+
+        Args:
+            group: 所属任务ID
+
+        Returns:
+            int: 删除的数量
+        """
+        removed = 0
+        for name in self._list(self.queued_dir):
+            if self._queued_job_id(name).startswith(f"{group}."):
+                try:
+                    os.remove(os.path.join(self.queued_dir, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def get_status(self) -> Dict:
+        """获取队列状态：排队数、已领取数、持有有效租约的节点数和等待重新领取的数量"""
+        now = time.time()
+        claimed, expired, workers = 0, 0, set()
+        for name in self._list(self.claimed_dir):
+            try:
+                mtime = os.path.getmtime(os.path.join(self.claimed_dir, name))
+            except OSError:
+                continue
+            if mtime + self.lease_seconds < now:
+                expired += 1
+            else:
+                claimed += 1
+                workers.add(name[:-len(".json")].split("@", 1)[1])
+        return {
+            "queued": len(self._list(self.queued_dir)),
+            "claimed": claimed,
+            "busy_workers": len(workers),
+            "expired": expired
+        }
+
+_broker: Optional[FileBroker] = None
+
+def get_chunk_broker() -> FileBroker:
+    """获取全局视频块队列实例"""
+    global _broker
+    if _broker is None:
+        system_config = get_config().get_system_config()
+        _broker = FileBroker(os.path.join(get_farm_root(), "queue"), system_config.render_lease_seconds)
+    return _broker
+
+def _write_chunk_error(output_path: str, message: str):
+    if os.path.isdir(os.path.dirname(output_path)):
+        with open(f"{output_path}{CHUNK_ERROR_SUFFIX}", "w", encoding="utf-8") as f:
+            f.write(message)
+
+async def execute_chunk(broker: FileBroker, job: Dict, work_dir: str):
+    """在本节点的进程池中渲染领取的视频块，失败时写入错误文件
+
+    Args:
+        broker: 视频块队列
+        job: 领取的视频块任务
+        work_dir: 本节点的工作目录，进程池工作进程登记在该目录，取消时据此终止其子进程
+    """
+    payload = job["payload"]
+    artifact_dir = os.path.dirname(payload["output_path"])
+    if not os.path.isdir(artifact_dir) or is_cancelled(artifact_dir):
+        # 所属任务已取消或已结束
+        await run_in_thread(broker.complete, job)
+        return
+    if job["attempts"] > get_config().get_system_config().render_max_attempts:
+        _write_chunk_error(payload["output_path"], "渲染视频块的节点多次异常退出")
+        await run_in_thread(broker.complete, job)
+        return
+
+    from .video_utils import compose_subtitle_chunk
+    token = current_work_dir.set(work_dir)
+    try:
+        async with get_scheduler().resource("encode"):
+            await run_in_process(
+                compose_subtitle_chunk,
+                payload["video_path"], payload["subtitle_segments"], payload["start"], payload["end"],
+                payload["output_path"], payload["subtitle_style"], payload["subtitle_images"],
+                payload["quality_preset"]
+            )
+    except asyncio.CancelledError:
+        await run_in_thread(broker.requeue, job)
+        raise
+    except Exception as e:
+        print(f"视频块 {job['job_id']} 渲染失败: {e}")
+        _write_chunk_error(payload["output_path"], str(e))
+    finally:
+        current_work_dir.reset(token)
+    await run_in_thread(broker.complete, job)
+
+async def compose_in_chunks(task_id: str, video_path: str, audio_path: str, subtitle_segments: List,
+                            subtitle_style: Optional[Dict], subtitle_images: Optional[List],
+                            quality_preset: str, work_dir: str, duration: float, lane: str = "normal",
+                            progress=None, poll_interval: float = 1.0) -> Dict:
+    """分块执行合成阶段：视频块写入渲染集群队列，由各节点渲染后在本节点拼接
+
+    本节点在等待期间也领取本任务的视频块，没有其他节点时任务同样可以完成。
+    失败时已完成的视频块保留在产物目录中，恢复任务时只渲染缺少的视频块；
+    任务不再恢复时（工作目录被清理或任务记录过期）由 remove_task_artifacts 删除。
+
+    Args:
+        task_id: 任务ID（视频块任务ID的前缀）
+        video_path: 剪辑后的视频路径
+        audio_path: 音频文件路径
+        subtitle_segments: 字幕片段列表，格式为 [(text, start, end), ...]
+        subtitle_style: 字幕样式配置
+        subtitle_images: 字幕图片路径列表
+        quality_preset: 画质预设
+        work_dir: 任务工作目录，拼接后的中间视频写入该目录
+        duration: 视频时长（秒）
+        lane: 视频块的优先级通道
+        progress: 任务进度跟踪器，按已完成的视频块时长更新合成阶段进度
+        poll_interval: 检查视频块完成情况的间隔（秒）
+
+    Returns:
+        dict: 与 compose_subtitle_video 相同的中间视频路径 video_path、音频路径 audio_path 和时长 duration
+    """
+    broker = get_chunk_broker()
+    artifact_dir = get_artifact_dir(task_id)
+    os.makedirs(artifact_dir, exist_ok=True)
+    clear_cancelled(artifact_dir)
+    shared_video = await run_in_thread(publish_artifact, artifact_dir, video_path)
+    shared_images = None
+    if subtitle_images is not None:
+        shared_images = [await run_in_thread(publish_artifact, artifact_dir, path) for path in subtitle_images]
+
+    chunks = plan_chunks(duration, get_config().get_system_config().render_chunk_seconds)
+    pending = {}
+    for index, (start, end) in enumerate(chunks):
+        output_path = chunk_output_path(artifact_dir, index)
+        if os.path.exists(output_path):
+            continue
+        try:
+            os.remove(f"{output_path}{CHUNK_ERROR_SUFFIX}")
+        except FileNotFoundError:
+            pass
+        segments, images = slice_subtitles(subtitle_segments, shared_images, start, end)
+        await run_in_thread(broker.enqueue, f"{task_id}.{index:04d}", {
+            "video_path": shared_video, "subtitle_segments": segments, "subtitle_images": images,
+            "subtitle_style": subtitle_style, "quality_preset": quality_preset,
+            "start": start, "end": end, "output_path": output_path
+        }, lane)
+        pending[index] = end - start
+    print(f"[渲染集群] 任务 {task_id} 分为 {len(chunks)} 个视频块，待渲染 {len(pending)} 个")
+
+    node_id = get_node_id()
+    local = set()
+    try:
+        while pending:
+            if not local:
+                for job in await run_in_thread(broker.claim, node_id, 1, task_id):
+                    local.add(asyncio.create_task(execute_chunk(broker, job, work_dir)))
+            await run_in_thread(broker.renew, node_id)
+            for index in list(pending):
+                output_path = chunk_output_path(artifact_dir, index)
+                if os.path.exists(output_path):
+                    pending.pop(index)
+                elif os.path.exists(f"{output_path}{CHUNK_ERROR_SUFFIX}"):
+                    with open(f"{output_path}{CHUNK_ERROR_SUFFIX}", "r", encoding="utf-8") as f:
+                        raise RuntimeError(f"视频块 {index} 渲染失败: {f.read()}")
+            if progress is not None:
+                progress.update("compose", duration - sum(pending.values()), duration)
+            if not pending:
+                break
+            if local:
+                done, local = await asyncio.wait(local, timeout=poll_interval)
+                for finished in done:
+                    finished.result()
+            else:
+                await asyncio.sleep(poll_interval)
+    except BaseException:
+        # 取消、超时或失败：停止本节点的视频块，删除排队中的视频块并通知其他节点停止
+        for running in local:
+            running.cancel()
+        await asyncio.gather(*local, return_exceptions=True)
+        await run_in_thread(broker.discard, task_id)
+        mark_cancelled(artifact_dir)
+        raise
+
+    from .video_utils import concat_video_chunks, fit_audio_to_video
+    async with get_scheduler().resource("encode"):
+        await run_in_process(
+            concat_video_chunks,
+            [chunk_output_path(artifact_dir, index) for index in range(len(chunks))],
+            workspace_path(work_dir, "temp_video.mp4")
+        )
+    mux_audio_path = await run_in_process(fit_audio_to_video, audio_path, duration, work_dir)
+    await run_in_thread(shutil.rmtree, artifact_dir, True)
+    if progress is not None:
+        progress.complete("compose")
+    return {
+        "video_path": workspace_path(work_dir, "temp_video.mp4"),
+        "audio_path": mux_audio_path,
+        "duration": duration
+    }
+
+class ChunkWorker:
+    """从视频块队列领取并渲染其他节点发起的任务的视频块"""
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None,
+                 poll_interval: float = 1.0):
+        """
+        Args:
+            worker_id: 节点标识，为空时使用 主机名-PID
+            concurrency: 同时渲染的视频块数，为空时使用进程池大小
+            poll_interval: 领取视频块和检查取消的间隔（秒）
+        """
+        self.worker_id = worker_id or get_node_id()
+        self.concurrency = max(1, int(concurrency or get_pool_size()))
+        self.poll_interval = poll_interval
+        self.stopping = False
+        self.running: Dict[str, Dict] = {}  # 视频块任务ID -> 领取的任务、协程和本节点工作目录
+
+    def stop(self):
+        """停止领取新的视频块，渲染中的视频块放回队列后退出"""
+        self.stopping = True
+
+    def start_chunk(self, broker: FileBroker, job: Dict):
+        """在本节点渲染领取的视频块"""
+        # 工作目录只记录本节点的进程池工作进程，不能放在共享目录中
+        work_dir = get_task_workspace(job["job_id"])
+        os.makedirs(work_dir, exist_ok=True)
+        handle = asyncio.create_task(execute_chunk(broker, job, work_dir))
+        self.running[job["job_id"]] = {"job": job, "handle": handle, "work_dir": work_dir}
+        handle.add_done_callback(lambda _: self._chunk_done(job["job_id"]))
+        print(f"领取视频块 {job['job_id']}（第 {job['attempts']} 次）")
+
+    def _chunk_done(self, job_id: str):
+        entry = self.running.pop(job_id, None)
+        if entry is not None:
+            shutil.rmtree(entry["work_dir"], ignore_errors=True)
+
+    async def apply_cancellations(self):
+        """停止所属任务已取消或已结束的视频块"""
+        for entry in list(self.running.values()):
+            artifact_dir = os.path.dirname(entry["job"]["payload"]["output_path"])
+            if os.path.isdir(artifact_dir) and not is_cancelled(artifact_dir):
+                continue
+            entry["handle"].cancel()
+            await run_in_thread(terminate_task_processes, entry["work_dir"])
+
+    async def run(self):
+        """领取并渲染视频块，直到调用 stop 或被取消"""
+        broker = get_chunk_broker()
+        print(f"渲染集群节点 {self.worker_id} 启动，最多同时渲染 {self.concurrency} 个视频块")
+        renew_interval = max(1.0, broker.lease_seconds / 3)
+        last_renew = time.monotonic()
+        try:
+            while not self.stopping:
+                if self.running and time.monotonic() - last_renew >= renew_interval:
+                    await run_in_thread(broker.renew, self.worker_id)
+                    last_renew = time.monotonic()
+                await self.apply_cancellations()
+                for job in await run_in_thread(broker.claim, self.worker_id, self.concurrency - len(self.running)):
+                    self.start_chunk(broker, job)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            # 渲染中的视频块放回队列，由其他节点重新渲染
+            entries = list(self.running.values())
+            for entry in entries:
+                entry["handle"].cancel()
+            for entry in entries:
+                await run_in_thread(terminate_task_processes, entry["work_dir"])
+            await asyncio.gather(*(entry["handle"] for entry in entries), return_exceptions=True)
@@ -0,0 +1,363 @@
+"""
+渲染队列模块
+负责在MCP服务和渲染工作进程之间传递任务：MCP服务把任务写入本地SQLite队列后立即返回，
+独立的渲染工作进程领取任务并定期续租，工作进程崩溃或重启后租约过期的任务由其他工作进程重新领取；
+与队列中请求指纹相同的任务在入队时进入等待状态，前一个任务结束后才能领取（此时通常直接命中结果缓存）
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from .config import get_config
+from .task_scheduler import PRIORITY_LANES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_jobs (
+    job_id      TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    lane_rank   INTEGER NOT NULL,
+    client_id   TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'queued',
+    worker_id   TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_render_jobs_order ON render_jobs (state, lane_rank, created_at);
+CREATE TABLE IF NOT EXISTS render_cancellations (
+    task_id      TEXT PRIMARY KEY,
+    requested_at REAL NOT NULL
+);
+"""
+
+# 旧版本数据库中缺少的列：列名 -> 列定义
+_ADDED_COLUMNS = {
+    "fingerprint": "TEXT"
+}
+
+# 任务类型：单个视频生成任务、同一源视频的批次
+JOB_GENERATE = "generate"
+JOB_BATCH = "batch"
+
+# 当前进程是否为渲染工作进程（工作进程在本地执行任务，不再写入队列）
+_worker_process = False
+
+def mark_worker_process():
+    """把当前进程标记为渲染工作进程"""
+    global _worker_process
+    _worker_process = True
+
+def queue_enabled() -> bool:
+    """任务是否交给渲染工作进程执行（启用渲染队列且当前进程不是工作进程）"""
+    return get_config().get_system_config().render_queue_enabled and not _worker_process
+
+class RenderQueue:
+    """基于SQLite的持久化任务队列，多个进程可以同时读写"""
+
+    def __init__(self, db_path: str, lease_seconds: float, client_weights: Optional[Dict[str, float]] = None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.client_weights = client_weights or {}
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        # 领取任务需要跨进程互斥，由 BEGIN IMMEDIATE 取得写锁，其他进程最多等待 timeout 秒
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        """为旧版本创建的数据库补充新增的列"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(render_jobs)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE render_jobs ADD COLUMN {name} {definition}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_render_jobs_fingerprint ON render_jobs (fingerprint, state, created_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_render_jobs_client ON render_jobs (client_id, state, lease_until)"
+        )
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict, lane: str = "normal", client_id: str = "default",
+                fingerprint: Optional[str] = None) -> Optional[str]:
+        """写入一个任务
+
+        队列中已有请求指纹相同且未结束的任务时，新任务进入等待状态，
+        前一个任务结束后才能领取，多个工作进程不会同时渲染相同的请求。
+
+        Args:
+            job_id: 任务ID（批次为批次ID）
+            kind: 任务类型（generate/batch）
+            payload: 工作进程执行任务所需的参数（任务参数本身保存在任务存储中）
+            lane: 优先级通道，领取时 interactive 优先于 normal 优先于 bulk
+            client_id: 提交任务的客户端
+            fingerprint: 请求指纹，为None时不合并
+
+        Returns:
+            str: 新任务等待的相同请求的任务ID，没有时返回None
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                leader = None
+                if fingerprint:
+                    row = self._conn.execute(
+                        "SELECT job_id FROM render_jobs WHERE fingerprint = ? AND job_id != ? "
+                        "AND state IN ('queued', 'claimed') ORDER BY created_at LIMIT 1",
+                        (fingerprint, job_id)
+                    ).fetchone()
+                    leader = row[0] if row else None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO render_jobs "
+                    "(job_id, kind, payload, lane_rank, client_id, state, created_at, fingerprint) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload, ensure_ascii=False), PRIORITY_LANES.index(lane),
+                     client_id, "waiting" if leader else "queued", time.time(), fingerprint)
+                )
+                # 恢复的任务可能留有上次执行时的取消请求
+                for task_id in payload.get("task_ids") or [job_id]:
+                    self._conn.execute("DELETE FROM render_cancellations WHERE task_id = ?", (task_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return leader
+
+    def _release_waiting(self, fingerprint: Optional[str]):
+        """请求指纹相同的任务结束后，放行最早等待的一个任务（调用方持有 self._lock）"""
+        if not fingerprint:
+            return
+        self._conn.execute(
+            "UPDATE render_jobs SET state = 'queued' WHERE job_id = ("
+            "SELECT job_id FROM render_jobs WHERE fingerprint = ? AND state = 'waiting' "
+            "ORDER BY created_at LIMIT 1)",
+            (fingerprint,)
+        )
+
+    def _weight(self, client_id: str) -> float:
+        return max(float(self.client_weights.get(client_id, 1.0)), 0.01)
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Dict]:
+        """领取排队中的任务和租约已过期（工作进程已退出）的任务
+
+        按通道优先级领取；同一通道内优先领取执行中任务（按客户端权重折算）最少的客户端的任务，
+        同一客户端按提交顺序。一次领取多个时逐个选择，已领取的任务计入所属客户端的执行中数量。
+
+        Args:
+            worker_id: 工作进程标识
+            limit: 最多领取的数量
+
+        Returns:
+            list: 任务列表，attempts 为包括本次在内的领取次数
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                in_flight = {row["client_id"]: row["count"] for row in self._conn.execute(
+                    "SELECT client_id, COUNT(*) AS count FROM render_jobs "
+                    "WHERE state = 'claimed' AND lease_until >= ? GROUP BY client_id",
+                    (now,)
+                )}
+                # 每个通道中每个客户端最早提交的可领取任务
+                candidates = [dict(row) for row in self._conn.execute(
+                    "SELECT job_id, lane_rank, client_id, MIN(created_at) AS created_at FROM render_jobs "
+                    "WHERE state = 'queued' OR (state = 'claimed' AND lease_until < ?) "
+                    "GROUP BY lane_rank, client_id",
+                    (now,)
+                )]
+                rows = []
+                while candidates and len(rows) < limit:
+                    chosen = min(candidates, key=lambda candidate: (
+                        candidate["lane_rank"],
+                        in_flight.get(candidate["client_id"], 0) / self._weight(candidate["client_id"]),
+                        candidate["created_at"]
+                    ))
+                    self._conn.execute(
+                        "UPDATE render_jobs SET state = 'claimed', worker_id = ?, lease_until = ?, "
+                        "attempts = attempts + 1 WHERE job_id = ?",
+                        (worker_id, now + self.lease_seconds, chosen["job_id"])
+                    )
+                    row = dict(self._conn.execute(
+                        "SELECT * FROM render_jobs WHERE job_id = ?", (chosen["job_id"],)
+                    ).fetchone())
+                    rows.append(row)
+                    in_flight[chosen["client_id"]] = in_flight.get(chosen["client_id"], 0) + 1
+                    # 该客户端在该通道中的下一个可领取任务
+                    candidates.remove(chosen)
+                    following = self._conn.execute(
+                        "SELECT job_id, lane_rank, client_id, created_at FROM render_jobs "
+                        "WHERE lane_rank = ? AND client_id = ? "
+                        "AND (state = 'queued' OR (state = 'claimed' AND lease_until < ?)) "
+                        "ORDER BY created_at LIMIT 1",
+                        (chosen["lane_rank"], chosen["client_id"], now)
+                    ).fetchone()
+                    if following is not None:
+                        candidates.append(dict(following))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for row in rows:
+            row["payload"] = json.loads(row["payload"])
+            row["lane"] = PRIORITY_LANES[row.pop("lane_rank")]
+        return rows
+
+    def renew(self, worker_id: str) -> List[str]:
+        """续租工作进程领取的所有任务
+
+        Args:
+            worker_id: 工作进程标识
+
+        Returns:
+            list: 仍由该工作进程持有的任务ID，租约过期后被其他工作进程重新领取的任务不在其中
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE render_jobs SET lease_until = ? WHERE worker_id = ? AND state = 'claimed'",
+                (time.time() + self.lease_seconds, worker_id)
+            )
+            return [row[0] for row in self._conn.execute(
+                "SELECT job_id FROM render_jobs WHERE worker_id = ? AND state = 'claimed'", (worker_id,)
+            )]
+
+    def complete(self, job_id: str, worker_id: str, task_ids: Optional[List[str]] = None) -> bool:
+        """任务结束（完成、失败或取消）后从队列中删除，任务已被其他工作进程重新领取时不做修改
+
+        Args:
+            job_id: 任务ID
+            worker_id: 领取任务的工作进程标识
+            task_ids: 任务包含的视频生成任务ID，同时删除它们的取消请求
+
+        Returns:
+            bool: 是否删除了任务
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM render_jobs WHERE job_id = ? AND worker_id = ?", (job_id, worker_id)
+            ).fetchone()
+            removed = self._conn.execute(
+                "DELETE FROM render_jobs WHERE job_id = ? AND worker_id = ?", (job_id, worker_id)
+            ).rowcount
+            if removed:
+                for task_id in task_ids or [job_id]:
+                    self._conn.execute("DELETE FROM render_cancellations WHERE task_id = ?", (task_id,))
+                self._release_waiting(row["fingerprint"] if row else None)
+        return bool(removed)
+
+    def requeue(self, job_id: str, worker_id: str) -> bool:
+        """把领取的任务放回队列（工作进程正常退出时），由其他工作进程从检查点继续；
+        任务已被其他工作进程重新领取时不做修改
+
+        Args:
+            job_id: 任务ID
+            worker_id: 领取任务的工作进程标识
+
+        Returns:
+            bool: 是否放回了队列
+        """
+        with self._lock:
+            return bool(self._conn.execute(
+                "UPDATE render_jobs SET state = 'queued', worker_id = NULL, lease_until = NULL "
+                "WHERE job_id = ? AND worker_id = ?",
+                (job_id, worker_id)
+            ).rowcount)
+
+    def request_cancel(self, task_id: str) -> bool:
+        """请求取消任务：尚未被领取的任务直接移出队列，已领取的任务由工作进程在续租时取消
+
+        Args:
+            task_id: 视频生成任务ID
+
+        Returns:
+            bool: 任务是否直接移出了队列
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, state FROM render_jobs WHERE job_id = ? AND state IN ('queued', 'waiting')",
+                (task_id,)
+            ).fetchone()
+            removed = self._conn.execute(
+                "DELETE FROM render_jobs WHERE job_id = ? AND state IN ('queued', 'waiting')", (task_id,)
+            ).rowcount
+            if removed and row["state"] == "queued":
+                self._release_waiting(row["fingerprint"])
+            if not removed:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO render_cancellations (task_id, requested_at) VALUES (?, ?)",
+                    (task_id, time.time())
+                )
+        return bool(removed)
+
+    def take_cancellations(self, task_ids: List[str]) -> List[str]:
+        """取出指定任务中已请求取消的任务ID"""
+        if not task_ids:
+            return []
+        placeholders = ", ".join("?" for _ in task_ids)
+        with self._lock:
+            cancelled = [row[0] for row in self._conn.execute(
+                f"SELECT task_id FROM render_cancellations WHERE task_id IN ({placeholders})", task_ids
+            )]
+            self._conn.execute(f"DELETE FROM render_cancellations WHERE task_id IN ({placeholders})", task_ids)
+        return cancelled
+
+    def position(self, job_id: str) -> Optional[int]:
+        """获取排队中任务的位置（从1开始），已被领取或不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lane_rank, created_at FROM render_jobs WHERE job_id = ? AND state = 'queued'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            ahead = self._conn.execute(
+                "SELECT COUNT(*) FROM render_jobs WHERE state = 'queued' AND "
+                "(lane_rank < ? OR (lane_rank = ? AND created_at < ?))",
+                (row["lane_rank"], row["lane_rank"], row["created_at"])
+            ).fetchone()[0]
+        return ahead + 1
+
+    def get_status(self) -> Dict:
+        """获取队列状态：排队数、等待相同请求的任务数、已领取数和持有有效租约的工作进程数"""
+        now = time.time()
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM render_jobs WHERE state = 'queued'").fetchone()[0]
+            waiting = self._conn.execute("SELECT COUNT(*) FROM render_jobs WHERE state = 'waiting'").fetchone()[0]
+            claimed = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT worker_id) FROM render_jobs WHERE state = 'claimed' AND lease_until >= ?",
+                (now,)
+            ).fetchone()
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM render_jobs WHERE state = 'claimed' AND lease_until < ?", (now,)
+            ).fetchone()[0]
+        return {
+            "queued": queued,
+            "waiting": waiting,
+            "claimed": claimed[0],
+            "busy_workers": claimed[1],
+            "expired": expired
+        }
+
+_queue: Optional[RenderQueue] = None
+
+def get_render_queue() -> RenderQueue:
+    """获取全局渲染队列实例"""
+    global _queue
+    if _queue is None:
+        config = get_config()
+        system_config = config.get_system_config()
+        db_path = system_config.render_queue_db_path or os.path.join(config.workspace, "render_queue.db")
+        _queue = RenderQueue(db_path, system_config.render_lease_seconds, system_config.client_weights)
+    return _queue
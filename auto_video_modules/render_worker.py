@@ -0,0 +1,342 @@
+"""
+渲染工作进程模块
+负责从渲染队列领取任务并在本进程的调度器和进程池中执行，定期续租、转发取消请求并把进度写入任务存储；
+MCP服务只负责接收请求，渲染进程崩溃不会影响MCP服务，工作进程的数量可以独立调整和重启；
+配置了渲染集群时同时渲染各节点分发的视频块，其他主机可以只运行视频块节点
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import multiprocessing
+from typing import Dict, List, Optional
+
+from .config import get_config
+from .render_queue import get_render_queue, mark_worker_process, JOB_BATCH
+from .task_store import get_task_store, TERMINAL_STATUSES
+from .task_scheduler import get_scheduler
+from .workspace_utils import get_task_workspace
+from .process_pool import terminate_task_processes, shutdown_process_pool, get_pool_size
+from .thread_pool import run_in_thread, shutdown_thread_pool
+from .render_farm import ChunkWorker, farm_enabled
+from .result_cache import request_fingerprint
+from .mcp_tools import (
+    active_tasks, task_from_record, persist_task, finish_task, cancel_task,
+    run_video_generation_task, run_video_batch
+)
+
+# 任务失败原因：执行任务的工作进程反复异常退出
+CRASHED_REASON = "crashed"
+
+# 工作进程异常退出后重新启动前的等待时间（秒）
+RESTART_DELAY = 3.0
+
+class RenderWorker:
+    """从渲染队列领取并执行任务的工作进程"""
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None,
+                 poll_interval: float = 1.0):
+        """
+        Args:
+            worker_id: 工作进程标识，为空时使用 主机名-PID
+            concurrency: 同时领取的任务数，为空时使用 SystemConfig.max_workers
+            poll_interval: 领取任务和检查取消请求的间隔（秒）
+        """
+        system_config = get_config().get_system_config()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, int(concurrency or system_config.max_workers))
+        self.max_attempts = system_config.render_max_attempts
+        self.poll_interval = poll_interval
+        self.stopping = False
+        self.jobs: Dict[str, Dict] = {}  # 任务ID -> 领取的任务和对应的视频生成任务
+        self._cancelled = set()  # 由用户取消的视频生成任务ID
+        self._finishing = set()  # 正在写回任务存储和队列的 finish_job 协程
+
+    def stop(self):
+        """停止领取新任务，执行中的任务放回队列后退出"""
+        if not self.stopping:
+            print(f"渲染工作进程 {self.worker_id} 正在停止，执行中的任务将放回队列")
+        self.stopping = True
+
+    async def start_job(self, job: Dict):
+        """在本进程中执行领取的任务
+
+        Args:
+            job: 渲染队列中的任务
+        """
+        queue = get_render_queue()
+        task_ids: List[str] = job["payload"].get("task_ids") or [job["job_id"]]
+        cancelled = set(await run_in_thread(queue.take_cancellations, task_ids))
+        tasks = []
+        for task_id in task_ids:
+            record = await run_in_thread(get_task_store().get, task_id)
+            if record is None or record["status"] in TERMINAL_STATUSES:
+                continue
+            task = task_from_record(record)
+            if job["payload"].get("priority"):
+                task.priority = job["payload"]["priority"]
+            elif job["kind"] != JOB_BATCH:
+                task.priority = job["lane"]
+            task.client_id = job["client_id"]
+            if job["attempts"] > 1:
+                # 上次领取该任务的工作进程异常退出，终止其遗留的ffmpeg等子进程
+                await run_in_thread(terminate_task_processes, get_task_workspace(task_id))
+            if task_id in cancelled:
+                await finish_task(task, "cancelled")
+                continue
+            if job["attempts"] > self.max_attempts:
+                await finish_task(task, "failed", "错误：执行任务的渲染工作进程多次异常退出，任务已放弃", CRASHED_REASON)
+                continue
+            task.fingerprint = await run_in_thread(request_fingerprint, task.params)
+            active_tasks[task_id] = task
+            tasks.append(task)
+
+        if not tasks:
+            await run_in_thread(queue.complete, job["job_id"], self.worker_id, task_ids)
+            return
+        if job["kind"] == JOB_BATCH:
+            coro = run_video_batch(job["job_id"], tasks)
+        else:
+            coro = run_video_generation_task(tasks[0])
+        print(f"领取任务 {job['job_id']}（第 {job['attempts']} 次）")
+        handle = get_scheduler().submit(job["job_id"], coro)
+        self.jobs[job["job_id"]] = {"job": job, "handle": handle, "tasks": tasks}
+        handle.add_done_callback(lambda _: self._job_done(job["job_id"]))
+
+    def _job_done(self, job_id: str):
+        # 停止过程中由 shutdown 在所有协程（包括批次中的各版本任务）结束后统一处理
+        if not self.stopping:
+            finishing = asyncio.ensure_future(self.finish_job(job_id))
+            self._finishing.add(finishing)
+            finishing.add_done_callback(self._finishing.discard)
+
+    async def finish_job(self, job_id: str):
+        """任务协程结束：正常结束时从队列删除；工作进程停止导致的中断放回队列，由其他工作进程从检查点继续"""
+        entry = self.jobs.pop(job_id, None)
+        if entry is None:
+            return
+        queue = get_render_queue()
+        tasks = entry["tasks"]
+        interrupted = [
+            task for task in tasks
+            if task.status not in TERMINAL_STATUSES
+            or (task.status == "cancelled" and task.task_id not in self._cancelled)
+        ]
+        if self.stopping and interrupted:
+            for task in interrupted:
+                task.status = "pending"
+                task.end_time = None
+                await persist_task(task)
+                active_tasks.pop(task.task_id, None)
+            await run_in_thread(queue.requeue, job_id, self.worker_id)
+        else:
+            await run_in_thread(queue.complete, job_id, self.worker_id, [task.task_id for task in tasks])
+
+    def _job_handles(self, entry: Dict) -> List:
+        """任务协程及批次中已提交的各版本任务的协程"""
+        handles = [entry["handle"]]
+        for task in entry["tasks"]:
+            handle = get_scheduler().get_handle(task.task_id)
+            if handle is not None and handle is not entry["handle"]:
+                handles.append(handle)
+        return handles
+
+    async def abandon_job(self, job_id: str):
+        """租约已过期且任务被其他工作进程重新领取：停止本地执行，不再写入任务存储和队列
+
+        Args:
+            job_id: 任务ID
+        """
+        entry = self.jobs.pop(job_id, None)
+        if entry is None:
+            return
+        print(f"任务 {job_id} 的租约已被其他工作进程接管，停止本地执行")
+        for task in entry["tasks"]:
+            task.lease_lost = True
+        handles = self._job_handles(entry)
+        for handle in handles:
+            handle.cancel()
+        for task in entry["tasks"]:
+            await run_in_thread(terminate_task_processes, get_task_workspace(task.task_id), own_only=True)
+        await asyncio.gather(*handles, return_exceptions=True)
+        for task in entry["tasks"]:
+            active_tasks.pop(task.task_id, None)
+
+    async def apply_cancellations(self):
+        """取消已请求取消的本进程任务"""
+        if not active_tasks:
+            return
+        cancelled = await run_in_thread(get_render_queue().take_cancellations, list(active_tasks))
+        for task_id in cancelled:
+            self._cancelled.add(task_id)
+            await cancel_task(task_id)
+
+    async def persist_progress(self):
+        """把运行中任务的进度写入任务存储，供MCP服务查询"""
+        for task in list(active_tasks.values()):
+            if task.status == "running":
+                percent = task.progress_tracker.percent
+                if percent != task.progress:
+                    task.progress = percent
+                    await persist_task(task)
+
+    async def run(self):
+        """领取并执行任务，直到调用 stop 或被取消"""
+        mark_worker_process()
+        queue = get_render_queue()
+        print(f"渲染工作进程 {self.worker_id} 启动，最多同时执行 {self.concurrency} 个任务")
+        # 配置了渲染集群时，空闲的编码资源用于渲染各节点分发的视频块
+        chunk_worker = ChunkWorker(self.worker_id) if farm_enabled() else None
+        chunk_runner = asyncio.create_task(chunk_worker.run()) if chunk_worker else None
+        renew_interval = max(1.0, queue.lease_seconds / 3)
+        last_renew = time.monotonic()
+        try:
+            while not self.stopping:
+                if self.jobs and time.monotonic() - last_renew >= renew_interval:
+                    owned = set(await run_in_thread(queue.renew, self.worker_id))
+                    last_renew = time.monotonic()
+                    for job_id in [job_id for job_id in self.jobs if job_id not in owned]:
+                        await self.abandon_job(job_id)
+                await self.apply_cancellations()
+                await self.persist_progress()
+                for job in await run_in_thread(queue.claim, self.worker_id, self.concurrency - len(self.jobs)):
+                    await self.start_job(job)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if chunk_worker is not None:
+                chunk_worker.stop()
+                await chunk_runner
+            await self.shutdown()
+
+    async def shutdown(self):
+        """中断执行中的任务并放回队列"""
+        self.stopping = True
+        entries = list(self.jobs.values())
+        handles = []
+        for entry in entries:
+            handles.extend(self._job_handles(entry))
+        for handle in handles:
+            handle.cancel()
+        for entry in entries:
+            for task in entry["tasks"]:
+                await run_in_thread(terminate_task_processes, get_task_workspace(task.task_id))
+        await asyncio.gather(*handles, return_exceptions=True)
+        for entry in entries:
+            await self.finish_job(entry["job"]["job_id"])
+        # 停止前已结束的任务仍在写回队列，等待其完成后再关闭线程池
+        await asyncio.gather(*self._finishing, return_exceptions=True)
+
+async def _serve(worker):
+    """运行工作进程，收到SIGTERM时停止"""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.stop)
+    except (NotImplementedError, RuntimeError):
+        # Windows不支持信号处理器，由 KeyboardInterrupt 停止
+        pass
+    await worker.run()
+
+def run_worker(concurrency: Optional[int] = None, chunks_only: bool = False, farm_dir: str = ""):
+    """运行一个渲染工作进程（阻塞直到停止）
+
+    Args:
+        concurrency: 同时领取的任务数（只渲染视频块时为同时渲染的视频块数）
+        chunks_only: 只渲染渲染集群分发的视频块，不领取渲染队列中的任务（用于不共享任务存储的其他主机）
+        farm_dir: 渲染集群共享目录，为空时使用 SystemConfig.render_farm_dir
+    """
+    system_config = get_config().get_system_config()
+    if farm_dir:
+        system_config.render_farm_dir = farm_dir
+    if chunks_only:
+        worker = ChunkWorker(concurrency=concurrency)
+    else:
+        system_config.render_queue_enabled = True
+        worker = RenderWorker(concurrency=concurrency)
+    try:
+        asyncio.run(_serve(worker))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_process_pool(wait=False)
+        shutdown_thread_pool(wait=False)
+
+def supervise(workers: int, concurrency: Optional[int] = None, chunks_only: bool = False, farm_dir: str = ""):
+    """启动多个渲染工作进程，异常退出的工作进程自动重启
+
+    Args:
+        workers: 工作进程数量
+        concurrency: 每个工作进程同时领取的任务数
+        chunks_only: 只渲染渲染集群分发的视频块
+        farm_dir: 渲染集群共享目录
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+
+    def start(index: int):
+        process = context.Process(target=run_worker, args=(concurrency, chunks_only, farm_dir), name=f"render-worker-{index}")
+        process.start()
+        processes[index] = process
+
+    for index in range(workers):
+        start(index)
+    try:
+        while processes:
+            time.sleep(1.0)
+            for index, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0:
+                    processes.pop(index)
+                    continue
+                print(f"渲染工作进程 {process.pid} 异常退出（退出码 {process.exitcode}），{RESTART_DELAY:g} 秒后重启")
+                time.sleep(RESTART_DELAY)
+                start(index)
+    except KeyboardInterrupt:
+        print("正在停止所有渲染工作进程")
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join()
+
+def main(argv: Optional[list] = None) -> int:
+    """渲染工作进程命令行入口
+
+    Args:
+        argv: 命令行参数，为None时使用 sys.argv
+
+    Returns:
+        int: 退出码
+    """
+    parser = argparse.ArgumentParser(description="从渲染队列领取并执行视频生成任务（配合 --render-queue 启动的MCP服务）")
+    parser.add_argument("-n", "--workers", type=int, default=1, help="工作进程数量，默认1")
+    parser.add_argument("-c", "--concurrency", type=int, default=0,
+                        help="每个工作进程同时执行的任务数，默认为 SystemConfig.max_workers / 工作进程数量")
+    parser.add_argument("--farm-dir", default="",
+                        help="渲染集群共享目录（各主机挂载到同一路径），默认为 SystemConfig.render_farm_dir")
+    parser.add_argument("--chunks-only", action="store_true",
+                        help="只渲染渲染集群分发的视频块，用于不共享任务存储的其他主机")
+    args = parser.parse_args(argv)
+
+    system_config = get_config().get_system_config()
+    if args.chunks_only and not (args.farm_dir or system_config.render_farm_dir):
+        print("错误：--chunks-only 需要通过 --farm-dir 或 SystemConfig.render_farm_dir 指定渲染集群共享目录")
+        return 2
+    workers = max(1, args.workers)
+    if args.chunks_only:
+        # 视频块在进程池中编码，默认每个进程的并发数按进程池大小均分
+        concurrency = args.concurrency or max(1, get_pool_size() // workers)
+    else:
+        concurrency = args.concurrency or max(1, system_config.max_workers // workers)
+    if workers == 1:
+        run_worker(concurrency, args.chunks_only, args.farm_dir)
+    else:
+        supervise(workers, concurrency, args.chunks_only, args.farm_dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
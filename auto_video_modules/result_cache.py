@@ -0,0 +1,272 @@
+"""
+结果缓存模块
+负责计算视频生成请求的指纹（规范化参数 + 输入文件内容标识），
+并缓存已完成请求的输出视频和结果，按总大小淘汰最久未使用的条目；
+多个渲染工作进程共用缓存目录，写入使用各自的临时文件，修改索引时用锁文件互斥
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from .config import get_config
+from .file_lock import file_lock
+
+# 文件内容标识缓存的最大条目数，超出时淘汰最久未使用的条目
+IDENTITY_CACHE_SIZE = 1024
+
+# 文件内容标识缓存：(绝对路径, 大小, 修改时间) -> 内容标识
+_identity_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_identity_lock = threading.Lock()
+
+def file_identity(path: str) -> Optional[str]:
+    """计算文件的内容标识（全部内容的SHA256），与文件路径无关
+
+    已登记且登记后未修改的素材直接使用登记时计算的SHA256，不再读取文件。
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        str: 内容标识，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _identity_lock:
+        if key in _identity_cache:
+            _identity_cache.move_to_end(key)
+            return _identity_cache[key]
+
+    from .asset_registry import get_asset_registry, hash_file
+    record = get_asset_registry().lookup(path)
+    try:
+        identity = record["sha256"] if record is not None else hash_file(path)
+    except OSError:
+        return None
+    with _identity_lock:
+        _identity_cache[key] = identity
+        if len(_identity_cache) > IDENTITY_CACHE_SIZE:
+            _identity_cache.popitem(last=False)
+    return identity
+
+def _normalize_json_param(value):
+    """把JSON字符串参数解析为对象，使格式不同但内容相同的参数得到相同的指纹"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if not value.strip():
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value.strip()
+    return value
+
+def request_fingerprint(params: Dict) -> Optional[str]:
+    """计算视频生成请求的指纹（不包含输出路径）
+
+    Args:
+        params: 任务参数（与 generate_auto_video 的参数一致）
+
+    Returns:
+        str: 请求指纹，输入文件不存在或参数无法规范化时返回None
+    """
+    identity = file_identity(str(params.get("video_path", "")))
+    if identity is None:
+        return None
+    try:
+        normalized = {
+            "video": identity,
+            "text": unicodedata.normalize("NFC", str(params.get("text") or "").strip()),
+            "voice_index": int(params.get("voice_index", 0)),
+            "segments_mode": str(params.get("segments_mode") or "keep"),
+            "segments": _normalize_json_param(params.get("segments")),
+            "subtitle_style": _normalize_json_param(params.get("subtitle_style")),
+            "auto_split_config": _normalize_json_param(params.get("auto_split_config")),
+            "quality_preset": str(params.get("quality_preset") or "720p").lower(),
+            "enable_motion_clip": bool(params.get("enable_motion_clip")),
+            "motion_clip_params": params.get("motion_clip_params") or None
+        }
+    except (TypeError, ValueError):
+        return None
+    data = json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """已完成请求的结果缓存，多个进程可以共用同一缓存目录，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(cache_dir, ".lock")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries: Dict[str, Dict] = self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _paths(self, fingerprint: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.cache_dir, f"{fingerprint}.mp4"),
+            os.path.join(self.cache_dir, f"{fingerprint}.json")
+        )
+
+    @contextmanager
+    def _locked(self):
+        """修改缓存索引时加锁：本进程内用线程锁，进程之间用缓存目录中的锁文件"""
+        with self._lock, file_lock(self._lock_path):
+            yield
+
+    def _read_meta(self, meta_path: str) -> Optional[Dict]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _scan(self) -> Dict[str, Dict]:
+        """扫描缓存目录，读取所有进程写入的条目"""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                entry = self._read_meta(os.path.join(self.cache_dir, name))
+                if entry is not None:
+                    entries[name[:-len(".json")]] = entry
+        return entries
+
+    def _remove(self, fingerprint: str):
+        self._entries.pop(fingerprint, None)
+        for path in self._paths(fingerprint):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_atomic(self, path: str, write):
+        """先写入同目录下的临时文件再替换，其他进程不会读到不完整的文件"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, meta_path: str, entry: Dict):
+        def write(temp_path):
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        self._write_atomic(meta_path, write)
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        """查找缓存条目
+
+        Args:
+            fingerprint: 请求指纹
+
+        Returns:
+            dict: 缓存的输出视频路径 video_path 和结果 result，未命中时返回None
+        """
+        if not self.enabled or not fingerprint:
+            return None
+        with self._locked():
+            video_path, meta_path = self._paths(fingerprint)
+            # 其他进程写入的条目不在本进程的索引中，从缓存目录读取
+            entry = self._read_meta(meta_path)
+            if entry is not None and (not os.path.exists(video_path) or os.path.getsize(video_path) != entry["size"]):
+                # 缓存文件缺失或被修改，丢弃该条目
+                self._remove(fingerprint)
+                entry = None
+            if entry is None:
+                self._entries.pop(fingerprint, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_access"] = time.time()
+            self._entries[fingerprint] = entry
+            try:
+                self._write_meta(meta_path, entry)
+            except OSError:
+                pass
+            return {"video_path": video_path, "result": entry["result"]}
+
+    def put(self, fingerprint: str, output_path: str, result: str) -> bool:
+        """把已完成请求的输出视频和结果写入缓存
+
+        Args:
+            fingerprint: 请求指纹
+            output_path: 输出视频路径
+            result: 结果JSON字符串
+
+        Returns:
+            bool: 是否写入成功
+        """
+        if not self.enabled or not fingerprint or not os.path.exists(output_path):
+            return False
+        size = os.path.getsize(output_path)
+        if size > self.max_bytes:
+            return False
+        video_path, meta_path = self._paths(fingerprint)
+        entry = {"size": size, "result": result, "created_at": time.time(), "last_access": time.time()}
+        try:
+            # 复制视频不持有索引锁，临时文件名按进程和线程区分
+            self._write_atomic(video_path, lambda temp_path: shutil.copyfile(output_path, temp_path))
+            with self._locked():
+                self._write_meta(meta_path, entry)
+                # 重新读取索引，按所有进程写入的条目计算总大小
+                self._entries = self._scan()
+                self._evict()
+        except OSError as e:
+            print(f"写入结果缓存失败: {e}")
+            return False
+        return True
+
+    def _evict(self):
+        """总大小超过上限时，按最近访问时间淘汰条目"""
+        total = sum(entry["size"] for entry in self._entries.values())
+        for fingerprint, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._remove(fingerprint)
+            print(f"结果缓存已满，淘汰条目: {fingerprint}")
+
+    def get_status(self) -> Dict:
+        """获取缓存状态"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    """获取全局结果缓存实例"""
+    global _cache
+    if _cache is None:
+        config = get_config()
+        system_config = config.get_system_config()
+        cache_dir = system_config.result_cache_dir or os.path.join(config.workspace, "result_cache")
+        _cache = ResultCache(cache_dir, system_config.result_cache_size_mb * 1024 * 1024)
+    return _cache
@@ -0,0 +1,186 @@
+"""
+阶段依赖图模块
+负责按阶段声明的输入和输出执行处理流水线，输入全部就绪的阶段立即并发执行，
+互不依赖的分支（如视频剪辑与语音合成）可以同时进行
+"""
+
+import time
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from .workspace_utils import TaskTimeoutError
+
+# 检查阶段超时的间隔（秒）
+DEADLINE_CHECK_INTERVAL = 1.0
+
+class StageDeadline:
+    """单个阶段的计时：等待资源槽位期间暂停，取得槽位后从暂停时已用的时间继续计时"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.elapsed = 0.0  # 暂停前累计的运行时间（秒）
+        self.started_at: Optional[float] = time.monotonic()
+        self._waiting = 0  # 阶段内正在等待资源槽位的协程数
+
+    def pause(self):
+        """开始等待资源槽位，暂停计时并累计已用时间"""
+        self._waiting += 1
+        if self.started_at is not None:
+            self.elapsed += time.monotonic() - self.started_at
+            self.started_at = None
+
+    def resume(self):
+        """取得资源槽位，没有其他等待中的协程时继续计时"""
+        self._waiting = max(0, self._waiting - 1)
+        if self._waiting == 0 and self.started_at is None:
+            self.started_at = time.monotonic()
+
+    def used(self) -> float:
+        """阶段已用的运行时间（秒），不含等待资源槽位的时间"""
+        running = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        return self.elapsed + running
+
+    def expired(self) -> bool:
+        return self.used() > self.timeout
+
+# 当前协程所属阶段的计时，由 StageGraph 设置，供调度器在等待资源槽位时暂停
+current_stage_deadline: contextvars.ContextVar = contextvars.ContextVar("current_stage_deadline", default=None)
+
+class PipelineStage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[Dict]], inputs: Iterable[str], outputs: Iterable[str],
+                 timed: bool = True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.timed = timed
+
+class StageGraph:
+    """由阶段组成的有向无环图，阶段之间的依赖由输入输出名称推导"""
+
+    def __init__(self, stage_timeout: Optional[float] = None,
+                 on_timeout: Optional[Callable[[str], Awaitable]] = None):
+        """
+        Args:
+            stage_timeout: 单个阶段的超时时间（秒，不含等待资源槽位的时间），None表示不限制
+            on_timeout: 阶段超时后调用的协程函数（参数为阶段名），用于终止阶段的子进程
+        """
+        self.stages: Dict[str, PipelineStage] = {}
+        self.stage_timeout = stage_timeout
+        self.on_timeout = on_timeout
+        self._producers: Dict[str, str] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Dict]],
+            inputs: Iterable[str] = (), outputs: Iterable[str] = (), timed: bool = True):
+        """添加阶段
+
+        Args:
+            name: 阶段名
+            func: 阶段协程函数，以输入名为关键字参数，返回包含全部输出的字典
+            inputs: 输入名称列表
+            outputs: 输出名称列表
+            timed: 是否受 stage_timeout 限制（耗时随视频时长增长的编码阶段不限制，
+                由ffmpeg进度停滞检测和任务总超时限制）
+        """
+        if name in self.stages:
+            raise ValueError(f"阶段重复: {name}")
+        stage = PipelineStage(name, func, inputs, outputs, timed)
+        for output in stage.outputs:
+            if output in self._producers:
+                raise ValueError(f"输出 {output} 同时由阶段 {self._producers[output]} 和 {name} 产生")
+            self._producers[output] = name
+        self.stages[name] = stage
+
+    def dependencies(self, name: str) -> Set[str]:
+        """获取阶段直接依赖的阶段"""
+        return {self._producers[item] for item in self.stages[name].inputs if item in self._producers}
+
+    def descendants(self, name: str) -> List[str]:
+        """获取直接或间接依赖某阶段输出的所有阶段（该阶段重新执行后它们的结果失效）"""
+        result: List[str] = []
+        frontier = [name]
+        while frontier:
+            current = frontier.pop()
+            for stage in self.stages:
+                if stage not in result and current in self.dependencies(stage):
+                    result.append(stage)
+                    frontier.append(stage)
+        return result
+
+    def _validate(self, available: Iterable[str]):
+        available = set(available)
+        for stage in self.stages.values():
+            missing = [item for item in stage.inputs if item not in available and item not in self._producers]
+            if missing:
+                raise ValueError(f"阶段 {stage.name} 的输入没有来源: {missing}")
+        # 检查循环依赖
+        done: Set[str] = set()
+        while len(done) < len(self.stages):
+            ready = [name for name in self.stages if name not in done and self.dependencies(name) <= done]
+            if not ready:
+                raise ValueError(f"阶段之间存在循环依赖: {sorted(set(self.stages) - done)}")
+            done.update(ready)
+
+    async def _run_stage(self, stage: PipelineStage, kwargs: Dict) -> Dict:
+        """执行单个阶段，运行时间（不含等待资源槽位的时间）超过 stage_timeout 时取消阶段并抛出 TaskTimeoutError"""
+        if not self.stage_timeout or not stage.timed:
+            return await stage.func(**kwargs)
+        deadline = StageDeadline(self.stage_timeout)
+        current_stage_deadline.set(deadline)
+        job = asyncio.ensure_future(stage.func(**kwargs))
+        try:
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=DEADLINE_CHECK_INTERVAL)
+                if done:
+                    return job.result()
+                if deadline.expired():
+                    break
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+            if self.on_timeout is not None:
+                await self.on_timeout(stage.name)
+            raise TaskTimeoutError(f"阶段 {stage.name} 超时（超过 {self.stage_timeout:g} 秒）", stage=stage.name)
+        finally:
+            if not job.done():
+                job.cancel()
+                await asyncio.gather(job, return_exceptions=True)
+
+    async def run(self, values: Optional[Dict] = None) -> Dict:
+        """执行所有阶段，任一阶段失败或超时时取消其余正在执行的阶段并抛出异常
+
+        Args:
+            values: 初始输入
+
+        Returns:
+            dict: 初始输入和所有阶段的输出
+        """
+        values = dict(values or {})
+        self._validate(values)
+        pending = dict(self.stages)
+        completed: Set[str] = set()
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if self.dependencies(name) <= completed:
+                        kwargs = {item: values[item] for item in stage.inputs}
+                        running[asyncio.create_task(self._run_stage(stage, kwargs))] = name
+                        del pending[name]
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    outputs = task.result() or {}
+                    missing = [item for item in self.stages[name].outputs if item not in outputs]
+                    if missing:
+                        raise RuntimeError(f"阶段 {name} 没有产生输出: {missing}")
+                    values.update(outputs)
+                    completed.add(name)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return values
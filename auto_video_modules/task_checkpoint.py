@@ -0,0 +1,133 @@
+"""
+任务检查点模块
+负责在任务工作目录中记录各处理阶段的完成情况和产物，任务失败后可以从最后完成的阶段继续执行
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+# 带检查点的处理阶段（阶段之间的依赖由流水线的阶段图声明，剪辑与语音合成、字幕渲染可并发执行）
+CHECKPOINT_STAGES = ["cut", "tts", "subtitle", "compose", "mux"]
+
+# 检查点清单文件名
+MANIFEST_FILE = "manifest.json"
+
+def params_fingerprint(params: Dict) -> str:
+    """计算任务参数指纹，参数变化后不能复用已有的阶段产物
+
+    Args:
+        params: 任务参数
+
+    Returns:
+        str: 参数的SHA256摘要
+    """
+    data = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class StageManifest:
+    """任务工作目录中的阶段检查点清单
+
+    清单结构:
+        {
+            "fingerprint": 任务参数指纹,
+            "stages": {
+                阶段名: {"outputs": 阶段输出, "artifacts": [产物文件路径], "completed_at": 时间戳}
+            }
+        }
+    """
+
+    def __init__(self, work_dir: Optional[str], fingerprint: str = ""):
+        self.work_dir = work_dir
+        self.fingerprint = fingerprint
+        self.stages: Dict[str, Dict] = {}
+        self._load()
+
+    @property
+    def path(self) -> Optional[str]:
+        if not self.work_dir:
+            return None
+        return os.path.join(self.work_dir, MANIFEST_FILE)
+
+    def _load(self):
+        """读取已有清单，参数指纹不一致时丢弃"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取检查点清单失败，将重新执行所有阶段: {e}")
+            return
+        if data.get("fingerprint") != self.fingerprint:
+            print("任务参数已变化，忽略已有检查点")
+            return
+        self.stages = data.get("stages", {})
+
+    def save(self):
+        """写入清单（先写临时文件再替换，避免中断时留下不完整的清单）"""
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "stages": self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def completed(self, stage: str) -> Optional[Dict]:
+        """获取已完成阶段的输出，阶段未完成或产物文件缺失时返回None
+
+        Args:
+            stage: 阶段名
+
+        Returns:
+            dict: 阶段输出
+        """
+        record = self.stages.get(stage)
+        if record is None:
+            return None
+        for artifact in record.get("artifacts", []):
+            if not os.path.exists(artifact):
+                print(f"阶段 {stage} 的产物缺失，重新执行: {artifact}")
+                return None
+        return record.get("outputs", {})
+
+    def mark_completed(self, stage: str, outputs: Dict, artifacts: Optional[List[str]] = None,
+                       invalidates: Iterable[str] = ()):
+        """记录阶段完成，并使依赖本阶段的阶段失效（它们依赖本阶段新生成的产物）
+
+        Args:
+            stage: 阶段名
+            outputs: 阶段输出，需要可以JSON序列化
+            artifacts: 阶段产物文件路径，恢复时逐一检查是否存在
+            invalidates: 依赖本阶段输出的阶段
+        """
+        for dependent in invalidates:
+            self.stages.pop(dependent, None)
+        self.stages[stage] = {
+            "outputs": outputs,
+            "artifacts": [path for path in (artifacts or []) if path],
+            "completed_at": time.time()
+        }
+        self.save()
+
+def load_manifest(work_dir: Optional[str]) -> Optional[Dict]:
+    """读取工作目录中的检查点清单原始内容，不存在时返回None
+
+    Args:
+        work_dir: 任务工作目录
+
+    Returns:
+        dict: 清单内容
+    """
+    if not work_dir:
+        return None
+    path = os.path.join(work_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
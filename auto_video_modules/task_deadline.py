@@ -0,0 +1,89 @@
+"""
+任务超时模块
+负责限制任务的执行时间：单个阶段的超时（SystemConfig.timeout）、整个任务的超时（SystemConfig.job_timeout）
+以及ffmpeg无进度输出的超时（FFmpegConfig.timeout），超时后终止任务的子进程并以 timeout 原因报告失败
+"""
+
+import time
+import asyncio
+from typing import Awaitable, Optional
+
+from .config import get_config
+from .workspace_utils import mark_cancelled, TaskTimeoutError
+from .process_pool import terminate_task_processes
+from .thread_pool import run_in_thread
+from .task_progress import ProgressTracker
+
+# 任务失败原因：超时（区别于一般错误 error 和服务重启中断 interrupted）
+TIMEOUT_REASON = "timeout"
+
+# 检查任务超时和ffmpeg进度停滞的间隔（秒）
+CHECK_INTERVAL = 1.0
+
+def _positive(value) -> Optional[float]:
+    """把配置的超时时间转换为秒数，0或负数表示不限制"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def get_stage_timeout() -> Optional[float]:
+    """获取单个处理阶段的超时时间（SystemConfig.timeout），不限制时返回None"""
+    return _positive(get_config().get_system_config().timeout)
+
+def get_job_timeout() -> Optional[float]:
+    """获取整个任务的超时时间（SystemConfig.job_timeout），不限制时返回None"""
+    return _positive(get_config().get_system_config().job_timeout)
+
+def get_ffmpeg_stall_timeout() -> Optional[float]:
+    """获取ffmpeg无进度输出的超时时间（FFmpegConfig.timeout），不限制时返回None"""
+    return _positive(get_config().get_ffmpeg_config().timeout)
+
+async def expire_task(work_dir: Optional[str]):
+    """任务超时后写入取消标记并终止其ffmpeg等子进程，使进程池中的阶段立即退出并释放CPU
+
+    Args:
+        work_dir: 任务工作目录
+    """
+    mark_cancelled(work_dir)
+    await run_in_thread(terminate_task_processes, work_dir)
+
+async def run_with_deadline(coro: Awaitable, work_dir: Optional[str],
+                            timeout: Optional[float] = None,
+                            progress: Optional[ProgressTracker] = None,
+                            stall_timeout: Optional[float] = None):
+    """执行任务协程，超过 timeout 秒，或某个编码阶段的ffmpeg超过 stall_timeout 秒没有新的进度输出时，
+    终止任务的子进程、取消协程并抛出 TaskTimeoutError
+
+    Args:
+        coro: 任务协程
+        work_dir: 任务工作目录
+        timeout: 任务超时时间（秒），None表示不限制
+        progress: 任务进度跟踪器，用于检测ffmpeg进度停滞
+        stall_timeout: ffmpeg无进度输出的超时时间（秒），None表示不检测
+
+    Returns:
+        协程返回值
+    """
+    job = asyncio.ensure_future(coro)
+    started = time.monotonic()
+    try:
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=CHECK_INTERVAL)
+            if done:
+                return job.result()
+            if timeout and time.monotonic() - started > timeout:
+                error = TaskTimeoutError(f"任务超时（运行超过 {timeout:g} 秒）")
+                break
+            stalled = progress.stalled_stage(stall_timeout) if progress and stall_timeout else None
+            if stalled:
+                error = TaskTimeoutError(f"阶段 {stalled} 的ffmpeg超过 {stall_timeout:g} 秒没有进度输出", stage=stalled)
+                break
+        print(f"{error}，终止任务: {work_dir}")
+        await expire_task(work_dir)
+        raise error
+    finally:
+        if not job.done():
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
@@ -0,0 +1,101 @@
+"""
+任务通知模块
+负责通过MCP会话向创建任务的客户端推送任务进度和完成通知，客户端无需轮询 get_task_status
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+# 日志通知的 logger 名称，客户端据此识别任务事件
+NOTIFICATION_LOGGER = "auto_video.tasks"
+
+class TaskNotifier:
+    """向一个MCP会话推送任务事件
+
+    - 如果创建任务的请求携带了 progressToken，发送 notifications/progress（进度 0-100）
+    - 同时发送 notifications/message 日志通知，data 为任务状态JSON：
+      event 为 task_progress 或 task_finished，并包含 task_id、status、progress、stage、eta_seconds 等字段
+    会话断开后停止推送，不影响任务执行。
+    """
+
+    def __init__(self, session: Any, progress_token: Optional[Any] = None, min_interval: float = 1.0):
+        self.session = session
+        self.progress_token = progress_token
+        self.min_interval = min_interval
+        self.closed = False
+        self._last_sent = 0.0
+        self._last_key = None
+
+    async def _send(self, event: str, info: Dict):
+        if self.closed:
+            return
+        try:
+            if self.progress_token is not None:
+                await self.session.send_progress_notification(
+                    self.progress_token, float(info.get("progress") or 0), 100.0
+                )
+            await self.session.send_log_message(
+                level="info",
+                data={"event": event, **info},
+                logger=NOTIFICATION_LOGGER
+            )
+        except Exception as e:
+            # 客户端断开或会话已关闭
+            print(f"任务通知发送失败，停止推送: {e}")
+            self.closed = True
+
+    async def progress(self, info: Dict, force: bool = False):
+        """推送进度通知（状态、阶段或进度变化时发送，进度变化按 min_interval 限频）
+
+        Args:
+            info: 任务状态
+            force: 是否忽略限频立即发送
+        """
+        key = (info.get("status"), info.get("stage"), info.get("progress"))
+        if key == self._last_key:
+            return
+        status_changed = self._last_key is None or key[:2] != self._last_key[:2]
+        if not force and not status_changed and time.time() - self._last_sent < self.min_interval:
+            return
+        self._last_key = key
+        self._last_sent = time.time()
+        await self._send("task_progress", info)
+
+    async def finished(self, info: Dict):
+        """推送任务结束通知（完成、失败或取消）
+
+        Args:
+            info: 任务最终状态
+        """
+        await self._send("task_finished", info)
+
+    async def watch(self, snapshot: Callable[[], Dict], interval: float = 0.5):
+        """持续读取任务状态并在变化时推送，直到被取消
+
+        Args:
+            snapshot: 返回当前任务状态的函数
+            interval: 检查间隔（秒）
+        """
+        while not self.closed:
+            await self.progress(snapshot())
+            await asyncio.sleep(interval)
+
+def create_notifier(ctx: Any) -> Optional[TaskNotifier]:
+    """根据MCP请求上下文创建通知器，不在MCP请求中调用时返回None
+
+    Args:
+        ctx: MCP请求上下文（fastmcp Context）
+
+    Returns:
+        TaskNotifier: 通知器
+    """
+    if ctx is None:
+        return None
+    try:
+        request_context = ctx.request_context
+        meta = request_context.meta
+        progress_token = getattr(meta, "progressToken", None) if meta else None
+        return TaskNotifier(request_context.session, progress_token)
+    except Exception:
+        return None
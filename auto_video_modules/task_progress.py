@@ -0,0 +1,264 @@
+"""
+任务进度模块
+负责按处理阶段加权计算任务进度，并解析ffmpeg -progress 输出估算剩余时间
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from typing import Dict, List, Optional
+
+# 各处理阶段的进度权重
+STAGE_WEIGHTS = {
+    "cut": 15,       # 视频片段剪辑
+    "tts": 25,       # 语音合成
+    "subtitle": 10,  # 字幕图片渲染
+    "compose": 35,   # 视频与字幕合成编码
+    "mux": 15,       # 音视频合成及画质转码
+    "encode": 50,    # 无文本时的画质转码
+}
+
+# 通过ffmpeg编码、可以用媒体时长计算进度的阶段
+ENCODE_STAGES = ["cut", "compose", "mux", "encode"]
+
+# 当前协程所属任务的进度跟踪器
+current_progress: contextvars.ContextVar = contextvars.ContextVar("current_progress", default=None)
+
+def ffmpeg_progress_file(work_dir: Optional[str], stage: str) -> Optional[str]:
+    """获取某阶段ffmpeg -progress 输出文件路径"""
+    if not work_dir:
+        return None
+    return os.path.join(work_dir, f".ffmpeg_progress_{stage}.txt")
+
+def stage_progress_file(work_dir: Optional[str], stage: str) -> Optional[str]:
+    """获取某阶段计数进度文件路径（内容为 "已完成 总数"）"""
+    if not work_dir:
+        return None
+    return os.path.join(work_dir, f".progress_{stage}")
+
+def clear_progress_files(work_dir: Optional[str]):
+    """删除工作目录中上次执行留下的进度文件（恢复任务时避免读到过期的进度）"""
+    if not work_dir:
+        return
+    for stage in STAGE_WEIGHTS:
+        for path in (ffmpeg_progress_file(work_dir, stage), stage_progress_file(work_dir, stage)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def ffmpeg_progress_args(stage: str) -> List[str]:
+    """在进程池工作进程中调用，返回需要追加到ffmpeg命令中的 -progress 参数"""
+    from .process_pool import get_worker_work_dir
+    progress_file = ffmpeg_progress_file(get_worker_work_dir(), stage)
+    if not progress_file:
+        return []
+    return ["-progress", progress_file]
+
+def report_worker_progress(stage: str, done: int, total: int):
+    """在进程池工作进程中调用，把阶段计数进度写入工作目录，由主进程轮询读取"""
+    from .process_pool import get_worker_work_dir
+    progress_file = stage_progress_file(get_worker_work_dir(), stage)
+    if not progress_file:
+        return
+    try:
+        with open(progress_file, "w", encoding="utf-8") as f:
+            f.write(f"{done} {total}")
+    except OSError:
+        pass
+
+class StageProgress:
+    """单个阶段的进度"""
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.fraction = 0.0
+        self.skipped = False
+        self.started_at: Optional[float] = None
+        self.media_duration: Optional[float] = None  # 该阶段输出的媒体时长（秒）
+        self.out_time = 0.0
+        self.fps: Optional[float] = None
+        self.speed: Optional[float] = None
+        self.last_output_at: Optional[float] = None  # 最近一次读到ffmpeg进度输出的时间
+
+    def to_dict(self) -> Dict:
+        info = {"progress": round(self.fraction * 100, 1)}
+        if self.skipped:
+            info["skipped"] = True
+        if self.fps is not None:
+            info["fps"] = self.fps
+        if self.speed is not None:
+            info["speed"] = round(self.speed, 2)
+        if self.media_duration:
+            info["out_time"] = round(self.out_time, 2)
+            info["duration"] = round(self.media_duration, 2)
+        return info
+
+class ProgressTracker:
+    """任务进度跟踪器，按阶段权重汇总进度"""
+
+    def __init__(self):
+        self.stages: Dict[str, StageProgress] = {
+            name: StageProgress(weight) for name, weight in STAGE_WEIGHTS.items()
+        }
+        self.current_stage: Optional[str] = None
+        self._file_offsets: Dict[str, int] = {}
+
+    def skip(self, *stages: str):
+        """标记不需要执行的阶段，不计入总进度"""
+        for stage in stages:
+            self.stages[stage].skipped = True
+
+    def start(self, stage: str, media_duration: Optional[float] = None):
+        """开始某阶段"""
+        progress = self.stages[stage]
+        progress.skipped = False
+        progress.started_at = time.time()
+        if media_duration:
+            progress.media_duration = media_duration
+        self.current_stage = stage
+
+    def expect(self, stage: str, media_duration: Optional[float]):
+        """设置在进程池中执行的编码阶段的媒体时长，阶段开始时间由首次读到的ffmpeg进度确定"""
+        if media_duration:
+            self.stages[stage].media_duration = media_duration
+
+    def update(self, stage: str, done: float, total: float):
+        """更新某阶段的完成数量"""
+        if total > 0:
+            self.stages[stage].fraction = min(max(done / total, 0.0), 1.0)
+
+    def complete(self, stage: str):
+        """完成某阶段"""
+        self.stages[stage].fraction = 1.0
+
+    @property
+    def percent(self) -> int:
+        """加权总进度（0-100）"""
+        active = [p for p in self.stages.values() if not p.skipped]
+        total_weight = sum(p.weight for p in active)
+        if total_weight <= 0:
+            return 0
+        done_weight = sum(p.weight * p.fraction for p in active)
+        return int(done_weight / total_weight * 100)
+
+    def measured_speed(self) -> Optional[float]:
+        """最近一次编码的实测速度（媒体秒数/实际秒数）"""
+        for stage in reversed(ENCODE_STAGES):
+            progress = self.stages[stage]
+            if progress.speed:
+                return progress.speed
+        return None
+
+    def eta_seconds(self) -> Optional[float]:
+        """根据实测编码速度估算剩余的编码时间"""
+        speed = self.measured_speed()
+        if not speed:
+            return None
+        remaining = 0.0
+        for stage in ENCODE_STAGES:
+            progress = self.stages[stage]
+            if progress.skipped or not progress.media_duration:
+                continue
+            remaining += (1.0 - progress.fraction) * progress.media_duration
+        return round(remaining / speed, 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "stage": self.current_stage,
+            "stages": {
+                name: progress.to_dict()
+                for name, progress in self.stages.items()
+                if not progress.skipped and (progress.started_at or progress.fraction)
+            },
+            "eta_seconds": self.eta_seconds()
+        }
+
+    def _read_new_lines(self, path: str) -> List[str]:
+        """增量读取进度文件中新增的完整行"""
+        offset = self._file_offsets.get(path, 0)
+        try:
+            if os.path.getsize(path) < offset:
+                # ffmpeg重新开始写入（例如逐段剪辑），从头读取
+                offset = 0
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return []
+        # 只处理完整的行，不完整的行留到下次读取
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self._file_offsets[path] = offset + end + 1
+        return data[:end].decode("utf-8", errors="ignore").splitlines()
+
+    def apply_ffmpeg_progress(self, stage: str, lines: List[str]):
+        """解析ffmpeg -progress 输出（key=value 格式）"""
+        progress = self.stages[stage]
+        if progress.started_at is None:
+            progress.started_at = time.time()
+            self.current_stage = stage
+        progress.last_output_at = time.time()
+        for line in lines:
+            key, _, value = line.strip().partition("=")
+            try:
+                if key in ("out_time_us", "out_time_ms"):
+                    # out_time_ms 实际单位也是微秒
+                    progress.out_time = max(int(value), 0) / 1_000_000
+                elif key == "fps":
+                    progress.fps = float(value)
+                elif key == "speed" and value.endswith("x"):
+                    progress.speed = float(value[:-1])
+                elif key == "progress" and value == "end":
+                    progress.fraction = 1.0
+            except ValueError:
+                continue
+        if progress.media_duration and progress.fraction < 1.0:
+            progress.fraction = min(progress.out_time / progress.media_duration, 0.99)
+        if progress.speed is None and progress.started_at and progress.out_time:
+            elapsed = time.time() - progress.started_at
+            if elapsed > 0:
+                progress.speed = progress.out_time / elapsed
+
+    def stalled_stage(self, timeout: float) -> Optional[str]:
+        """获取ffmpeg已开始输出进度、但超过timeout秒没有新输出且尚未结束的阶段
+
+        Args:
+            timeout: 无进度输出的最长时间（秒）
+
+        Returns:
+            str: 停滞的阶段名，没有时返回None
+        """
+        now = time.time()
+        for name, progress in self.stages.items():
+            if progress.last_output_at and progress.fraction < 1.0 and now - progress.last_output_at > timeout:
+                return name
+        return None
+
+    def poll(self, work_dir: str):
+        """从工作目录读取进程池中各阶段写出的进度"""
+        for stage in self.stages:
+            counter_file = stage_progress_file(work_dir, stage)
+            try:
+                with open(counter_file, "r", encoding="utf-8") as f:
+                    done, total = f.read().split()
+                self.update(stage, int(done), int(total))
+            except (OSError, ValueError):
+                pass
+            ffmpeg_file = ffmpeg_progress_file(work_dir, stage)
+            if os.path.exists(ffmpeg_file):
+                lines = self._read_new_lines(ffmpeg_file)
+                if lines:
+                    self.apply_ffmpeg_progress(stage, lines)
+
+    async def watch(self, work_dir: str, interval: float = 0.5):
+        """持续轮询工作目录中的进度文件，直到被取消"""
+        while True:
+            await asyncio.sleep(interval)
+            self.poll(work_dir)
+
+def get_current_progress() -> Optional[ProgressTracker]:
+    """获取当前任务的进度跟踪器，不在任务上下文中时返回None"""
+    return current_progress.get()
@@ -0,0 +1,453 @@
+"""
+任务调度模块
+负责视频生成任务的排队和并发控制，按资源类型（TTS/编码）分别限流
+"""
+
+import os
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Coroutine, Dict, Optional
+
+from .config import get_config
+from .memory_admission import MemoryGate
+from .adaptive_concurrency import AIMDController, LatencyController, ThroughputController
+from .stage_graph import current_stage_deadline
+
+# 当前协程所属的任务ID，由调度器在启动任务时设置，供各处理阶段申请资源时使用
+current_task_id: contextvars.ContextVar = contextvars.ContextVar("current_task_id", default=None)
+
+class ResourceQueue:
+    """按先进先出顺序放行的资源队列，限制某一类资源的并发使用数
+
+    设置了并发控制器时，并发上限由控制器根据 report 上报的实测指标动态调整。
+    """
+
+    def __init__(self, name: str, limit: int, controller: Optional[AIMDController] = None):
+        self.name = name
+        self.controller = controller
+        self.limit = controller.limit if controller else max(1, int(limit))
+        self.active = 0
+        self._waiters = deque()  # (owner, future)
+        self._saturated = False  # 上次上报指标以来是否有申请者排队
+
+    def _has_capacity(self) -> bool:
+        return self.active < self.limit
+
+    async def acquire(self, owner: Optional[str] = None):
+        """申请一个资源槽位，没有空闲槽位时排队等待"""
+        if self._has_capacity() and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (owner, future)
+        self._waiters.append(entry)
+        self._saturated = True
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 槽位已经移交给本协程，但协程被取消，需要归还
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        """归还资源槽位，并按顺序唤醒排队者"""
+        self.active -= 1
+        self._wake_waiters()
+
+    def set_limit(self, limit: int):
+        """调整并发上限，提高时立即放行排队者（降低时已占用的槽位在归还后生效）"""
+        self.limit = max(1, int(limit))
+        self._wake_waiters()
+
+    def report(self, **sample):
+        """上报一次实测指标，由并发控制器调整上限（没有控制器时忽略）
+
+        Args:
+            **sample: 控制器 record 方法的参数
+        """
+        if self.controller is None:
+            return
+        saturated = self._saturated or bool(self._waiters)
+        self._saturated = False
+        self.controller.record(saturated=saturated, **sample)
+        if self.controller.limit != self.limit:
+            self.set_limit(self.controller.limit)
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_capacity():
+            _, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, owner: Optional[str] = None):
+        """以上下文管理器形式占用一个资源槽位"""
+        await self.acquire(owner)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def position(self, owner: str) -> Optional[int]:
+        """获取任务在等待队列中的位置（从1开始），不在队列中返回None"""
+        for index, (waiting_owner, future) in enumerate(self._waiters):
+            if waiting_owner == owner and not future.done():
+                return index + 1
+        return None
+
+    def get_status(self) -> Dict:
+        status = {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters)
+        }
+        if self.controller is not None:
+            status["adaptive"] = self.controller.get_status()
+        return status
+
+# 任务优先级通道，按顺序优先调度
+PRIORITY_LANES = ["interactive", "normal", "bulk"]
+
+# 优先级别名
+PRIORITY_ALIASES = {
+    "high": "interactive",
+    "preview": "interactive",
+    "low": "bulk",
+    "batch": "bulk",
+}
+
+def resolve_priority(priority: Optional[str] = None, quality_preset: Optional[str] = None) -> str:
+    """确定任务的优先级通道
+
+    未指定优先级时按画质预设推导：240p/360p 预览为 interactive，1080p 为 bulk，其余为 normal。
+
+    Args:
+        priority: 优先级（interactive/normal/bulk，或 high/low 等别名）
+        quality_preset: 画质预设
+
+    Returns:
+        str: 优先级通道
+    """
+    if priority:
+        lane = str(priority).strip().lower()
+        lane = PRIORITY_ALIASES.get(lane, lane)
+        if lane not in PRIORITY_LANES:
+            raise ValueError(f"未知的优先级: {priority}，支持: {PRIORITY_LANES}")
+        return lane
+    quality = str(quality_preset or "").lower()
+    if quality in ("240p", "360p"):
+        return "interactive"
+    if quality == "1080p":
+        return "bulk"
+    return "normal"
+
+class FairJobQueue:
+    """按优先级通道和客户端加权公平排队的任务队列
+
+    - 高优先级通道中有等待的任务时优先放行
+    - 为 interactive 通道预留槽位，normal/bulk 任务最多占用 limit - reserved 个槽位，
+      即使所有槽位都被长时间的渲染任务占用，预览任务也能尽快开始
+    - 同一通道内按客户端的虚拟时间放行：每放行一个任务，该客户端的虚拟时间增加 1/权重，
+      虚拟时间最小的客户端优先，一个客户端提交大量任务不会让其他客户端一直等待
+    """
+
+    def __init__(self, name: str, limit: int, reserved: int = 0, weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.reserved = min(max(0, int(reserved)), self.limit - 1)
+        self.weights = weights or {}
+        self.active = 0
+        self.active_shared = 0  # normal/bulk 任务占用的槽位数
+        self._lanes: Dict[str, Dict[str, deque]] = {lane: {} for lane in PRIORITY_LANES}
+        self._vtime: Dict[str, Dict[str, float]] = {lane: {} for lane in PRIORITY_LANES}
+        self._seq = 0
+
+    def _weight(self, client: str) -> float:
+        return max(float(self.weights.get(client, 1.0)), 0.01)
+
+    def _can_run(self, lane: str, active: int, active_shared: int) -> bool:
+        if active >= self.limit:
+            return False
+        if lane != "interactive" and active_shared >= self.limit - self.reserved:
+            return False
+        return True
+
+    def _pick(self, lanes: Dict[str, Dict[str, deque]], vtime: Dict[str, Dict[str, float]],
+              active: int, active_shared: int) -> Optional[tuple]:
+        """选择下一个放行的 (通道, 客户端)"""
+        for lane in PRIORITY_LANES:
+            clients = lanes[lane]
+            if not clients or not self._can_run(lane, active, active_shared):
+                continue
+            client = min(clients, key=lambda c: (vtime[lane].get(c, 0.0), clients[c][0][0]))
+            return lane, client
+        return None
+
+    async def acquire(self, owner: Optional[str] = None, lane: str = "normal", client: str = "default"):
+        """申请一个任务槽位，没有可用槽位时按通道和客户端排队"""
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        entry = (self._seq, owner, future)
+        clients = self._lanes[lane]
+        if client not in clients:
+            # 客户端重新开始排队时不能使用空闲期间积累的虚拟时间
+            backlog = [self._vtime[lane].get(c, 0.0) for c in clients]
+            floor = min(backlog) if backlog else max(self._vtime[lane].values(), default=0.0)
+            self._vtime[lane][client] = max(self._vtime[lane].get(client, 0.0), floor)
+            clients[client] = deque()
+        clients[client].append(entry)
+        # 先入队再按放行规则分配，保证有空闲槽位时也遵循通道优先级和公平顺序
+        self._wake_waiters()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 槽位已经移交给本协程，但协程被取消，需要归还
+                self.release(lane)
+            else:
+                self._discard(lane, client, entry)
+            raise
+
+    def _discard(self, lane: str, client: str, entry: tuple):
+        queue = self._lanes[lane].get(client)
+        if queue is None:
+            return
+        try:
+            queue.remove(entry)
+        except ValueError:
+            pass
+        if not queue:
+            del self._lanes[lane][client]
+
+    def _charge(self, lane: str, client: str):
+        self._vtime[lane][client] = self._vtime[lane].get(client, 0.0) + 1.0 / self._weight(client)
+
+    def _occupy(self, lane: str):
+        self.active += 1
+        if lane != "interactive":
+            self.active_shared += 1
+
+    def release(self, lane: str = "normal"):
+        """归还任务槽位，并放行排队者"""
+        self.active -= 1
+        if lane != "interactive":
+            self.active_shared -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while True:
+            picked = self._pick(self._lanes, self._vtime, self.active, self.active_shared)
+            if picked is None:
+                return
+            lane, client = picked
+            queue = self._lanes[lane][client]
+            _, _, future = queue.popleft()
+            if not queue:
+                del self._lanes[lane][client]
+            if future.done():
+                continue
+            self._charge(lane, client)
+            self._occupy(lane)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, owner: Optional[str] = None, lane: str = "normal", client: str = "default"):
+        """以上下文管理器形式占用一个任务槽位"""
+        await self.acquire(owner, lane, client)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def position(self, owner: str) -> Optional[int]:
+        """按当前的放行顺序估算任务的排队位置（从1开始），不在队列中返回None"""
+        lanes = {lane: {c: deque(q) for c, q in clients.items()} for lane, clients in self._lanes.items()}
+        vtime = {lane: dict(values) for lane, values in self._vtime.items()}
+        index = 0
+        while True:
+            # 假设槽位全部空闲，只模拟放行顺序
+            picked = self._pick(lanes, vtime, 0, 0)
+            if picked is None:
+                return None
+            lane, client = picked
+            _, waiting_owner, future = lanes[lane][client].popleft()
+            if not lanes[lane][client]:
+                del lanes[lane][client]
+            if future.done():
+                continue
+            index += 1
+            if waiting_owner == owner:
+                return index
+            vtime[lane][client] = vtime[lane].get(client, 0.0) + 1.0 / self._weight(client)
+
+    def get_status(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": sum(len(q) for clients in self._lanes.values() for q in clients.values()),
+            "reserved_interactive": self.reserved,
+            "lanes": {
+                lane: sum(len(q) for q in clients.values())
+                for lane, clients in self._lanes.items()
+            }
+        }
+
+class TaskScheduler:
+    """视频生成任务调度器
+
+    - job: 整体任务并发上限（SystemConfig.max_workers），超出部分按优先级通道和客户端公平排队
+    - memory: 取得并发槽位的任务还需按估算峰值内存准入，可用内存不足时等待
+    - tts: 网络密集型的语音合成阶段
+    - tts_request: 语音合成阶段中的单个合成请求，所有任务的片段共用
+    - encode: CPU密集型的运动检测、剪辑和编码阶段
+    tts_request 和 encode 可以传入并发控制器，按实测请求延迟和编码速度自动调整并发上限
+    """
+
+    def __init__(self, max_workers: int, max_tts_workers: int, max_encode_workers: int,
+                 interactive_reserved_workers: int = 0, client_weights: Optional[Dict[str, float]] = None,
+                 memory_gate: Optional[MemoryGate] = None,
+                 controllers: Optional[Dict[str, AIMDController]] = None,
+                 max_tts_requests: Optional[int] = None):
+        self.job_queue = FairJobQueue("job", max_workers, interactive_reserved_workers, client_weights)
+        self.memory = memory_gate or MemoryGate(False, 0)
+        controllers = controllers or {}
+        self.resources = {
+            "tts": ResourceQueue("tts", max_tts_workers),
+            "encode": ResourceQueue("encode", max_encode_workers, controllers.get("encode")),
+            "tts_request": ResourceQueue("tts_request", max_tts_requests or max_tts_workers,
+                                         controllers.get("tts_request")),
+        }
+        self._handles: Dict[str, asyncio.Task] = {}
+
+    def submit(self, task_id: str, coro: Coroutine) -> asyncio.Task:
+        """提交任务协程，返回对应的asyncio任务"""
+        async def _run():
+            current_task_id.set(task_id)
+            try:
+                return await coro
+            finally:
+                self._handles.pop(task_id, None)
+
+        handle = asyncio.create_task(_run())
+        self._handles[task_id] = handle
+        return handle
+
+    def get_handle(self, task_id: str) -> Optional[asyncio.Task]:
+        """获取任务对应的asyncio任务"""
+        return self._handles.get(task_id)
+
+    @asynccontextmanager
+    async def job_slot(self, task_id: Optional[str] = None, priority: str = "normal",
+                       client_id: Optional[str] = None, memory: int = 0):
+        """占用一个任务并发槽位，并预留任务的估算峰值内存
+
+        Args:
+            task_id: 任务ID
+            priority: 优先级通道（interactive/normal/bulk）
+            client_id: 客户端标识，用于客户端之间的公平排队
+            memory: 任务的估算峰值内存（字节），0表示不做内存准入
+        """
+        async with self.job_queue.slot(task_id, priority, client_id or "default"):
+            async with self.memory.reserve(task_id, memory):
+                yield
+
+    @asynccontextmanager
+    async def resource(self, kind: str):
+        """占用指定类型的资源槽位（tts 或 encode），归属于当前任务
+
+        等待槽位期间暂停当前阶段的超时计时，排在其他任务之后的阶段不会因排队而超时。
+        """
+        if kind not in self.resources:
+            raise ValueError(f"未知的资源类型: {kind}，支持: {list(self.resources)}")
+        deadline = current_stage_deadline.get()
+        if deadline is not None:
+            deadline.pause()
+        try:
+            async with self.resources[kind].slot(current_task_id.get()):
+                if deadline is not None:
+                    deadline.resume()
+                    deadline = None
+                yield
+        finally:
+            # 等待槽位时被取消，同样结束暂停
+            if deadline is not None:
+                deadline.resume()
+
+    @asynccontextmanager
+    async def tts_request(self):
+        """占用一个TTS合成请求槽位，归属于当前任务
+
+        请求槽位在语音合成阶段内部按片段申请，不暂停阶段的超时计时。
+        """
+        async with self.resources["tts_request"].slot(current_task_id.get()):
+            yield
+
+    def report(self, kind: str, **sample):
+        """上报某类资源的实测指标（tts_request: latency/ok，encode: speed/work_kind），用于自适应调整并发上限"""
+        if kind in self.resources:
+            self.resources[kind].report(**sample)
+
+    def queue_position(self, task_id: str) -> Optional[Dict]:
+        """获取任务的排队信息，未在排队时返回None"""
+        position = self.job_queue.position(task_id)
+        if position is not None:
+            return {"queue": "job", "position": position}
+        position = self.memory.position(task_id)
+        if position is not None:
+            return {"queue": "memory", "position": position}
+        for kind, queue in self.resources.items():
+            position = queue.position(task_id)
+            if position is not None:
+                return {"queue": kind, "position": position}
+        return None
+
+    def get_status(self) -> Dict:
+        """获取调度器状态"""
+        status = {"job": self.job_queue.get_status()}
+        for kind, queue in self.resources.items():
+            status[kind] = queue.get_status()
+        return status
+
+_scheduler: Optional[TaskScheduler] = None
+
+def get_scheduler() -> TaskScheduler:
+    """获取全局调度器实例"""
+    global _scheduler
+    if _scheduler is None:
+        system_config = get_config().get_system_config()
+        encode_workers = system_config.max_encode_workers
+        if encode_workers <= 0:
+            encode_workers = max(1, (os.cpu_count() or 2) // 2)
+        controllers = {}
+        if system_config.adaptive_concurrency:
+            # 配置的并发数作为初始值，由实测指标在上下限之间调整
+            # 延迟按单个合成请求测量，调整的也是同时发出的请求数
+            controllers["tts_request"] = LatencyController(
+                "tts_request", system_config.max_tts_requests, 1,
+                max(system_config.max_tts_requests, system_config.max_adaptive_tts_requests)
+            )
+            controllers["encode"] = ThroughputController(
+                "encode", encode_workers, 1, max(encode_workers, os.cpu_count() or 1)
+            )
+        _scheduler = TaskScheduler(
+            system_config.max_workers,
+            system_config.max_tts_workers,
+            encode_workers,
+            system_config.interactive_reserved_workers,
+            system_config.client_weights,
+            MemoryGate(system_config.memory_admission, system_config.memory_headroom_mb * 1024 * 1024),
+            controllers,
+            system_config.max_tts_requests
+        )
+    return _scheduler
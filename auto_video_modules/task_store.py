@@ -0,0 +1,273 @@
+"""
+任务存储模块
+负责用SQLite持久化任务状态，支持按状态过滤、游标分页和过期清理
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from .config import get_config
+from .workspace_utils import get_task_workspace
+from .thread_pool import get_thread_pool
+
+# 终止状态，处于这些状态的任务不会再变化，可以按保留期清理
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id     TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    params      TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    failure_reason TEXT,
+    video_path  TEXT,
+    text_length INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    priority    TEXT,
+    client_id   TEXT,
+    owner       TEXT,
+    start_time  REAL,
+    end_time    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_end_time ON tasks (end_time);
+"""
+
+# 旧版本数据库中缺少的列：列名 -> 列定义
+_ADDED_COLUMNS = {
+    "failure_reason": "TEXT",
+    "priority": "TEXT",
+    "client_id": "TEXT",
+    "owner": "TEXT"
+}
+
+def process_owner(pid: Optional[int] = None) -> str:
+    """任务记录所属进程的标识：主机名:PID:进程启动时间（毫秒），PID被复用时也能区分"""
+    pid = pid or os.getpid()
+    return f"{socket.gethostname()}:{pid}:{int(psutil.Process(pid).create_time() * 1000)}"
+
+def owner_alive(owner: str) -> bool:
+    """判断任务记录所属的进程是否仍在运行，其他主机上的进程无法判断，视为运行中"""
+    host, _, rest = owner.partition(":")
+    pid, _, _ = rest.partition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        return process_owner(int(pid)) == owner
+    except (ValueError, psutil.Error):
+        return False
+
+class TaskStore:
+    """基于SQLite的任务状态存储"""
+
+    def __init__(self, db_path: str, retention_seconds: float, recover_interrupted: bool = True):
+        """
+        Args:
+            db_path: 数据库路径
+            retention_seconds: 已结束任务的保留时间（秒）
+            recover_interrupted: 本进程是否自行执行任务：写入的记录标记为本进程所有，
+                启动时把所属进程已退出的未结束任务标记为失败；启用渲染队列时为False，由队列租约重新分配
+        """
+        self.db_path = db_path
+        self.owner = process_owner() if recover_interrupted else None
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+        self._evicting = False
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+        if recover_interrupted:
+            self._recover_interrupted()
+
+    def _migrate(self):
+        """为旧版本创建的数据库补充新增的列"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {definition}")
+
+    def _recover_interrupted(self):
+        """把所属进程已退出的未结束任务标记为失败
+
+        批量处理、监视文件夹和MCP服务可以共用同一个数据库，只处理已退出进程的任务，
+        不影响其他仍在运行的进程中的任务；没有所属进程的记录（渲染队列中的任务）不处理。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, owner FROM tasks WHERE owner IS NOT NULL AND status NOT IN (?, ?, ?)",
+                TERMINAL_STATUSES
+            ).fetchall()
+            interrupted = [row["task_id"] for row in rows if not owner_alive(row["owner"])]
+            for task_id in interrupted:
+                self._conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = ?, failure_reason = 'interrupted', end_time = ? "
+                    "WHERE task_id = ?",
+                    ("服务重启，任务中断", time.time(), task_id)
+                )
+
+    def save(self, record: Dict):
+        """写入或更新任务记录
+
+        Args:
+            record: 任务记录，字段与tasks表一致，params为字典
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, status, progress, params, result, error, failure_reason, "
+                "video_path, text_length, created_at, priority, client_id, owner, start_time, end_time) "
+                "VALUES (:task_id, :status, :progress, :params, :result, :error, :failure_reason, "
+                ":video_path, :text_length, :created_at, :priority, :client_id, :owner, :start_time, :end_time) "
+                "ON CONFLICT(task_id) DO UPDATE SET status = excluded.status, owner = excluded.owner, "
+                "progress = excluded.progress, result = excluded.result, error = excluded.error, "
+                "failure_reason = excluded.failure_reason, start_time = excluded.start_time, end_time = excluded.end_time",
+                {
+                    "failure_reason": None,
+                    "priority": None,
+                    "client_id": None,
+                    **record,
+                    "owner": self.owner,
+                    "params": json.dumps(record.get("params", {}), ensure_ascii=False, default=str)
+                }
+            )
+        self.maybe_evict()
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """获取任务记录
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            dict: 任务记录，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["params"] = json.loads(record["params"])
+        return record
+
+    def list(self, status: Optional[str] = None, limit: int = 50,
+             cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """按创建时间倒序分页列出任务摘要（不包含结果内容）
+
+        Args:
+            status: 按状态过滤，为空时不过滤
+            limit: 每页数量
+            cursor: 上一页返回的游标
+
+        Returns:
+            tuple: (任务摘要列表, 下一页游标或None)
+        """
+        limit = max(1, min(int(limit), 500))
+        conditions = []
+        args: List = []
+        if status:
+            conditions.append("status = ?")
+            args.append(status)
+        if cursor:
+            created_at, _, task_id = cursor.partition(":")
+            conditions.append("(created_at < ? OR (created_at = ? AND task_id < ?))")
+            args.extend([float(created_at), float(created_at), task_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            "SELECT task_id, status, progress, video_path, text_length, created_at, start_time, end_time "
+            f"FROM tasks {where} ORDER BY created_at DESC, task_id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(sql, (*args, limit + 1))]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last['created_at']!r}:{last['task_id']}"
+        return rows, next_cursor
+
+    def count(self, status: Optional[str] = None) -> int:
+        """统计任务数量"""
+        with self._lock:
+            if status:
+                row = self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status = ?", (status,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()
+        return row[0]
+
+    def evict_expired(self) -> int:
+        """删除超过保留期的已结束任务，以及失败任务为恢复而保留的工作目录和渲染集群产物目录
+
+        Returns:
+            int: 删除的任务数量
+        """
+        if self.retention_seconds <= 0:
+            return 0
+        deadline = time.time() - self.retention_seconds
+        condition = "end_time IS NOT NULL AND end_time < ? AND status IN (?, ?, ?)"
+        args = (deadline, *TERMINAL_STATUSES)
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute(f"SELECT task_id FROM tasks WHERE {condition}", args)]
+            self._conn.execute(f"DELETE FROM tasks WHERE {condition}", args)
+        self._last_eviction = time.time()
+        from .render_farm import remove_task_artifacts
+        for task_id in expired:
+            work_dir = get_task_workspace(task_id)
+            if os.path.isdir(work_dir):
+                shutil.rmtree(work_dir, ignore_errors=True)
+            remove_task_artifacts(task_id)
+        return len(expired)
+
+    def maybe_evict(self, interval: float = 60.0):
+        """距上次清理超过interval秒时在共享线程池中执行一次过期清理
+
+        save 由任务状态的写入线程调用（persist_task），删除工作目录可能耗时较长，不阻塞后续的状态写入。
+        """
+        with self._lock:
+            if self._evicting or time.time() - self._last_eviction < interval:
+                return
+            self._evicting = True
+        try:
+            get_thread_pool().submit(self._evict_in_background)
+        except RuntimeError:
+            # 线程池已关闭（进程退出中），下次保存时再清理
+            self._evicting = False
+
+    def _evict_in_background(self):
+        try:
+            self.evict_expired()
+        except Exception as e:
+            print(f"清理过期任务失败: {e}")
+        finally:
+            self._last_eviction = time.time()
+            self._evicting = False
+
+_store: Optional[TaskStore] = None
+
+def get_task_store() -> TaskStore:
+    """获取全局任务存储实例"""
+    global _store
+    if _store is None:
+        config = get_config()
+        system_config = config.get_system_config()
+        db_path = system_config.task_db_path or os.path.join(config.workspace, "tasks.db")
+        # 启用渲染队列时任务由独立的工作进程执行，进程重启不代表任务中断（由队列租约重新分配）
+        _store = TaskStore(db_path, system_config.task_retention_hours * 3600,
+                           recover_interrupted=not system_config.render_queue_enabled)
+    return _store
@@ -0,0 +1,60 @@
+"""
+线程池模块
+负责在有上限的共享线程池中执行MCP工具中的阻塞操作（音频解码、视频探测、数据库读写、短时子进程等），
+避免某个较慢的诊断调用阻塞SSE服务的事件循环；CPU密集型的处理阶段仍由进程池执行
+"""
+
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .config import get_config
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+def get_thread_pool_size() -> int:
+    """获取线程池大小（SystemConfig.max_thread_workers，0表示 min(32, CPU核心数+4)）"""
+    size = get_config().get_system_config().max_thread_workers
+    if size <= 0:
+        size = min(32, (os.cpu_count() or 1) + 4)
+    return size
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """获取全局线程池实例（各进程中的多个事件循环共用）"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_thread_pool_size(), thread_name_prefix="blocking")
+        return _executor
+
+async def run_in_thread(func: Callable, *args, **kwargs):
+    """在共享线程池中执行阻塞函数并等待结果
+
+    与 asyncio.to_thread 一样把当前的上下文变量（任务ID、工作目录等）带入线程，
+    但所有调用共用同一个有上限的线程池，线程池占满时调用在队列中等待。
+
+    Args:
+        func: 要执行的函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_thread_pool(), call)
+
+def shutdown_thread_pool(wait: bool = True):
+    """关闭线程池"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+            _executor = None
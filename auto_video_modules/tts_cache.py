@@ -0,0 +1,228 @@
+"""
+TTS缓存模块
+负责缓存已合成的语音片段：以规范化文本、音色和输出格式的哈希为键保存音频和实测时长，
+多个视频中重复出现的句子（片头、片尾、免责声明等）只合成一次，按总大小淘汰最久未使用的条目
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from .config import get_config
+from .file_lock import file_lock
+
+# edge-tts 输出的音频格式（写入缓存键，格式变化时不会读到旧格式的音频）
+TTS_OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+def normalize_tts_text(text: str) -> str:
+    """规范化朗读文本：统一Unicode形式并合并空白，使只有空白差异的句子命中同一条目"""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+def tts_cache_key(text: str, voice: str, output_format: str = TTS_OUTPUT_FORMAT) -> str:
+    """计算TTS缓存键
+
+    Args:
+        text: 朗读文本
+        voice: 语音音色名称
+        output_format: 音频输出格式
+
+    Returns:
+        str: 规范化文本、音色和输出格式的SHA256
+    """
+    data = json.dumps([normalize_tts_text(text), voice, output_format], ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """语音片段缓存，多个进程可以共用同一缓存目录，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(cache_dir, ".lock")
+        self._entries: Dict[str, Dict] = {}
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._entries = self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.cache_dir, f"{key}.mp3"),
+            os.path.join(self.cache_dir, f"{key}.json")
+        )
+
+    @contextmanager
+    def _locked(self):
+        """修改缓存索引时加锁：本进程内用线程锁，进程之间用缓存目录中的锁文件"""
+        with self._lock, file_lock(self._lock_path):
+            yield
+
+    def _read_meta(self, meta_path: str) -> Optional[Dict]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _scan(self) -> Dict[str, Dict]:
+        """扫描缓存目录，读取所有进程写入的条目"""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                entry = self._read_meta(os.path.join(self.cache_dir, name))
+                if entry is not None:
+                    entries[name[:-len(".json")]] = entry
+        return entries
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_atomic(self, path: str, write):
+        """先写入同目录下的临时文件再替换，其他进程不会读到不完整的文件"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, meta_path: str, entry: Dict):
+        def write(temp_path):
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+        self._write_atomic(meta_path, write)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str, output_path: str) -> Optional[float]:
+        """查找缓存条目，命中时把音频复制到 output_path（复制时不持有锁）
+
+        Args:
+            key: 缓存键（tts_cache_key）
+            output_path: 音频输出路径
+
+        Returns:
+            float: 缓存的音频时长（秒），未命中时返回None
+        """
+        if not self.enabled:
+            return None
+        audio_path, meta_path = self._paths(key)
+        # 其他进程写入的条目不在本进程的索引中，从缓存目录读取
+        entry = self._read_meta(meta_path)
+        try:
+            if entry is None or os.path.getsize(audio_path) != entry["size"]:
+                raise OSError("缓存文件缺失或已被修改")
+            shutil.copyfile(audio_path, output_path)
+        except OSError:
+            if entry is not None:
+                with self._locked():
+                    # 加锁后重新检查，其他进程可能已经重新写入了该条目
+                    current = self._read_meta(meta_path)
+                    try:
+                        intact = current is not None and os.path.getsize(audio_path) == current["size"]
+                    except OSError:
+                        intact = False
+                    if not intact:
+                        self._remove(key)
+            self._count(False)
+            return None
+        self._count(True)
+        entry["last_access"] = time.time()
+        with self._locked():
+            self._entries[key] = entry
+            try:
+                self._write_meta(meta_path, entry)
+            except OSError:
+                pass
+        return entry["duration"]
+
+    def put(self, key: str, audio_path: str, duration: float) -> bool:
+        """把合成的音频和实测时长写入缓存
+
+        Args:
+            key: 缓存键（tts_cache_key）
+            audio_path: 合成的音频文件
+            duration: 音频时长（秒）
+
+        Returns:
+            bool: 是否写入成功
+        """
+        if not self.enabled or not os.path.exists(audio_path):
+            return False
+        size = os.path.getsize(audio_path)
+        if size > self.max_bytes:
+            return False
+        cached_path, meta_path = self._paths(key)
+        entry = {"size": size, "duration": duration, "created_at": time.time(), "last_access": time.time()}
+        try:
+            # 复制音频不持有索引锁，临时文件名按进程和线程区分
+            self._write_atomic(cached_path, lambda temp_path: shutil.copyfile(audio_path, temp_path))
+            with self._locked():
+                self._write_meta(meta_path, entry)
+                # 重新读取索引，按所有进程写入的条目计算总大小和最近访问时间
+                self._entries = self._scan()
+                self._evict()
+        except OSError as e:
+            print(f"写入TTS缓存失败: {e}")
+            return False
+        return True
+
+    def _evict(self):
+        """总大小超过上限时，按最近访问时间淘汰条目"""
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._remove(key)
+
+    def get_status(self) -> Dict:
+        """获取缓存状态"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+def get_tts_cache() -> TTSCache:
+    """获取全局TTS缓存实例"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = get_config()
+            system_config = config.get_system_config()
+            cache_dir = system_config.tts_cache_dir or os.path.join(config.workspace, "tts_cache")
+            _cache = TTSCache(cache_dir, system_config.tts_cache_size_mb * 1024 * 1024)
+        return _cache
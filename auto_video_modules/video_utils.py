@@ -6,8 +6,9 @@
 import os
 import json
 import time
-import subprocess
 import shutil
+import socket
+from contextlib import contextmanager
 from tqdm import tqdm
 from moviepy.editor import VideoFileClip, concatenate_videoclips, CompositeVideoClip, ImageClip, TextClip
 from moviepy.audio.io.AudioFileClip import AudioFileClip
@@ -16,6 +17,9 @@ from PIL import Image, ImageDraw, ImageFont
 import tempfile
 import numpy as np
 import opencc
+from .workspace_utils import workspace_path
+from .thread_pool import run_in_thread
+from .ffmpeg_runner import run_ffmpeg, run_ffmpeg_sync
 
 # 创建MCP实例
 mcp = FastMCP("video-utils", log_level="ERROR")
@@ -269,7 +273,7 @@ def find_imagemagick():
             return path
     return None
 
-def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path):
+def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path, work_dir=None):
     """合并音频和视频
     
     Args:
@@ -277,6 +281,7 @@ def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path
         audio_file_path: 音频文件路径
         output_path: 输出文件路径
         ffmpeg_path: ffmpeg可执行文件路径
+        work_dir: 任务工作目录，中间文件写入该目录，为None时使用当前目录
     """
     print("正在加载音频文件...")
     audio_clip = AudioFileClip(audio_file_path)
@@ -290,7 +295,7 @@ def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path
     trimmed_audio_path = None
     if audio_duration > video_duration:
         print(f"音频时长超过视频时长，将音频物理截断并保存为新文件，时长 {video_duration:.2f} 秒")
-        trimmed_audio_path = "audio_trimmed.mp3"
+        trimmed_audio_path = workspace_path(work_dir, "audio_trimmed.mp3")
         audio_clip.close()
         cmd = [
             ffmpeg_path, "-y",
@@ -299,13 +304,13 @@ def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path
             "-c:a", "mp3",
             trimmed_audio_path
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        run_ffmpeg_sync(cmd)
         print(f"音频截断完成，新文件: {trimmed_audio_path}")
         audio_clip = AudioFileClip(trimmed_audio_path)
         print(f"截断后音频时长: {audio_clip.duration:.2f} 秒")
     
     # 生成无音频的视频文件
-    temp_video_path = "temp_video.mp4"
+    temp_video_path = workspace_path(work_dir, "temp_video.mp4")
     print("正在生成无音频视频...")
     video_with_subs.write_videofile(temp_video_path, codec='libx264', fps=24, audio=False)
     
@@ -322,7 +327,7 @@ def merge_audio_video(video_with_subs, audio_file_path, output_path, ffmpeg_path
         "-to", str(video_duration),
         output_path
     ]
-    subprocess.run(cmd, check=True, capture_output=True)
+    run_ffmpeg_sync(cmd)
     print('处理完成! 输出文件:', output_path)
     
     return trimmed_audio_path, temp_video_path
@@ -504,7 +509,7 @@ async def generate_video(config, timing):
             "-c:a", "mp3",
             trimmed_audio_path
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        await run_ffmpeg(cmd)
         print(f"音频截断完成，新文件: {trimmed_audio_path}")
         audio_clip = AudioFileClip(trimmed_audio_path)
         print(f"截断后音频时长: {audio_clip.duration:.2f} 秒")
@@ -532,7 +537,7 @@ async def generate_video(config, timing):
         "-to", str(original_video_duration),
         output_path
     ]
-    subprocess.run(cmd, check=True, capture_output=True)
+    await run_ffmpeg(cmd)
     print('处理完成! 输出文件:', output_path)
     
     # 清理临时文件
@@ -582,177 +587,363 @@ def get_video_info(video_path):
     except Exception as e:
         return {"error": str(e)}
 
-def create_video_with_subtitles(video_path, audio_path, subtitle_segments, output_path, subtitle_style=None, subtitle_images=None, quality_preset=None):
-    """用PIL字幕图片合成带字幕视频
+def build_subtitle_clips(subtitle_segments, subtitle_style=None, subtitle_images=None, target_size=(1920, 1080)):
+    """按字幕片段创建叠加在视频上的字幕图片剪辑
     
     Args:
-        video_path: 视频文件路径
-        audio_path: 音频文件路径
         subtitle_segments: 字幕片段列表，格式为 [(text, start, end), ...]
-        output_path: 输出视频路径
         subtitle_style: 字幕样式配置
         subtitle_images: 预生成的字幕图片路径列表，如果为None则自动生成
-        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
-    """
-    try:
-        # 加载视频和音频
-        video = VideoFileClip(video_path)
-        audio = AudioFileClip(audio_path)
+        target_size: 目标分辨率 (宽, 高)
         
-        # 获取画质配置
-        from .config import get_config
-        config = get_config()
-        video_config = config.get_video_config()
+    Returns:
+        list: 字幕ImageClip列表
+    """
+    from .config import get_config
+    config = get_config()
+    subtitle_clips = []
+    
+    if subtitle_images is not None:
+        # 使用预生成的字幕图片
+        for i, (text, start_time, end_time) in enumerate(subtitle_segments):
+            if i < len(subtitle_images) and subtitle_images[i] is not None:
+                # 使用预生成的图片（numpy数组）
+                if isinstance(subtitle_images[i], np.ndarray):
+                    # 直接使用numpy数组创建ImageClip
+                    img_clip = ImageClip(subtitle_images[i]).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
+                else:
+                    # 如果是文件路径，使用文件路径创建ImageClip
+                    img_clip = ImageClip(subtitle_images[i]).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
+                subtitle_clips.append(img_clip)
+            elif text.strip():  # 如果有文本但没有预生成图片，则动态生成
+                subtitle_config = config.get_subtitle_config()
+                
+                # 解析字幕样式配置
+                if subtitle_style is None:
+                    subtitle_style = {}
+                
+                font_size = subtitle_style.get('fontSize', subtitle_config.font_size)
+                color = subtitle_style.get('color', subtitle_config.font_color)
+                bg_color = subtitle_style.get('bgColor', subtitle_config.bg_color)
+                font_path = subtitle_style.get('fontPath', subtitle_config.font_path)
+                subtitle_height = subtitle_style.get('height', 100)
+                
+                img_array = create_subtitle_image_pil(
+                    text, 
+                    fontsize=font_size, 
+                    color=color, 
+                    font_path=font_path,
+                    size=target_size,
+                    bg_color=bg_color,
+                    subtitle_height=subtitle_height
+                )
+                img_clip = ImageClip(img_array).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
+                subtitle_clips.append(img_clip)
+    else:
+        # 动态生成字幕图片（原有逻辑）
+        subtitle_config = config.get_subtitle_config()
         
-        # 如果指定了画质预设，则应用画质配置
-        if quality_preset:
-            video_config.set_quality(quality_preset)
-            print(f"应用画质配置: {quality_preset}")
+        if subtitle_style is None:
+            subtitle_style = {}
         
-        # 获取目标分辨率和比特率
-        target_width, target_height = video_config.get_resolution_by_quality()
-        target_bitrate = video_config.get_bitrate_by_quality()
+        font_size = subtitle_style.get('fontSize', subtitle_config.font_size)
+        color = subtitle_style.get('color', subtitle_config.font_color)
+        bg_color = subtitle_style.get('bgColor', subtitle_config.bg_color)
+        font_path = subtitle_style.get('fontPath', subtitle_config.font_path)
+        subtitle_height = subtitle_style.get('height', 100)
         
-        print(f"目标分辨率: {target_width}x{target_height}")
-        print(f"目标比特率: {target_bitrate}")
+        for i, (text, start_time, end_time) in enumerate(subtitle_segments):
+            if text.strip():  # 只处理非空文本
+                img_path = create_subtitle_image_pil(
+                    text, 
+                    fontsize=font_size, 
+                    color=color, 
+                    font_path=font_path,
+                    size=target_size,
+                    bg_color=bg_color,
+                    subtitle_height=subtitle_height
+                )
+                img_clip = ImageClip(img_path).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
+                subtitle_clips.append(img_clip)
+    return subtitle_clips
+
+def fit_audio_to_video(audio_path, video_duration, work_dir=None):
+    """音频时长超过视频时长时，把音频物理截断并保存为新文件
+    
+    Args:
+        audio_path: 音频文件路径
+        video_duration: 视频时长（秒）
+        work_dir: 任务工作目录，截断后的音频写入该目录
         
-        # 创建字幕剪辑
-        subtitle_clips = []
+    Returns:
+        str: 供音视频合成使用的音频路径（未截断时为原路径）
+    """
+    audio = AudioFileClip(audio_path)
+    audio_duration = audio.duration
+    audio.close()
+    print(f"原始视频时长: {video_duration:.2f} 秒")
+    print(f"音频时长: {audio_duration:.2f} 秒")
+    if audio_duration <= video_duration:
+        return audio_path
+    
+    print(f"音频时长超过视频时长，将音频物理截断并保存为新文件，时长 {video_duration:.2f} 秒")
+    trimmed_audio_path = workspace_path(work_dir, "audio_trimmed.mp3")
+    from .ffmpeg_utils import check_ffmpeg
+    ffmpeg_path, _ = check_ffmpeg()
+    cmd = [
+        ffmpeg_path, "-y",
+        "-i", audio_path,
+        "-ss", "0", "-t", str(video_duration),
+        "-c:a", "mp3",
+        trimmed_audio_path
+    ]
+    run_ffmpeg_sync(cmd)
+    print(f"音频截断完成，新文件: {trimmed_audio_path}")
+    return trimmed_audio_path
+
+def compose_subtitle_video(video_path, audio_path, subtitle_segments, subtitle_style=None, subtitle_images=None, quality_preset=None, work_dir=None):
+    """合成阶段：把字幕图片叠加到视频上，生成无音频的中间视频（写入工作目录）
+    
+    Args:
+        video_path: 视频文件路径
+        audio_path: 音频文件路径
+        subtitle_segments: 字幕片段列表，格式为 [(text, start, end), ...]
+        subtitle_style: 字幕样式配置
+        subtitle_images: 预生成的字幕图片路径列表，如果为None则自动生成
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
+        work_dir: 任务工作目录，中间文件写入该目录，为None时使用当前目录
         
-        if subtitle_images is not None:
-            # 使用预生成的字幕图片
-            for i, (text, start_time, end_time) in enumerate(subtitle_segments):
-                if i < len(subtitle_images) and subtitle_images[i] is not None:
-                    # 使用预生成的图片（numpy数组）
-                    if isinstance(subtitle_images[i], np.ndarray):
-                        # 直接使用numpy数组创建ImageClip
-                        img_clip = ImageClip(subtitle_images[i]).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
-                    else:
-                        # 如果是文件路径，使用文件路径创建ImageClip
-                        img_clip = ImageClip(subtitle_images[i]).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
-                    subtitle_clips.append(img_clip)
-                elif text.strip():  # 如果有文本但没有预生成图片，则动态生成
-                    subtitle_config = config.get_subtitle_config()
-                    
-                    # 解析字幕样式配置
-                    if subtitle_style is None:
-                        subtitle_style = {}
-                    
-                    font_size = subtitle_style.get('fontSize', subtitle_config.font_size)
-                    color = subtitle_style.get('color', subtitle_config.font_color)
-                    bg_color = subtitle_style.get('bgColor', subtitle_config.bg_color)
-                    font_path = subtitle_style.get('fontPath', subtitle_config.font_path)
-                    subtitle_height = subtitle_style.get('height', 100)
-                    
-                    img_array = create_subtitle_image_pil(
-                        text, 
-                        fontsize=font_size, 
-                        color=color, 
-                        font_path=font_path,
-                        size=(target_width, target_height),
-                        bg_color=bg_color,
-                        subtitle_height=subtitle_height
-                    )
-                    img_clip = ImageClip(img_array).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
-                    subtitle_clips.append(img_clip)
-        else:
-            # 动态生成字幕图片（原有逻辑）
-            subtitle_config = config.get_subtitle_config()
-            
-            if subtitle_style is None:
-                subtitle_style = {}
-            
-            font_size = subtitle_style.get('fontSize', subtitle_config.font_size)
-            color = subtitle_style.get('color', subtitle_config.font_color)
-            bg_color = subtitle_style.get('bgColor', subtitle_config.bg_color)
-            font_path = subtitle_style.get('fontPath', subtitle_config.font_path)
-            subtitle_height = subtitle_style.get('height', 100)
-            
-            for i, (text, start_time, end_time) in enumerate(subtitle_segments):
-                if text.strip():  # 只处理非空文本
-                    img_path = create_subtitle_image_pil(
-                        text, 
-                        fontsize=font_size, 
-                        color=color, 
-                        font_path=font_path,
-                        size=(target_width, target_height),
-                        bg_color=bg_color,
-                        subtitle_height=subtitle_height
-                    )
-                    img_clip = ImageClip(img_path).set_position(('center', 'bottom')).set_duration(end_time - start_time).set_start(start_time)
-                    subtitle_clips.append(img_clip)
+    Returns:
+        dict: 中间视频路径 video_path、供音视频合成使用的音频路径 audio_path（可能已截断）、视频时长 duration
+    """
+    # 加载视频
+    video = VideoFileClip(video_path)
+    
+    # 获取画质配置（不修改全局配置，避免并发任务之间互相影响）
+    from .config import get_config
+    video_config = get_config().get_video_config()
+    
+    if quality_preset:
+        print(f"应用画质配置: {quality_preset}")
+    
+    # 获取目标分辨率和比特率
+    target_width, target_height = video_config.get_resolution_by_quality(quality_preset)
+    target_bitrate = video_config.get_bitrate_by_quality(quality_preset)
+    
+    print(f"目标分辨率: {target_width}x{target_height}")
+    print(f"目标比特率: {target_bitrate}")
+    
+    # 创建字幕剪辑
+    subtitle_clips = build_subtitle_clips(subtitle_segments, subtitle_style, subtitle_images, (target_width, target_height))
+    
+    # 合成视频和字幕
+    print("正在合成视频和字幕...")
+    video_with_subs = CompositeVideoClip([video] + subtitle_clips)
+    
+    # 使用原始视频时长作为基准
+    original_video_duration = video.duration
+    mux_audio_path = fit_audio_to_video(audio_path, original_video_duration, work_dir)
+    
+    # 生成无音频的视频文件（应用画质配置）
+    from .task_progress import ffmpeg_progress_args
+    temp_video_path = workspace_path(work_dir, "temp_video.mp4")
+    print("正在生成无音频视频...")
+    video_with_subs.write_videofile(
+        temp_video_path, 
+        codec='libx264', 
+        fps=24, 
+        audio=False,
+        ffmpeg_params=ffmpeg_progress_args("compose")
+    )
+    
+    # 清理资源
+    video.close()
+    video_with_subs.close()
+    
+    return {
+        "video_path": temp_video_path,
+        "audio_path": mux_audio_path,
+        "duration": original_video_duration
+    }
+
+def compose_subtitle_chunk(video_path, subtitle_segments, start, end, output_path, subtitle_style=None, subtitle_images=None, quality_preset=None):
+    """分块合成：把视频 [start, end) 区间与该区间内的字幕合成为无音频的视频块（供渲染集群各节点调用）
+    
+    各视频块与整段合成使用相同的编码参数，拼接时可以直接复制码流。
+    
+    Args:
+        video_path: 视频文件路径
+        subtitle_segments: 该区间内的字幕片段列表，时间相对于区间起点，格式为 [(text, start, end), ...]
+        start: 区间起点（秒）
+        end: 区间终点（秒）
+        output_path: 视频块输出路径，写入完成后才出现在该路径
+        subtitle_style: 字幕样式配置
+        subtitle_images: 与 subtitle_segments 对应的预生成字幕图片路径列表
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
         
-        # 合成视频和字幕
-        print("正在合成视频和字幕...")
-        video_with_subs = CompositeVideoClip([video] + subtitle_clips)
+    Returns:
+        dict: 视频块路径 path 和时长 duration
+    """
+    from .config import get_config
+    source = VideoFileClip(video_path)
+    video = source.subclip(start, min(end, source.duration))
+    target_width, target_height = get_config().get_video_config().get_resolution_by_quality(quality_preset)
+    subtitle_clips = build_subtitle_clips(subtitle_segments, subtitle_style, subtitle_images, (target_width, target_height))
+    video_with_subs = CompositeVideoClip([video] + subtitle_clips)
+    
+    # 先写入临时文件再改名，其他节点只会看到完整的视频块；临时文件名包含节点标识，
+    # 租约过期后重新领取同一视频块的节点不会写入同一个临时文件
+    base, ext = os.path.splitext(output_path)
+    part_path = f"{base}.{socket.gethostname()}-{os.getpid()}.part{ext}"
+    try:
+        video_with_subs.write_videofile(part_path, codec='libx264', fps=24, audio=False)
+        os.replace(part_path, output_path)
+        duration = video.duration
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        video_with_subs.close()
+        source.close()
+    print(f"视频块合成完成: {output_path}（{start:.2f}-{end:.2f} 秒）")
+    return {"path": output_path, "duration": duration}
+
+def concat_video_chunks(chunk_paths, output_path):
+    """用ffmpeg concat 分离器按顺序拼接视频块，直接复制码流不重新编码
+    
+    Args:
+        chunk_paths: 视频块路径列表（按时间顺序）
+        output_path: 输出视频路径
         
-        # 使用原始视频时长作为基准
-        original_video_duration = video.duration
-        audio_duration = audio.duration
-        print(f"原始视频时长: {original_video_duration:.2f} 秒")
-        print(f"音频时长: {audio_duration:.2f} 秒")
+    Returns:
+        dict: 拼接后视频的文件信息
+    """
+    from .ffmpeg_utils import check_ffmpeg
+    ffmpeg_path, _ = check_ffmpeg()
+    list_path = f"{output_path}.concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in chunk_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        ffmpeg_path, "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        output_path
+    ]
+    try:
+        run_ffmpeg_sync(cmd)
+    finally:
+        os.remove(list_path)
+    print(f"已拼接 {len(chunk_paths)} 个视频块: {output_path}")
+    return get_video_info(output_path)
+
+@contextmanager
+def atomic_output(output_path):
+    """最终输出先写入同目录下的临时文件，成功后再改名为输出路径
+    
+    任务被取消、超时或进程崩溃时不会在输出路径留下截断的视频（批量任务按输出文件是否存在跳过已完成的条目）。
+    
+    Args:
+        output_path: 输出视频路径
         
-        trimmed_audio_path = None
-        if audio_duration > original_video_duration:
-            print(f"音频时长超过视频时长，将音频物理截断并保存为新文件，时长 {original_video_duration:.2f} 秒")
-            trimmed_audio_path = "audio_trimmed.mp3"
-            audio.close()
-            from .ffmpeg_utils import check_ffmpeg
-            ffmpeg_path, _ = check_ffmpeg()
-            cmd = [
-                ffmpeg_path, "-y",
-                "-i", audio_path,
-                "-ss", "0", "-t", str(original_video_duration),
-                "-c:a", "mp3",
-                trimmed_audio_path
-            ]
-            subprocess.run(cmd, check=True, capture_output=True)
-            print(f"音频截断完成，新文件: {trimmed_audio_path}")
-            audio = AudioFileClip(trimmed_audio_path)
-            print(f"截断后音频时长: {audio.duration:.2f} 秒")
+    Yields:
+        str: 临时文件路径（保留扩展名，ffmpeg按扩展名选择封装格式）
+    """
+    base, ext = os.path.splitext(output_path)
+    part_path = f"{base}.{os.getpid()}.part{ext}"
+    try:
+        yield part_path
+        os.replace(part_path, output_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+def build_mux_command(video_path, audio_path, output_path, duration, quality_preset=None):
+    """构建音视频合成阶段的ffmpeg命令：把合成阶段的中间视频与音频合成为最终输出，并应用画质配置
+    
+    Args:
+        video_path: 合成阶段生成的无音频视频
+        audio_path: 音频文件路径
+        output_path: 输出视频路径
+        duration: 输出时长（秒），以原始视频时长为准
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
         
-        # 生成无音频的视频文件（应用画质配置）
-        temp_video_path = "temp_video.mp4"
-        print("正在生成无音频视频...")
-        video_with_subs.write_videofile(
-            temp_video_path, 
-            codec='libx264', 
-            fps=24, 
-            audio=False
+    Returns:
+        list: ffmpeg命令及参数
+    """
+    from .config import get_config
+    video_config = get_config().get_video_config()
+    target_width, target_height = video_config.get_resolution_by_quality(quality_preset)
+    target_bitrate = video_config.get_bitrate_by_quality(quality_preset)
+    
+    from .ffmpeg_utils import check_ffmpeg
+    ffmpeg_path, _ = check_ffmpeg()
+    
+    # 构建ffmpeg命令，应用画质配置
+    return [
+        ffmpeg_path, "-y",
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "libx264",
+        "-b:v", target_bitrate,
+        "-s", f"{target_width}x{target_height}",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-to", str(duration),
+        output_path
+    ]
+
+def mux_subtitle_video(video_path, audio_path, output_path, duration, quality_preset=None):
+    """音视频合成阶段：把合成阶段的中间视频与音频合成为最终输出，并应用画质配置
+    
+    Args:
+        video_path: 合成阶段生成的无音频视频
+        audio_path: 音频文件路径
+        output_path: 输出视频路径
+        duration: 输出时长（秒），以原始视频时长为准
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
+    """
+    print("正在使用ffmpeg合成音视频...")
+    with atomic_output(output_path) as part_path:
+        run_ffmpeg_sync(build_mux_command(video_path, audio_path, part_path, duration, quality_preset), stage="mux")
+    print('处理完成! 输出文件:', output_path)
+
+def create_video_with_subtitles(video_path, audio_path, subtitle_segments, output_path, subtitle_style=None, subtitle_images=None, quality_preset=None, work_dir=None):
+    """用PIL字幕图片合成带字幕视频
+    
+    Args:
+        video_path: 视频文件路径
+        audio_path: 音频文件路径
+        subtitle_segments: 字幕片段列表，格式为 [(text, start, end), ...]
+        output_path: 输出视频路径
+        subtitle_style: 字幕样式配置
+        subtitle_images: 预生成的字幕图片路径列表，如果为None则自动生成
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
+        work_dir: 任务工作目录，中间文件写入该目录，为None时使用当前目录
+    """
+    try:
+        composed = compose_subtitle_video(
+            video_path, audio_path, subtitle_segments,
+            subtitle_style, subtitle_images, quality_preset, work_dir
+        )
+        mux_subtitle_video(
+            composed["video_path"], composed["audio_path"], output_path,
+            composed["duration"], quality_preset
         )
-        
-        # 用ffmpeg合成，应用画质配置
-        print("正在使用ffmpeg合成音视频...")
-        from .ffmpeg_utils import check_ffmpeg
-        ffmpeg_path, _ = check_ffmpeg()
-        audio_file_to_use = trimmed_audio_path if trimmed_audio_path else audio_path
-        
-        # 构建ffmpeg命令，应用画质配置
-        cmd = [
-            ffmpeg_path, "-y",
-            "-i", temp_video_path,
-            "-i", audio_file_to_use,
-            "-map", "0:v:0", "-map", "1:a:0",
-            "-c:v", "libx264",
-            "-b:v", target_bitrate,
-            "-s", f"{target_width}x{target_height}",
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-to", str(original_video_duration),
-            output_path
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-        print('处理完成! 输出文件:', output_path)
-        
-        # 清理资源
-        video.close()
-        audio.close()
-        video_with_subs.close()
         
         # 清理临时文件
-        temp_files = [temp_video_path]
-        if trimmed_audio_path:
-            temp_files.append(trimmed_audio_path)
+        temp_files = [composed["video_path"]]
+        if composed["audio_path"] != audio_path:
+            temp_files.append(composed["audio_path"])
         cleanup_temp_files(temp_files)
         
         print(f"视频生成成功: {output_path}")
@@ -761,6 +952,152 @@ def create_video_with_subtitles(video_path, audio_path, subtitle_segments, outpu
         print(f"视频生成失败: {e}")
         return False
 
+def clip_video_to_file(video_path, keep_intervals, output_path):
+    """剪辑视频片段并写入文件（供进程池调用，只返回可序列化的视频信息）
+    
+    Args:
+        video_path: 视频文件路径
+        keep_intervals: 保留区间列表
+        output_path: 剪辑后视频的输出路径
+        
+    Returns:
+        dict: 剪辑后视频的文件信息
+    """
+    from .task_progress import ffmpeg_progress_args
+    
+    final_clip = clip_video_segments(video_path, keep_intervals)
+    try:
+        final_clip.write_videofile(output_path, codec='libx264', fps=24, audio=False,
+                                   ffmpeg_params=ffmpeg_progress_args("cut"))
+    finally:
+        final_clip.close()
+    print(f"视频剪辑完成，保存到: {output_path}")
+    return get_video_info(output_path)
+
+def render_subtitle_images(texts, size, font_path=None, fontsize=40, color='white', bg_color=(0,0,0,0), subtitle_height=100, work_dir=None):
+    """批量渲染字幕图片并保存为PNG文件（供进程池调用，只返回文件路径）
+    
+    Args:
+        texts: 字幕文本列表，空白文本对应静默片段
+        size: 视频分辨率 (width, height)
+        font_path: 字体路径
+        fontsize: 字体大小
+        color: 字体颜色
+        bg_color: 背景颜色
+        subtitle_height: 字幕区域高度
+        work_dir: 任务工作目录
+        
+    Returns:
+        list: 字幕图片路径列表，静默片段对应None
+    """
+    from .process_pool import check_cancelled
+    from .task_progress import report_worker_progress
+    
+    image_paths = []
+    for i, text in enumerate(texts):
+        check_cancelled()
+        report_worker_progress("subtitle", i, len(texts))
+        if not text.strip():
+            image_paths.append(None)
+            continue
+        img_array = create_subtitle_image_pil(
+            text,
+            fontsize=fontsize,
+            color=color,
+            font_path=font_path,
+            size=size,
+            bg_color=bg_color,
+            subtitle_height=subtitle_height
+        )
+        image_path = workspace_path(work_dir, f"subtitle_{i}.png")
+        Image.fromarray(img_array).save(image_path)
+        image_paths.append(image_path)
+    report_worker_progress("subtitle", len(texts), len(texts))
+    return image_paths
+
+def _encode_command(ffmpeg_path, input_path, output_path, video_codec, target_bitrate, target_width, target_height):
+    """构建使用指定编码器转码视频（保持原音频）的ffmpeg命令"""
+    return [
+        ffmpeg_path, "-y",
+        "-i", input_path,
+        "-c:v", video_codec,
+        "-b:v", target_bitrate,
+        "-s", f"{target_width}x{target_height}",
+        "-c:a", "copy",  # 保持原音频
+        output_path
+    ]
+
+def build_transcode_commands(input_path, output_path, quality_preset="720p", enable_gpu_acceleration=False, gpu_type="auto"):
+    """按画质预设构建转码视频的ffmpeg命令（无字幕、无配音）
+    
+    启用GPU加速时返回多个候选命令：优化的GPU编码命令在前，标准GPU（或CPU）编码命令在后，
+    前一个命令执行失败时依次回退。
+    
+    Args:
+        input_path: 输入视频路径
+        output_path: 输出视频路径
+        quality_preset: 画质预设 (240p, 360p, 480p, 720p, 1080p)
+        enable_gpu_acceleration: 是否启用GPU加速
+        gpu_type: GPU类型 ("auto", "amd", "nvidia", "intel")
+        
+    Returns:
+        list: 候选ffmpeg命令列表
+    """
+    from .config import get_config
+    from .ffmpeg_utils import check_ffmpeg, get_gpu_encoder
+    
+    # 获取画质配置（不修改全局配置，避免并发任务之间互相影响）
+    video_config = get_config().get_video_config()
+    if quality_preset:
+        print(f"应用画质配置: {quality_preset}")
+    target_width, target_height = video_config.get_resolution_by_quality(quality_preset)
+    target_bitrate = video_config.get_bitrate_by_quality(quality_preset)
+    print(f"目标分辨率: {target_width}x{target_height}")
+    print(f"目标比特率: {target_bitrate}")
+    
+    # 使用ffmpeg直接处理视频（无音频、无字幕）
+    ffmpeg_path, _ = check_ffmpeg()
+    
+    if not enable_gpu_acceleration:
+        print("使用CPU编码器: libx264")
+        return [_encode_command(ffmpeg_path, input_path, output_path, "libx264", target_bitrate, target_width, target_height)]
+    
+    commands = []
+    print("[GPU加速] 启用极致GPU硬件编码加速...")
+    try:
+        from .gpu_optimization_utils import GPUOptimizer
+        
+        # 创建GPU优化器
+        optimizer = GPUOptimizer()
+        gpu_config = optimizer.auto_optimize_config(input_path, quality_preset)
+        
+        print(f"[GPU加速] 使用优化编码器: {gpu_config.encoder}")
+        print(f"[GPU加速] 线程数: {gpu_config.threads}")
+        print(f"[GPU加速] 异步深度: {gpu_config.async_depth}")
+        print(f"[GPU加速] 缓冲区: {gpu_config.buffer_size}MB")
+        
+        # 构建优化的FFmpeg命令
+        commands.append(optimizer.build_optimized_ffmpeg_command(
+            input_path, output_path, gpu_config,
+            additional_params={
+                "b:v": target_bitrate,
+                "s": f"{target_width}x{target_height}"
+            }
+        ))
+    except Exception as e:
+        print(f"[GPU加速] 极致优化失败，使用标准处理: {e}")
+    
+    # 回退到标准GPU处理
+    gpu_encoder = get_gpu_encoder(quality_preset, gpu_type)
+    if gpu_encoder:
+        video_codec = gpu_encoder
+        print(f"标准GPU编码器: {gpu_encoder}")
+    else:
+        video_codec = "libx264"
+        print("GPU加速不可用，使用CPU编码器: libx264")
+    commands.append(_encode_command(ffmpeg_path, input_path, output_path, video_codec, target_bitrate, target_width, target_height))
+    return commands
+
 def trim_video(video_path, start_time, end_time, output_path):
     """裁剪视频
     
@@ -835,14 +1172,16 @@ async def validate_video_file_tool(video_path: str) -> str:
     """验证视频文件
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         
     Returns:
         验证结果
     """
     try:
-        if validate_video_file(video_path):
-            info = get_video_info(video_path)
+        from .asset_registry import resolve_video_path, registered_video_info
+        video_path = await run_in_thread(resolve_video_path, video_path)
+        if await run_in_thread(validate_video_file, video_path):
+            info = await run_in_thread(registered_video_info, video_path) or await run_in_thread(get_video_info, video_path)
             if "error" not in info:
                 return f"""视频文件验证通过
 
@@ -864,16 +1203,18 @@ async def get_video_info_tool(video_path: str) -> str:
     """获取视频文件信息
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         
     Returns:
         视频文件信息
     """
     try:
+        from .asset_registry import resolve_video_path, registered_video_info
+        video_path = await run_in_thread(resolve_video_path, video_path)
         if not os.path.exists(video_path):
             return f"错误：视频文件不存在: {video_path}"
         
-        info = get_video_info(video_path)
+        info = await run_in_thread(registered_video_info, video_path) or await run_in_thread(get_video_info, video_path)
         if "error" in info:
             return f"获取视频信息失败: {info['error']}"
         
@@ -898,7 +1239,7 @@ async def trim_video_tool(video_path: str, start_time: float, end_time: float, o
     """裁剪视频
     
     Args:
-        video_path: 输入视频路径
+        video_path: 输入视频路径或素材ID
         start_time: 开始时间（秒）
         end_time: 结束时间（秒）
         output_path: 输出视频路径
@@ -907,13 +1248,19 @@ async def trim_video_tool(video_path: str, start_time: float, end_time: float, o
         裁剪结果
     """
     try:
-        if not validate_video_file(video_path):
+        from .asset_registry import resolve_video_path
+        try:
+            video_path = await run_in_thread(resolve_video_path, video_path)
+        except ValueError as e:
+            return f"错误：{e}"
+        if not await run_in_thread(validate_video_file, video_path):
             return f"错误：输入视频文件无效: {video_path}"
         
         if start_time < 0 or end_time <= start_time:
             return "错误：时间参数无效，start_time应大于等于0，end_time应大于start_time"
         
-        success = trim_video(video_path, start_time, end_time, output_path)
+        from .process_pool import run_in_process
+        success = await run_in_process(trim_video, video_path, start_time, end_time, output_path)
         if success:
             return f"视频裁剪成功\n输出文件: {output_path}\n裁剪时间: {start_time:.2f}s - {end_time:.2f}s"
         else:
@@ -926,19 +1273,25 @@ async def merge_videos_tool(video_paths: str, output_path: str) -> str:
     """合并多个视频
     
     Args:
-        video_paths: 视频文件路径，用逗号分隔
+        video_paths: 视频文件路径或素材ID，用逗号分隔
         output_path: 输出视频路径
         
     Returns:
         合并结果
     """
     try:
-        paths = [path.strip() for path in video_paths.split(',')]
+        from .asset_registry import resolve_video_path
+        paths = []
+        for path in video_paths.split(','):
+            try:
+                paths.append(await run_in_thread(resolve_video_path, path.strip()))
+            except ValueError as e:
+                return f"错误：{e}"
         
         # 验证所有视频文件
         valid_paths = []
         for path in paths:
-            if validate_video_file(path):
+            if await run_in_thread(validate_video_file, path):
                 valid_paths.append(path)
             else:
                 print(f"警告：跳过无效视频文件: {path}")
@@ -946,7 +1299,8 @@ async def merge_videos_tool(video_paths: str, output_path: str) -> str:
         if not valid_paths:
             return "错误：没有有效的视频文件"
         
-        success = merge_videos(valid_paths, output_path)
+        from .process_pool import run_in_process
+        success = await run_in_process(merge_videos, valid_paths, output_path)
         if success:
             return f"视频合并成功\n输出文件: {output_path}\n合并了 {len(valid_paths)} 个视频文件"
         else:
@@ -959,7 +1313,7 @@ async def create_video_with_subtitles_tool(video_path: str, audio_path: str, sub
     """创建带字幕的视频
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或素材ID
         audio_path: 音频文件路径
         subtitle_segments: 字幕片段，格式：文本,开始时间,结束时间;文本,开始时间,结束时间
         output_path: 输出视频文件路径
@@ -968,7 +1322,12 @@ async def create_video_with_subtitles_tool(video_path: str, audio_path: str, sub
         创建结果
     """
     try:
-        if not validate_video_file(video_path):
+        from .asset_registry import resolve_video_path
+        try:
+            video_path = await run_in_thread(resolve_video_path, video_path)
+        except ValueError as e:
+            return f"错误：{e}"
+        if not await run_in_thread(validate_video_file, video_path):
             return f"错误：视频文件无效: {video_path}"
         
         if not os.path.exists(audio_path):
@@ -986,7 +1345,8 @@ async def create_video_with_subtitles_tool(video_path: str, audio_path: str, sub
         if not segments:
             return "错误：没有有效的字幕片段"
         
-        success = create_video_with_subtitles(video_path, audio_path, segments, output_path)
+        from .process_pool import run_in_process
+        success = await run_in_process(create_video_with_subtitles, video_path, audio_path, segments, output_path)
         if success:
             return f"带字幕视频创建成功\n输出文件: {output_path}\n字幕片段数: {len(segments)}"
         else:
@@ -0,0 +1,381 @@
+"""
+监视文件夹模块
+负责持续扫描共享目录，等待新放入的视频写入完成（大小和修改时间不再变化）后，
+与同名的脚本（.txt）和配置（.json）文件配对，合并成批提交给与MCP工具相同的任务调度器；
+已提交的文件记录在输出目录的台账中，重复扫描和服务重启都不会重复处理
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from mcp.server.fastmcp import FastMCP
+
+from .config import get_config, WatchFolderConfig
+from .batch_runner import validate_manifest_entry, MANIFEST_PARAMS
+from .mcp_tools import create_video_generation_task
+from .process_pool import shutdown_process_pool
+from .thread_pool import run_in_thread, shutdown_thread_pool
+
+# 创建MCP实例
+mcp = FastMCP("watch-folder", log_level="ERROR")
+
+# 识别为源视频的扩展名
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".avi", ".flv", ".webm", ".m4v"}
+
+# 同名脚本（配音和字幕文本）和配置（generate_auto_video 参数）文件的扩展名
+SCRIPT_EXTENSION = ".txt"
+CONFIG_EXTENSION = ".json"
+
+# 正在拷贝中的临时文件后缀
+PARTIAL_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".download")
+
+# 已提交文件的台账（位于输出目录）
+LEDGER_FILE = ".watch_ledger.json"
+
+# 监视文件夹提交任务使用的客户端标识
+WATCH_CLIENT_ID = "watch-folder"
+
+class WatchFolder:
+    """监视一个目录并把写入完成的视频提交为视频生成任务"""
+
+    def __init__(self, watch_dir: str, output_dir: Optional[str] = None,
+                 config: Optional[WatchFolderConfig] = None,
+                 submit: Optional[Callable[[Dict], Awaitable[str]]] = None):
+        """
+        Args:
+            watch_dir: 监视的目录
+            output_dir: 输出目录，为空时使用 watch_dir/output
+            config: 监视配置，为空时使用全局配置
+            submit: 提交任务的协程函数（参数为 generate_auto_video 参数和控制字段，返回任务创建结果），
+                    为空时提交给全局任务调度器
+        """
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_dir = os.path.abspath(output_dir or os.path.join(self.watch_dir, "output"))
+        self.config = config or get_config().get_watch_folder_config()
+        self.submit = submit or submit_to_scheduler
+        self.submitted = 0
+        self.failed = 0
+        self.last_scan: Optional[float] = None
+        self._states: Dict[str, Tuple[int, int, float]] = {}  # 路径 -> (大小, 修改时间, 保持不变的起始时间)
+        self._ready: Dict[str, Dict] = {}  # 台账键 -> 待提交条目
+        self._last_ready_at = 0.0
+        self._stopped = asyncio.Event()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._ledger = self._load_ledger()
+
+    @property
+    def ledger_path(self) -> str:
+        return os.path.join(self.output_dir, LEDGER_FILE)
+
+    def _load_ledger(self) -> Dict[str, Dict]:
+        """读取台账，已提交但没有生成输出的文件（上次运行中断）从台账中移除，重新提交"""
+        if not os.path.exists(self.ledger_path):
+            return {}
+        try:
+            with open(self.ledger_path, "r", encoding="utf-8") as f:
+                ledger = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取监视台账失败，将重新建立: {e}")
+            return {}
+        return {
+            key: record for key, record in ledger.items()
+            if record.get("status") == "invalid" or os.path.exists(record.get("output_path", ""))
+        }
+
+    def _save_ledger(self):
+        """写入台账（先写临时文件再替换）"""
+        temp_path = f"{self.ledger_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._ledger, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.ledger_path)
+
+    def _stable(self, path: str, now: float) -> Optional[os.stat_result]:
+        """更新文件状态，文件大小和修改时间保持 stable_seconds 不变时返回其状态"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._states.pop(path, None)
+            return None
+        previous = self._states.get(path)
+        if previous is None or previous[:2] != (stat.st_size, stat.st_mtime_ns):
+            self._states[path] = (stat.st_size, stat.st_mtime_ns, now)
+            return None
+        if stat.st_size == 0 or now - previous[2] < self.config.stable_seconds:
+            return None
+        return stat
+
+    @staticmethod
+    def _fingerprint(stat: Optional[os.stat_result]) -> str:
+        return f"{stat.st_size}:{stat.st_mtime_ns}" if stat else "-"
+
+    def _build_entry(self, video_path: str, script_path: Optional[str], config_path: Optional[str]) -> Dict:
+        """根据视频和同名文件生成任务参数"""
+        entry: Dict = {}
+        if config_path:
+            with open(config_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if not isinstance(entry, dict):
+                raise ValueError(f"配置文件应为JSON对象: {config_path}")
+        if script_path:
+            with open(script_path, "r", encoding="utf-8-sig") as f:
+                entry["text"] = f.read().strip()
+        # 输出路径按相对监视目录的路径生成，不同子目录中的同名视频不会互相覆盖
+        relative_path = os.path.relpath(video_path, self.watch_dir)
+        entry["video_path"] = video_path
+        if "output_path" not in entry:
+            entry["output_path"] = os.path.join(self.output_dir, f"{os.path.splitext(relative_path)[0]}.mp4")
+            os.makedirs(os.path.dirname(entry["output_path"]), exist_ok=True)
+        entry.setdefault("priority", self.config.priority)
+        entry.setdefault("id", relative_path)
+        return validate_manifest_entry(entry)
+
+    def scan(self, now: Optional[float] = None) -> int:
+        """扫描一次目录，把写入完成且已配对的视频加入待提交批次
+
+        Args:
+            now: 当前时间，默认为 time.time()
+
+        Returns:
+            int: 本次新加入待提交批次的视频数
+        """
+        now = time.time() if now is None else now
+        self.last_scan = now
+        added = 0
+        seen = set()
+        for root, dirs, files in os.walk(self.watch_dir):
+            # 跳过输出目录和隐藏目录
+            dirs[:] = [d for d in dirs if not d.startswith(".")
+                       and os.path.abspath(os.path.join(root, d)) != self.output_dir]
+            # 更新视频、脚本和配置文件的状态
+            stats: Dict[str, Optional[os.stat_result]] = {}
+            for name in files:
+                ext = os.path.splitext(name)[1].lower()
+                if name.startswith(".") or name.lower().endswith(PARTIAL_SUFFIXES):
+                    continue
+                if ext in VIDEO_EXTENSIONS or ext in (SCRIPT_EXTENSION, CONFIG_EXTENSION):
+                    path = os.path.join(root, name)
+                    seen.add(path)
+                    stats[name] = self._stable(path, now)
+
+            for name, video_stat in stats.items():
+                stem, ext = os.path.splitext(name)
+                if ext.lower() not in VIDEO_EXTENSIONS or video_stat is None:
+                    continue
+                video_path = os.path.join(root, name)
+
+                # 同名脚本和配置文件也必须写入完成
+                sidecars = {}
+                waiting = False
+                for ext_name in (SCRIPT_EXTENSION, CONFIG_EXTENSION):
+                    if stem + ext_name in stats:
+                        sidecar_stat = stats[stem + ext_name]
+                        if sidecar_stat is None:
+                            waiting = True
+                        sidecars[ext_name] = (os.path.join(root, stem + ext_name), sidecar_stat)
+                if waiting:
+                    continue
+                # 脚本通常与视频一起拷贝，视频写入完成后再等待一段时间
+                stable_for = now - self._states[video_path][2]
+                if SCRIPT_EXTENSION not in sidecars and stable_for < self.config.sidecar_wait_seconds:
+                    continue
+                if SCRIPT_EXTENSION not in sidecars and self.config.require_script:
+                    continue
+
+                script_path, script_stat = sidecars.get(SCRIPT_EXTENSION, (None, None))
+                config_path, config_stat = sidecars.get(CONFIG_EXTENSION, (None, None))
+                key = "|".join([
+                    os.path.relpath(video_path, self.watch_dir), self._fingerprint(video_stat),
+                    self._fingerprint(script_stat), self._fingerprint(config_stat)
+                ])
+                if key in self._ledger or key in self._ready:
+                    continue
+                try:
+                    entry = self._build_entry(video_path, script_path, config_path)
+                except (OSError, ValueError) as e:
+                    print(f"监视文件夹跳过无效的文件 {video_path}: {e}")
+                    self._ledger[key] = {"status": "invalid", "error": str(e), "at": now}
+                    self._save_ledger()
+                    continue
+                self._ready[key] = entry
+                self._last_ready_at = now
+                added += 1
+        # 清理已删除文件的状态
+        for path in list(self._states):
+            if path not in seen:
+                del self._states[path]
+        return added
+
+    def batch_due(self, now: Optional[float] = None) -> bool:
+        """待提交批次是否应该提交：一段时间内没有新文件就绪，或批次已满"""
+        if not self._ready:
+            return False
+        now = time.time() if now is None else now
+        return (len(self._ready) >= self.config.max_batch_size
+                or now - self._last_ready_at >= self.config.batch_window)
+
+    async def flush(self) -> int:
+        """提交待提交批次中的所有条目
+
+        Returns:
+            int: 成功提交的任务数
+        """
+        batch = list(self._ready.items())[:max(1, self.config.max_batch_size)]
+        submitted = 0
+        for key, entry in batch:
+            del self._ready[key]
+            try:
+                created = await self.submit(entry)
+            except Exception as e:
+                created = f"错误：{e}"
+            record = {"video_path": entry["video_path"], "output_path": entry["output_path"], "at": time.time()}
+            if created.startswith("错误"):
+                self.failed += 1
+                record.update({"status": "invalid", "error": created})
+                print(f"监视文件夹提交失败 {entry['video_path']}: {created}")
+            else:
+                info = json.loads(created)
+                self.submitted += 1
+                submitted += 1
+                record.update({"status": info.get("status"), "task_id": info.get("task_id")})
+            self._ledger[key] = record
+        self._save_ledger()
+        if batch:
+            print(f"监视文件夹 {self.watch_dir} 提交 {submitted}/{len(batch)} 个任务")
+        return submitted
+
+    async def run(self):
+        """持续监视目录，直到调用 stop"""
+        print(f"开始监视文件夹: {self.watch_dir}，输出目录: {self.output_dir}")
+        while not self._stopped.is_set():
+            await run_in_thread(self.scan)
+            if self.batch_due():
+                await self.flush()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.config.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        print(f"停止监视文件夹: {self.watch_dir}")
+
+    def stop(self):
+        """停止监视（已提交的任务继续执行）"""
+        self._stopped.set()
+
+    def get_status(self) -> Dict:
+        """获取监视状态"""
+        return {
+            "watch_dir": self.watch_dir,
+            "output_dir": self.output_dir,
+            "tracked_files": len(self._states),
+            "ready": len(self._ready),
+            "submitted": self.submitted,
+            "failed": self.failed,
+            "ledger_entries": len(self._ledger),
+            "last_scan": self.last_scan
+        }
+
+async def submit_to_scheduler(entry: Dict) -> str:
+    """把条目提交给全局任务调度器（与MCP工具共用）
+
+    Args:
+        entry: 检查过的 generate_auto_video 参数和控制字段
+
+    Returns:
+        str: 任务创建结果JSON，失败时为 "错误：" 开头的字符串
+    """
+    params = {key: entry[key] for key in MANIFEST_PARAMS if key in entry}
+    return await create_video_generation_task(
+        **params, priority=entry.get("priority") or None, client_id=WATCH_CLIENT_ID
+    )
+
+# 运行中的监视：监视目录 -> (WatchFolder, 后台任务)
+_watchers: Dict[str, Tuple[WatchFolder, asyncio.Task]] = {}
+
+@mcp.tool()
+async def start_watch_folder(watch_dir: str, output_dir: str = "") -> str:
+    """开始监视文件夹：放入目录的视频写入完成后自动生成视频
+
+    视频与同名的 .txt（配音和字幕文本）和 .json（generate_auto_video 参数）文件配对，
+    输出写入 output_dir（默认 watch_dir/output）。
+
+    Args:
+        watch_dir: 监视的目录
+        output_dir: 输出目录
+
+    Returns:
+        监视状态
+    """
+    if not os.path.isdir(watch_dir):
+        return f"错误：监视目录不存在: {watch_dir}"
+    key = os.path.abspath(watch_dir)
+    if key in _watchers and not _watchers[key][1].done():
+        return json.dumps({"message": "该目录已在监视中", **_watchers[key][0].get_status()}, ensure_ascii=False)
+    watcher = WatchFolder(watch_dir, output_dir or None)
+    _watchers[key] = (watcher, asyncio.create_task(watcher.run()))
+    return json.dumps({"message": "已开始监视文件夹", **watcher.get_status()}, ensure_ascii=False)
+
+@mcp.tool()
+async def stop_watch_folder(watch_dir: str) -> str:
+    """停止监视文件夹（已提交的任务继续执行）
+
+    Args:
+        watch_dir: 监视的目录
+
+    Returns:
+        停止结果
+    """
+    item = _watchers.pop(os.path.abspath(watch_dir), None)
+    if item is None:
+        return f"错误：该目录未在监视中: {watch_dir}"
+    watcher, handle = item
+    watcher.stop()
+    await handle
+    return json.dumps({"message": "已停止监视文件夹", **watcher.get_status()}, ensure_ascii=False)
+
+@mcp.tool()
+async def get_watch_folder_status() -> str:
+    """获取所有监视文件夹的状态
+
+    Returns:
+        监视状态列表
+    """
+    return json.dumps([
+        {**watcher.get_status(), "running": not handle.done()}
+        for watcher, handle in _watchers.values()
+    ], ensure_ascii=False, indent=2)
+
+def get_mcp_instance():
+    """获取MCP实例"""
+    return mcp
+
+def main(argv: Optional[list] = None) -> int:
+    """监视文件夹命令行入口（独立进程运行，使用本进程的任务调度器和进程池）
+
+    Args:
+        argv: 命令行参数，为None时使用 sys.argv
+
+    Returns:
+        int: 退出码
+    """
+    parser = argparse.ArgumentParser(description="监视文件夹，自动为放入的视频生成配音字幕视频")
+    parser.add_argument("watch_dir", help="监视的目录")
+    parser.add_argument("-o", "--output-dir", help="输出目录，默认为 <监视目录>/output")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.watch_dir):
+        print(f"错误：监视目录不存在: {args.watch_dir}")
+        return 2
+    try:
+        asyncio.run(WatchFolder(args.watch_dir, args.output_dir).run())
+    except KeyboardInterrupt:
+        print("监视已停止，未生成输出的文件会在下次启动时重新提交")
+    finally:
+        shutdown_process_pool(wait=False)
+        shutdown_thread_pool(wait=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
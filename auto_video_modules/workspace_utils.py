@@ -0,0 +1,123 @@
+"""
+工作区工具模块
+负责为每个任务创建独立的临时工作目录，避免并发任务之间的文件冲突
+"""
+
+import os
+import uuid
+import shutil
+import contextvars
+from typing import Optional
+
+from .config import get_config
+
+# 当前协程所属任务的工作目录，由 generate_auto_video 设置，供进程池跟踪工作进程
+current_work_dir: contextvars.ContextVar = contextvars.ContextVar("current_work_dir", default=None)
+
+# 任务取消标记文件，工作进程在处理循环中检查该文件以尽快退出
+CANCEL_MARKER = ".cancelled"
+
+class TaskCancelledError(Exception):
+    """任务已被取消"""
+
+class TaskTimeoutError(Exception):
+    """任务或处理阶段超时"""
+
+    def __init__(self, message: str, stage: Optional[str] = None):
+        super().__init__(message)
+        self.stage = stage
+
+def get_tasks_root() -> str:
+    """获取任务工作目录的根路径
+
+    Returns:
+        str: MainConfig.workspace 下的 tasks 目录（绝对路径）
+    """
+    return os.path.abspath(os.path.join(get_config().workspace, "tasks"))
+
+def get_task_workspace(task_id: str) -> str:
+    """获取任务工作目录路径（不创建目录）
+
+    Args:
+        task_id: 任务ID
+
+    Returns:
+        str: 工作目录的绝对路径
+    """
+    return os.path.join(get_tasks_root(), task_id)
+
+def create_task_workspace(task_id: Optional[str] = None) -> str:
+    """为任务创建独立的临时工作目录
+
+    Args:
+        task_id: 任务ID，为None时自动生成
+
+    Returns:
+        str: 工作目录的绝对路径
+    """
+    work_dir = get_task_workspace(task_id or uuid.uuid4().hex)
+    os.makedirs(work_dir, exist_ok=True)
+    return work_dir
+
+def workspace_path(work_dir: Optional[str], filename: str) -> str:
+    """获取工作目录中的文件路径，work_dir为None时使用当前目录
+
+    Args:
+        work_dir: 工作目录
+        filename: 文件名
+
+    Returns:
+        str: 文件路径
+    """
+    if not work_dir:
+        return filename
+    return os.path.join(work_dir, filename)
+
+def cleanup_task_workspace(work_dir: Optional[str]):
+    """删除任务工作目录（SystemConfig.cleanup_temp_files 为 False 时保留，便于调试）
+
+    Args:
+        work_dir: 工作目录
+    """
+    if not work_dir or not os.path.isdir(work_dir):
+        return
+    if not get_config().get_system_config().cleanup_temp_files:
+        print(f"保留任务工作目录: {work_dir}")
+        return
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"已清理任务工作目录: {work_dir}")
+
+def mark_cancelled(work_dir: Optional[str]):
+    """在工作目录中写入取消标记
+
+    Args:
+        work_dir: 工作目录
+    """
+    if not work_dir or not os.path.isdir(work_dir):
+        return
+    with open(os.path.join(work_dir, CANCEL_MARKER), "w", encoding="utf-8") as f:
+        f.write("cancelled")
+
+def is_cancelled(work_dir: Optional[str]) -> bool:
+    """检查工作目录是否带有取消标记
+
+    Args:
+        work_dir: 工作目录
+
+    Returns:
+        bool: 是否已取消
+    """
+    return bool(work_dir) and os.path.exists(os.path.join(work_dir, CANCEL_MARKER))
+
+def clear_cancelled(work_dir: Optional[str]):
+    """删除工作目录中的取消标记（恢复已取消的任务时使用）
+
+    Args:
+        work_dir: 工作目录
+    """
+    if not work_dir:
+        return
+    try:
+        os.remove(os.path.join(work_dir, CANCEL_MARKER))
+    except OSError:
+        pass